@@ -0,0 +1,107 @@
+import json
+import os
+from bisect import bisect_right
+from types import SimpleNamespace
+
+from conditions import NAMES, compile_condition, threshold
+
+# =====================================================
+# 업적 엔진
+# =====================================================
+# 업적은 "지표(metric)가 기준값(threshold) 이상"이라는 조건으로 정의한다.
+# 지표별로 기준값을 정렬해 두고, 지표가 old → new 로 바뀌면 그 사이에 있는
+# 기준값만 이분 탐색으로 찾으므로 업적 수가 늘어나도 완료 1회당 비용이 거의 같다.
+# 정의에 조건식(condition)을 쓰면 "지표 >= 상수" 꼴은 같은 인덱스에 들어가고,
+# 그 밖의 복합 조건은 컴파일된 predicate 로 완료할 때마다 평가한다 (conditions.py).
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'achievements.json')
+
+
+def load_definitions(path=DEFAULT_PATH):
+    """JSON 파일([{key, name, desc, condition | metric+threshold, reward}, ...])에서 업적 정의를 읽음"""
+    with open(path, encoding='utf-8') as f:
+        rows = json.load(f)
+    return {row['key']: {k: v for k, v in row.items() if k != 'key'} for row in rows}
+
+
+class AchievementEngine:
+    """지표별 정렬된 기준값 인덱스"""
+
+    def __init__(self, definitions):
+        self.definitions = definitions
+        by_metric = {}
+        self._predicates = []    # [(key, predicate)] 인덱스로 표현할 수 없는 복합 조건
+        for key, ach in definitions.items():
+            if 'condition' in ach:
+                simple = threshold(ach['condition'])
+                if simple is None:
+                    self._predicates.append((key, compile_condition(ach['condition'])))
+                    continue
+                metric, value = simple
+            else:
+                metric, value = ach['metric'], ach['threshold']
+            by_metric.setdefault(metric, []).append((value, key))
+        self._thresholds = {}
+        self._keys = {}
+        for metric, pairs in by_metric.items():
+            pairs.sort()
+            self._thresholds[metric] = [t for t, _ in pairs]
+            self._keys[metric] = [k for _, k in pairs]
+
+    @property
+    def metrics(self):
+        return self._thresholds.keys()
+
+    def crossed(self, metric, old, new):
+        """old < threshold <= new 인 업적 키 (지표가 줄어든 경우는 없음)"""
+        thresholds = self._thresholds.get(metric)
+        if not thresholds or new <= old:
+            return []
+        lo = bisect_right(thresholds, old)
+        hi = bisect_right(thresholds, new)
+        return self._keys[metric][lo:hi]
+
+    def satisfied(self, stats):
+        """현재 지표 값으로 이미 만족하는 모든 업적 키 (기존 기록 재계산용)"""
+        keys = []
+        for metric, thresholds in self._thresholds.items():
+            keys.extend(self._keys[metric][:bisect_right(thresholds, stats.get(metric, 0))])
+        if self._predicates:
+            state = SimpleNamespace(**{name: stats.get(name, 0) for name in NAMES})
+            keys.extend(key for key, predicate in self._predicates if predicate(state))
+        return keys
+
+    def unlock_crossed(self, before, state, unlocked):
+        """before(지표 값 dict) 이후 기준값을 넘은 업적을 unlocked 에 추가하고 보상 지급
+
+        state 는 지표를 속성으로 가진 객체(engine.PomodoroState). 업적 보상으로 늘어난
+        누적 코인이 다른 업적 기준을 넘을 수 있으므로 더 이상 없을 때까지 반복한다.
+        새로 달성한 업적 목록({'key': ..., 정의...})을 반환한다.
+        """
+        newly_unlocked = []
+        changes = {metric: (old, getattr(state, metric)) for metric, old in before.items()}
+        check_predicates = bool(self._predicates)
+        while changes or check_predicates:
+            earned_before = state.total_coins_earned
+            candidates = [key for metric, (old, new) in changes.items() for key in self.crossed(metric, old, new)]
+            if check_predicates:
+                candidates.extend(key for key, predicate in self._predicates
+                                  if key not in unlocked and predicate(state))
+            for key in candidates:
+                if key not in unlocked:
+                    ach = self.definitions[key]
+                    unlocked.add(key)
+                    state.coins += ach['reward']
+                    state.total_coins_earned += ach['reward']
+                    newly_unlocked.append({'key': key, **ach})
+            changes = {}
+            check_predicates = False
+            if state.total_coins_earned != earned_before:
+                if 'total_coins_earned' in before:
+                    changes['total_coins_earned'] = (earned_before, state.total_coins_earned)
+                check_predicates = bool(self._predicates)
+        return newly_unlocked
+
+    def snapshot(self, state):
+        """업적 조건에 쓰이는 지표 값 (unlock_crossed 의 before)"""
+        return {metric: getattr(state, metric) for metric in self._thresholds}
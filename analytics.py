@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+# =====================================================
+# 누적 분석 지표 (연속 공부일, 시간대 분포)
+# =====================================================
+# 통계 탭을 열 때마다 일별 기록/세션 로그를 다시 훑지 않도록 세션이 완료될 때와
+# 날짜가 바뀔 때 조금씩 갱신하는 값들이다. 모두 O(1) 로 갱신/조회된다.
+#
+#     current_streak, longest_streak, last_study_date   연속 공부일
+#     hour_sessions (24칸), best_hour                   완료 시각(시) 분포와 가장 많은 시간대
+#     avg_session_minutes                               total_minutes / total_sessions
+#
+# 엔진 상태(engine.PomodoroState)의 필드/속성이므로 업적 조건식에서도 그대로 쓸 수 있다.
+# 예: "current_streak >= 7", "total_sessions >= 20 and 0 <= best_hour < 9"
+
+HOURS = 24
+NO_HOUR = -1     # 아직 기록이 없을 때의 best_hour
+
+
+def _yesterday(day):
+    return str(date.fromisoformat(day) - timedelta(days=1))
+
+
+def advance_streak(last_study_date, current, longest, day):
+    """day 에 공부를 마쳤을 때 (current, longest, last_study_date)"""
+    if last_study_date == day:
+        return current, longest, day
+    current = current + 1 if last_study_date == _yesterday(day) else 1
+    return current, max(longest, current), day
+
+
+def streak_broken(last_study_date, today):
+    """어제도 오늘도 공부하지 않아 연속이 끊겼는지"""
+    return last_study_date is not None and last_study_date < _yesterday(today)
+
+
+def streaks_from_days(days):
+    """공부한 날짜(오름차순, 중복 없음) 이터러블에서 (current, longest, last_study_date) 를 한 번에"""
+    current = longest = 0
+    last = None
+    for day in days:
+        current, longest, last = advance_streak(last, current, longest, day)
+    return current, longest, last
+
+
+def empty_hours():
+    return [0] * HOURS
+
+
+def best_hour(hours):
+    """세션이 가장 많은 시(동률이면 이른 시). 기록이 없으면 NO_HOUR"""
+    if not hours or not any(hours):
+        return NO_HOUR
+    return max(range(HOURS), key=lambda h: (hours[h], -h))
+
+
+def bump_hour(hours, best, hour):
+    """hours[hour] 를 1 늘리고 새 best_hour 반환 (best_hour() 와 같은 동률 규칙)"""
+    hours[hour] += 1
+    if best == NO_HOUR or hours[hour] > hours[best] or (hours[hour] == hours[best] and hour < best):
+        return hour
+    return best
+
+
+def average_session(total_minutes, total_sessions):
+    return total_minutes / total_sessions if total_sessions else 0.0
@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import service
+from catalog import CatalogSource
+from clock import open_clock
+from engine import PomodoroState
+from profiler import profiler
+from scheduler import DeadlineScheduler
+from storage import open_storage
+
+# =====================================================
+# JSON API (위젯용)
+# =====================================================
+# 모바일/데스크톱 위젯이 Streamlit 재실행 없이 타이머, 상점, 통계를 쓰는 HTTP API.
+# 게임 규칙은 앱과 같은 service.py / engine.py 함수를 쓰므로 보상, 업적, 구매 결과가 같다.
+#
+#     python api.py --port 8600            (STUDY_API_PORT, 저장소는 STUDY_DB_PATH)
+#
+# 기본으로 127.0.0.1 에만 연다 (밖에서 받으려면 --host 와 앞단 TLS 프록시).
+# /v1/users/<id> 요청은 그 사용자의 토큰이 있어야 한다: Authorization: Bearer <토큰>.
+# 토큰은 서버 비밀 값(STUDY_API_SECRET)으로 user_id 를 서명한 HMAC-SHA256 (user_token) 이라
+# 따로 저장하지 않고, URL 에 보이는 user_id 만으로는 만들 수 없다. 앱의 "위젯 연결" 에서 보여 준다.
+#
+#     GET  /healthz
+#     GET  /v1/catalog                          아이템/테마/업적 정의
+#     GET  /v1/users/<id>                       코인, 보유 아이템, 타이머, 통계, 업적
+#     GET  /v1/users/<id>/history?days=N        최근 N일 일별 기록
+#     POST /v1/users/<id>/timer/start           시작 (일시정지했던 세션은 이어서)
+#     POST /v1/users/<id>/timer/stop            일시정지
+#     POST /v1/users/<id>/purchases             {"item": key}
+#     POST /v1/users/<id>/sessions              {"sessions": [{"id", "end", "duration"}]} 오프라인 세션 동기화
+#                                               (겹치거나 7일 넘었거나 하루 상한을 넘는 세션은 "rejected" 로 셈,
+#                                               service._plausible)
+#     POST /v1/batch                            {"requests": [{"method", "path", "body"}]} 여러 요청을 순서대로
+#
+# 이벤트 루프 하나가 연결(HTTP/1.1 keep-alive)을 받고, 저장소 호출은 POOL_SIZE 스레드 풀에서 한다.
+# SQLite 연결은 스레드마다 하나라 스레드 풀이 곧 연결 풀이다. 같은 사용자의 요청은 사용자별
+# 잠금으로 차례로 처리한다. 타이머 마감은 앱처럼 DeadlineScheduler 가 처리하고, 조회 시점에
+# 이미 마감이 지났으면 그 자리에서 완료한다 (기록은 마감 시각 조건부라 앱과 겹쳐도 한 번만 반영).
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8600
+SECRET_ENV = 'STUDY_API_SECRET'
+POOL_SIZE = 8
+MAX_HEADER = 16 * 1024
+MAX_BODY = 1024 * 1024
+MAX_BATCH = 100             # /v1/batch 요청 수
+MAX_SESSIONS = 500          # 세션 동기화 한 번에 받는 세션 수
+MAX_DURATION = 24 * 60      # 세션 길이 상한 (분)
+CLOCK_SKEW = 60             # 위젯 시계가 이만큼(초) 빨라도 받아 줌
+MAX_HISTORY_DAYS = 366
+KEEP_ALIVE_TIMEOUT = 30.0
+
+
+class ApiError(Exception):
+    """HTTP 상태 코드와 함께 돌려줄 오류"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def user_token(secret, user_id):
+    """user_id 의 API 토큰 (hex)"""
+    secret = secret.encode() if isinstance(secret, str) else secret
+    return hmac.new(secret, user_id.encode(), hashlib.sha256).hexdigest()
+
+
+def _bearer(headers):
+    """Authorization: Bearer <토큰> 의 토큰. 없으면 None"""
+    scheme, _, token = headers.get('authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+
+def _require(body, key, kind):
+    value = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ApiError(400, f"'{key}' is required")
+    return value
+
+
+class Api:
+    """라우팅과 핸들러. 핸들러는 스레드 풀에서 도는 동기 함수이고 (상태 코드, JSON 값) 을 반환한다."""
+
+    def __init__(self, store, catalog_source, clock, secret, pool_size=POOL_SIZE):
+        if not secret:
+            raise ValueError(f"{SECRET_ENV} is required to sign user tokens")
+        self.secret = secret
+        self.store = store
+        self.catalog_source = catalog_source
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(pool_size, thread_name_prefix='api-store')
+        self.scheduler = DeadlineScheduler(clock=clock.time)
+        self._locks = weakref.WeakValueDictionary()     # user_id → asyncio.Lock (쓰는 동안만 남음)
+        user = r'/v1/users/(?P<user_id>[^/]+)'
+        self.routes = [
+            ('GET', re.compile(r'/healthz'), self.health),
+            ('GET', re.compile(r'/v1/catalog'), self.get_catalog),
+            ('GET', re.compile(user), self.get_user),
+            ('GET', re.compile(user + r'/history'), self.get_history),
+            ('POST', re.compile(user + r'/timer/start'), self.start_timer),
+            ('POST', re.compile(user + r'/timer/stop'), self.stop_timer),
+            ('POST', re.compile(user + r'/purchases'), self.purchase),
+            ('POST', re.compile(user + r'/sessions'), self.sync_sessions),
+        ]
+
+    def start(self):
+        """재시작 전에 실행 중이던 타이머를 다시 등록하고 스케줄러 시작"""
+        for user_id, deadline in self.store.load_running_timers():
+            self._schedule(user_id, deadline)
+        self.scheduler.start()
+        return self
+
+    def close(self):
+        self.scheduler.stop()
+        self.executor.shutdown(wait=True)
+
+    # --- 요청 처리 ---
+
+    async def dispatch(self, method, target, body, token=None):
+        """요청 하나 처리. token 은 Authorization 헤더의 사용자 토큰. (상태 코드, JSON 값)"""
+        url = urlsplit(target)
+        try:
+            if url.path == '/v1/batch':
+                if method != 'POST':
+                    raise ApiError(405, "method not allowed")
+                return await self.batch(body, token)
+            handler, params = self._route(method, url.path)
+            params['query'] = parse_qs(url.query)
+            params['body'] = body
+            user_id = params.get('user_id')
+            call = partial(self._timed, handler, params)
+            if user_id is None:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+            self._authorize(user_id, token)
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = asyncio.Lock()
+            async with lock:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        except ApiError as e:
+            return e.status, {'error': e.message}
+        except Exception:
+            logger.exception("api request failed: %s %s", method, target)
+            return 500, {'error': "internal error"}
+
+    def _route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groupdict()
+                allowed = True
+        if allowed:
+            raise ApiError(405, "method not allowed")
+        raise ApiError(404, "not found")
+
+    def _authorize(self, user_id, token):
+        """token 이 user_id 의 토큰이 아니면 401 (없는 사용자인지는 알려 주지 않는다)"""
+        if token is None or not hmac.compare_digest(token, user_token(self.secret, user_id)):
+            raise ApiError(401, "invalid or missing token")
+
+    def _timed(self, handler, params):
+        with profiler.span(f"api_{handler.__name__}"):
+            return handler(**params)
+
+    async def batch(self, body, token=None):
+        """하위 요청을 순서대로 실행. 하나가 실패해도 나머지는 계속한다. 토큰은 바깥 요청의 것을 쓴다."""
+        requests = _require(body, 'requests', list)
+        if len(requests) > MAX_BATCH:
+            raise ApiError(413, f"at most {MAX_BATCH} requests per batch")
+        responses = []
+        for request in requests:
+            if not isinstance(request, dict) or not isinstance(request.get('path'), str):
+                responses.append({'status': 400, 'body': {'error': "'path' is required"}})
+                continue
+            method = str(request.get('method', 'GET')).upper()
+            if urlsplit(request['path']).path == '/v1/batch':
+                status, payload = 400, {'error': "nested batch"}
+            else:
+                status, payload = await self.dispatch(method, request['path'], request.get('body'), token)
+            responses.append({'status': status, 'body': payload})
+        return 200, {'responses': responses}
+
+    # --- 공통 ---
+
+    def _schedule(self, user_id, deadline):
+        self.scheduler.schedule(user_id, deadline, partial(self._finish, user_id, deadline))
+
+    def _finish(self, user_id, deadline):
+        """마감된 세션 완료 (스케줄러 콜백, 또는 조회 시점에 이미 지난 경우)"""
+        self.scheduler.cancel(user_id)
+        return service.finalize_from_store(self.store, self.catalog_source.current().engine, user_id, deadline)
+
+    def _load(self, user_id):
+        """프로필과 엔진 상태. 마감이 지난 타이머는 먼저 완료한다."""
+        profile = self.store.load_profile(user_id)
+        if profile is None:
+            raise ApiError(404, "unknown user")
+        deadline = profile['timer_deadline']
+        if profile['is_running'] and deadline is not None and deadline <= self.clock.time():
+            self._finish(user_id, deadline)
+            profile = self.store.load_profile(user_id)
+        return profile, PomodoroState.from_mapping(profile)
+
+    def _user_view(self, user_id, profile, state):
+        state.roll_over(str(self.clock.today()))     # 표시용 (오늘 통계가 어제 값이면 0)
+        return {
+            'user_id': user_id,
+            'coins': state.coins,
+            'owned_items': sorted(profile['owned_items']),
+            'active_theme': profile['active_theme'],
+            'timer': self._timer_view(state),
+            'stats': {
+                'total_sessions': state.total_sessions,
+                'total_minutes': state.total_minutes,
+                'total_coins_earned': state.total_coins_earned,
+                'today_sessions': state.today_sessions,
+                'today_minutes': state.today_minutes,
+                'completed_cycles': state.completed_cycles,
+                'current_streak': state.current_streak,
+                'longest_streak': state.longest_streak,
+                'best_hour': state.best_hour,
+                'avg_session_minutes': state.avg_session_minutes,
+            },
+            'achievements': sorted(profile['unlocked_achievements']),
+        }
+
+    def _timer_view(self, state):
+        return {
+            'is_running': state.is_running,
+            'is_study': state.is_study,
+            'is_long_break': state.is_long_break,
+            'remaining': int(round(state.remaining(self.clock.time()))),
+            'deadline': state.timer_deadline,
+        }
+
+    # --- 핸들러 ---
+
+    def health(self, query, body):
+        return 200, {'ok': True, 'timers': self.scheduler.pending()}
+
+    def get_catalog(self, query, body):
+        catalog = self.catalog_source.current()
+        return 200, {
+            'items': {key: {k: info[k] for k in ('name', 'price', 'effect')} for key, info in catalog.items.items()},
+            'themes': {key: {k: info[k] for k in ('name', 'price', 'effect')} for key, info in catalog.themes.items()},
+            'achievements': {key: {k: info[k] for k in ('name', 'desc', 'reward')}
+                             for key, info in catalog.achievements.items()},
+        }
+
+    def get_user(self, user_id, query, body):
+        profile, state = self._load(user_id)
+        return 200, self._user_view(user_id, profile, state)
+
+    def get_history(self, user_id, query, body):
+        try:
+            days = int(query.get('days', ['7'])[0])
+        except ValueError:
+            raise ApiError(400, "'days' must be an integer")
+        if not 1 <= days <= MAX_HISTORY_DAYS:
+            raise ApiError(400, f"'days' must be 1..{MAX_HISTORY_DAYS}")
+        if self.store.load_profile(user_id) is None:
+            raise ApiError(404, "unknown user")
+        since = str(self.clock.today() - timedelta(days=days - 1))
+        history = self.store.load_daily_history(user_id, since=since)
+        return 200, {'days': [{'day': day, **history[day]} for day in sorted(history)]}
+
+    def start_timer(self, user_id, query, body):
+        """이미 돌고 있으면 그대로 (다시 눌러도 마감이 밀리지 않음)"""
+        profile, state = self._load(user_id)
+        if not state.is_running:
+            service.start_timer(self.store, user_id, state, self.clock.time())
+            self._schedule(user_id, state.timer_deadline)
+        return 200, self._timer_view(state)
+
+    def stop_timer(self, user_id, query, body):
+        profile, state = self._load(user_id)
+        if state.is_running:
+            service.stop_timer(self.store, user_id, state, self.clock.time())
+            self.scheduler.cancel(user_id)
+        return 200, self._timer_view(state)
+
+    def purchase(self, user_id, query, body):
+        item_key = _require(body, 'item', str)
+        profile, state = self._load(user_id)
+        owned = set(profile['owned_items'])
+        status = service.buy_item(self.store, self.catalog_source.current(), user_id, item_key, owned)
+        if status == service.UNKNOWN_ITEM:
+            raise ApiError(404, f"unknown item: {item_key}")
+        if status == service.OWNED:
+            raise ApiError(409, f"already owned: {item_key}")
+        if status == service.INSUFFICIENT:
+            raise ApiError(402, "insufficient coins")
+        return 200, {'item': item_key, 'coins': self.store.balance(user_id), 'owned_items': sorted(owned)}
+
+    def sync_sessions(self, user_id, query, body):
+        sessions = _require(body, 'sessions', list)
+        if len(sessions) > MAX_SESSIONS:
+            raise ApiError(413, f"at most {MAX_SESSIONS} sessions per request")
+        latest = self.clock.time() + CLOCK_SKEW
+        for i, session in enumerate(sessions):
+            if not isinstance(session, dict):
+                raise ApiError(400, f"sessions[{i}] must be an object")
+            sid, end, duration = session.get('id'), session.get('end'), session.get('duration')
+            if not isinstance(sid, (str, int)) or isinstance(sid, bool) or not 0 < len(str(sid)) <= 64:
+                raise ApiError(400, f"sessions[{i}].id must be a string of 1..64 characters")
+            if not isinstance(end, (int, float)) or isinstance(end, bool) or not 0 < end <= latest:
+                raise ApiError(400, f"sessions[{i}].end must be an epoch time not in the future")
+            if not isinstance(duration, int) or isinstance(duration, bool) or not 1 <= duration <= MAX_DURATION:
+                raise ApiError(400, f"sessions[{i}].duration must be 1..{MAX_DURATION} minutes")
+        result = service.sync_sessions(self.store, self.catalog_source.current().engine, user_id, sessions,
+                                       clock=self.clock)
+        if result is None:
+            raise ApiError(404, "unknown user")
+        result['balance'] = self.store.balance(user_id)
+        return 200, result
+
+
+# =====================================================
+# HTTP/1.1 (asyncio 스트림)
+# =====================================================
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def _read_request(reader):
+    """(method, target, headers, body). 연결이 닫혔으면 None"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ApiError(431, "request header too large")
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        raise ApiError(400, "bad request line")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    headers[':version'] = parts[2]
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ApiError(400, "bad content-length")
+    if length > MAX_BODY:
+        raise ApiError(413, "request body too large")
+    body = None
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except asyncio.IncompleteReadError:
+            return None
+        except ValueError:
+            raise ApiError(400, "body must be JSON")
+    return parts[0].upper(), parts[1], headers, body
+
+
+def _keep_alive(headers):
+    connection = headers.get('connection', '').lower()
+    if headers[':version'] == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+async def handle_connection(api, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except ApiError as e:
+                # 요청 경계를 알 수 없으므로 응답 후 연결을 닫는다
+                writer.write(_response(e.status, {'error': e.message}, False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            status, payload = await api.dispatch(method, target, body, _bearer(headers))
+            keep_alive = _keep_alive(headers)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            profiler.count('api_requests')
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(api, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """연결을 받기 시작한 asyncio 서버"""
+    return await asyncio.start_server(partial(handle_connection, api), host, port, limit=MAX_HEADER)
+
+
+def open_api(store=None, catalog_source=None, clock=None, pool_size=POOL_SIZE):
+    """환경 변수 설정(STUDY_DB_PATH, STUDY_CLOCK_*, STUDY_API_SECRET)의 Api (스케줄러 시작 전)"""
+    clock = clock or open_clock()
+    return Api(store or open_storage(clock=clock), catalog_source or CatalogSource(), clock,
+               os.environ.get(SECRET_ENV), pool_size)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=os.environ.get('STUDY_API_HOST', DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('STUDY_API_PORT', DEFAULT_PORT)))
+    parser.add_argument('--pool', type=int, default=POOL_SIZE, help="저장소 스레드 풀 크기")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not os.environ.get(SECRET_ENV):
+        parser.error(f"set {SECRET_ENV} (the key that signs per-user API tokens)")
+
+    api = open_api(pool_size=args.pool).start()
+
+    async def run():
+        server = await serve(api, args.host, args.port)
+        logger.info("study api listening on %s:%s", args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,96 +1,85 @@
 import streamlit as st
+import math
+import os
 import time
-from datetime import date, datetime
+import uuid
+from datetime import date
+from datetime import timedelta
+from functools import partial, wraps
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import service
+from api import SECRET_ENV, user_token
+from catalog import CatalogSource
+from clock import open_clock
+from engine import PomodoroState
+from analytics import NO_HOUR, empty_hours
+from history import DailyHistory
+from leaderboard import BOARDS, Leaderboard
+from profiler import METRICS_PORT, profiler
+from rooms import RoomHub
+from scheduler import DeadlineScheduler
+from session_log import DEFAULT_CAPACITY, SessionLog
+from session_memory import open_session_memory
+from state_store import open_state_store, snapshot as snapshot_state
+from stats import summarize
+from storage import PROFILE_FIELDS, open_storage
+from themes import theme_tag
+from transfer import FORMATS, MIME_TYPES, export_history, import_history
+
+# 재실행 프로파일 (STUDY_PROFILE 이 없으면 아무 일도 하지 않음)
+profiler.begin_run()
+profiler.watch_context(get_script_run_ctx())
+if profiler.enabled:
+    st.session_state.profile_reruns = st.session_state.get('profile_reruns', 0) + 1
+    if st.session_state.profile_reruns == 1:
+        profiler.count('sessions')
+
+@st.cache_resource
+def start_metrics_server():
+    """Prometheus /metrics 엔드포인트 (프로세스당 하나)"""
+    return profiler.serve(METRICS_PORT)
+
+if 'prometheus' in profiler.sinks:
+    start_metrics_server()
 
 # =====================================================
 # 1. 데이터 정의
 # =====================================================
+profiler.mark('catalog')
 
-THEME_STYLES = {
-    'dark_mode': {
-        'name': '🌙 다크 모드',
-        'price': 5000,
-        'effect': '앱 배경을 어둡게 바꿉니다.',
-        'css': """
-            .main { background-color: #1E1E1E !important; color: #FFFFFF; }
-            h2, h3, h4 { color: #CCCCCC !important; }
-            .stButton>button { border: 1px solid #555555; }
-        """
-    },
-    'forest_theme': {
-        'name': '🌳 포레스트 테마',
-        'price': 8000,
-        'effect': '편안한 녹색 계열 테마를 적용합니다.',
-        'css': """
-            .main { background-color: #E8F5E9 !important; color: #1B5E20; }
-            h2, h3, h4 { color: #388E3C !important; }
-            .stTextInput>div>div>input { border-color: #4CAF50; }
-        """
-    },
-    'sky_theme': {
-        'name': '☁️ 스카이 테마',
-        'price': 10000,
-        'effect': '시원한 파란색 계열 테마를 적용합니다.',
-        'css': """
-            .main { background-color: #E3F2FD !important; color: #1565C0; }
-            h2, h3, h4 { color: #1E88E5 !important; }
-            .stButton>button { background-color: #90CAF9; color: #000000; }
-        """
-    },
-    'starry_background': {
-        'name': '🌌 별이 빛나는 밤',
-        'price': 12000,
-        'effect': '밤하늘을 연상시키는 그라데이션 배경을 적용합니다.',
-        'css': """
-            .main {
-                background: linear-gradient(to top right, #0F2027, #203A43, #2C5364) !important;
-                color: #E0E0E0;
-            }
-            h2, h3, h4 { color: #ADD8E6 !important; }
-            .stButton>button { border: 1px solid #778899; }
-        """
-    },
-    'cherry_blossom': {
-        'name': '🌸 벚꽃 테마',
-        'price': 9000,
-        'effect': '포근한 벚꽃빛 핑크 테마를 적용합니다.',
-        'css': """
-            .main { background-color: #FFF0F5 !important; color: #880E4F; }
-            h2, h3, h4 { color: #C2185B !important; }
-            .stButton>button { background-color: #F8BBD9; color: #880E4F; }
-        """
-    }
-}
+# 테마/아이템/업적은 data/ 아래 카탈로그 파일에서 읽는다 (catalog.py).
+# 파일이 바뀌면 다음 재실행부터 새 카탈로그가 적용된다.
+@st.cache_resource
+def get_catalog_source():
+    return CatalogSource()
 
-OTHER_ITEMS = {
-    'retro_alarm': {'name': '🔔 레트로 알림', 'price': 3000, 'effect': '종료 알림 소리를 레트로 스타일로 바꿉니다.'},
-    'golden_font': {'name': '🏆 황금 폰트', 'price': 4000, 'effect': '타이머 글자 색을 황금색으로 바꿉니다.'},
-    'double_coin': {'name': '💎 코인 2배', 'price': 15000, 'effect': '공부 완료 시 코인을 2배로 받습니다.'},
-    'focus_bgm': {'name': '🎵 집중 BGM', 'price': 6000, 'effect': '타이머 실행 중 집중 BGM 이모지를 표시합니다.'},
-}
-
-# 업적 정의
-ACHIEVEMENTS = {
-    'first_study':   {'name': '🎓 첫 걸음',      'desc': '첫 번째 공부 세션 완료', 'condition': lambda s: s['total_sessions'] >= 1,   'reward': 1000},
-    'five_sessions': {'name': '🔥 5연속 집중',    'desc': '총 5번 공부 완료',       'condition': lambda s: s['total_sessions'] >= 5,   'reward': 3000},
-    'ten_sessions':  {'name': '💪 10번 도전',     'desc': '총 10번 공부 완료',      'condition': lambda s: s['total_sessions'] >= 10,  'reward': 5000},
-    'one_hour':      {'name': '⏰ 1시간 돌파',    'desc': '총 공부 시간 60분 달성', 'condition': lambda s: s['total_minutes'] >= 60,   'reward': 2000},
-    'five_hours':    {'name': '🌟 5시간 달성',    'desc': '총 공부 시간 300분 달성','condition': lambda s: s['total_minutes'] >= 300,  'reward': 8000},
-    'ten_hours':     {'name': '👑 10시간 마스터',  'desc': '총 공부 시간 600분 달성','condition': lambda s: s['total_minutes'] >= 600,  'reward': 20000},
-    'coin_100':      {'name': '💰 코인 부자',     'desc': '코인 총 100개 적립',     'condition': lambda s: s['total_coins_earned'] >= 100, 'reward': 500},
-    'coin_1000':     {'name': '🏦 코인 만 부자',  'desc': '코인 총 1000개 적립',    'condition': lambda s: s['total_coins_earned'] >= 1000,'reward': 2000},
-    'pomodoro_4':    {'name': '🍅 뽀모도로 4세트','desc': '4세트 사이클 완료',      'condition': lambda s: s['completed_cycles'] >= 1,  'reward': 4000},
-    'daily_3':       {'name': '📅 오늘 3번 완료', 'desc': '하루에 3번 공부 완료',   'condition': lambda s: s['today_sessions'] >= 3,    'reward': 1500},
-}
+catalog_source = get_catalog_source()
+catalog = catalog_source.current()
+THEME_STYLES = catalog.themes
+OTHER_ITEMS = catalog.items
+ACHIEVEMENTS = catalog.achievements
+achievement_engine = catalog.engine
 
 # =====================================================
 # 2. 초기 상태 설정
 # =====================================================
+profiler.mark('defaults')
+
+# 날짜/시각은 모두 이 시계에서 읽는다. STUDY_CLOCK_SPEED 를 주면 빨리 감는 시계 (clock.py)
+@st.cache_resource
+def get_clock():
+    return open_clock()
+
+clock = get_clock()
 
 defaults = {
     'coins': 0,
     'is_running': False,
     'is_study': True,
+    'is_long_break': False,
     'owned_items': set(),
     'active_theme': None,
     'study_duration': 25,
@@ -105,69 +94,297 @@ defaults = {
     'total_coins_earned': 0,
     'today_sessions': 0,
     'today_minutes': 0,
-    'last_date': str(date.today()),
-    'daily_history': {},        # {"2024-01-01": {"sessions": N, "minutes": M}}
-    'session_log': [],          # [{"time": "HH:MM", "duration": N, "type": "study"}]
+    'last_date': str(clock.today()),
+    'daily_history': DailyHistory(),  # 날짜 오프셋 배열 (세션 수, 분)
+    'session_log': SessionLog(),  # 최근 세션만 담는 링 버퍼 (전체 기록은 저장소)
     # 업적
     'unlocked_achievements': set(),
     # 사이클 모드 여부
     'cycle_mode': True,
+    # 타이머 마감 시각 (clock.time() 기준, 실행 중일 때만 값이 있음)
+    'timer_deadline': None,
+    # 멈춘 타이머의 남은 시간 (None 이면 아래 4 에서 세션 길이로 채움)
+    'remaining_study_seconds': None,
+    'remaining_break_seconds': None,
+    'remaining_long_break_seconds': None,
+    # 누적 분석 지표 (완료/날짜 변경 때만 갱신, analytics.py)
+    'current_streak': 0,
+    'longest_streak': 0,
+    'last_study_date': None,
+    'hour_sessions': empty_hours(),
+    'best_hour': NO_HOUR,
+    'notices': [],              # [("success", "...")] 다음 렌더링에 표시할 알림
+    # 기록(daily_history, session_log)은 통계 탭을 열 때 저장소에서 불러옴
+    'history_loaded': False,
+    'history_complete': False,  # 가장 오래된 일별 기록까지 다 불러왔는지
+    'history_since': None,      # 불러온 일별 기록 구간의 첫 날
+    'history_version': 0,       # 기록이 바뀔 때마다 갱신 (통계 캐시 키)
+    'state_synced': None,       # 상태 저장소에 마지막으로 기록한 값 (다음 diff 의 기준)
+    'profile_version': None,    # 세션 상태가 반영한 저장소 버전 (users.version, refresh_profile)
+    # 스터디룸
+    'room_subscription': None,  # 지금 보고 있는 방의 구독 (rooms.Subscription)
+    'room_phase_seen': None,    # (방, 구간 번호, 공부 구간 여부) 마지막으로 그린 구간
 }
 
-for key, val in defaults.items():
-    if key not in st.session_state:
+# 오래 쉬는 세션은 이 키들을 디스크 스냅샷으로 내리고 메모리에서 지운다 (session_memory.py).
+# 위젯 값은 그대로 둔다.
+SPILL_KEYS = (*defaults, 'user_id', 'import_result', 'profile_last_run')
+
+@st.cache_resource
+def get_session_memory():
+    """세션 메모리 계정 (프로세스당 하나). 닫힌 세션은 런타임에 물어 목록에서 뺀다."""
+    is_alive = runtime.get_instance().is_active_session if runtime.exists() else None
+    return open_session_memory(SPILL_KEYS, is_alive=is_alive).start()
+
+session_memory = get_session_memory()
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'bare'
+
+# 내려쓰기가 진행 중이면 끝날 때까지 기다렸다가 시작 (아래 restore_session 이 되살림)
+session_memory.touch(current_session_id())
+
+def fill_defaults():
+    for key, val in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = val
+
+fill_defaults()
+
+profiler.mark('resources')
+
+@st.cache_resource
+def get_storage():
+    """프로세스 전체가 공유하는 저장소"""
+    return open_storage(clock=clock)
+
+store = get_storage()
+
+@st.cache_resource
+def get_leaderboard():
+    """사용자 간 랭킹 (프로세스당 하나). 시작할 때 한 번 채우고 이후에는 완료 때 갱신,
+    다른 경로(API, 다른 복제본, 가져오기, 재생)의 변경은 백그라운드 스레드가 바뀐 사용자만 맞춘다"""
+    return Leaderboard.from_store(store, clock.today()).start(today=clock.today)
+
+leaderboard = get_leaderboard()
+
+def record_leaderboard(user_id, done):
+    """완료 결과를 랭킹에 반영 (공부 세션만)"""
+    if done is not None and done.study:
+        leaderboard.record(user_id, done.day, done.result.duration, int(done.result.cycle_completed))
+
+def record_room_leaderboard(user_ids, day, minutes):
+    for user_id in user_ids:
+        leaderboard.record(user_id, day, minutes)
+
+def finalize_in_background(user_id, deadline):
+    """스케줄러 콜백. 업적 정의는 실행 시점의 카탈로그를 쓴다."""
+    done = service.finalize_from_store(store, catalog_source.current().engine, user_id, deadline)
+    record_leaderboard(user_id, done)
+    return done
+
+@st.cache_resource
+def get_scheduler():
+    """프로세스 전체에서 하나. 재시작 전에 실행 중이던 타이머도 다시 등록한다."""
+    sched = DeadlineScheduler(clock=clock.time)
+    for user_id, deadline in store.load_running_timers():
+        sched.schedule(user_id, deadline, partial(finalize_in_background, user_id, deadline))
+    return sched.start()
+
+scheduler = get_scheduler()
+
+@st.cache_resource
+def get_state_store():
+    """세션 상태 외부 저장소 (STUDY_STATE_URL). 복제본끼리 공유하면 sticky session 이 필요 없다."""
+    return open_state_store()
+
+state_store = get_state_store()
+
+@st.cache_resource
+def get_room_hub():
+    """스터디룸 허브 (프로세스당 하나). 방 시계는 방마다 tick 당 한 번만 계산된다."""
+    return RoomHub(store, lambda: catalog_source.current().engine, on_complete=record_room_leaderboard,
+                   clock=clock.time).start()
+
+room_hub = get_room_hub()
+
+def get_user_id():
+    """URL 의 ?uid= 로 사용자 구분. 없으면 새로 발급해서 URL 에 넣는다."""
+    uid = st.query_params.get('uid')
+    if not uid:
+        uid = uuid.uuid4().hex
+        st.query_params['uid'] = uid
+    return uid
+
+# 세션 첫 실행(새로고침, 다른 복제본으로 옮겨 온 경우, 디스크로 내려갔던 세션 포함) 때 상태 복원.
+# 내려 둔 스냅샷이나 상태 저장소에 있으면 왕복 한 번으로 끝나고, 없으면 영구 저장소에서 요약 정보만 불러온다.
+# 첫 화면은 상단 지표/사이클/타이머 위치만 있으면 되므로 기록 양과 상관없이 같은 비용이다.
+def restore_session():
+    fill_defaults()
+    st.session_state.user_id = get_user_id()
+    saved = session_memory.restore(current_session_id())
+    if saved is None:
+        saved = state_store.load(st.session_state.user_id)
+    if saved is not None:
+        for key, val in saved.items():
+            st.session_state[key] = val
+        st.session_state.state_synced = saved
+    else:
+        profile = store.load_profile(st.session_state.user_id)
+        if profile is None:
+            store.create_profile(st.session_state.user_id, **{k: st.session_state[k] for k in PROFILE_FIELDS})
+        else:
+            for key, val in profile.items():
+                st.session_state[key] = val
+        st.session_state.profile_version = store.profile_version(st.session_state.user_id)
+
+# 스터디룸, 스케줄러, JSON API(위젯 동기화, 구매), 기록 재생(projection.py)은 SQLite 에만 쓴다.
+# 세션 상태(내려 둔 스냅샷, 상태 저장소 포함)가 반영한 버전보다 저장소가 새로우면 요약 필드를 다시 읽는다.
+def refresh_profile():
+    version = store.profile_version(st.session_state.user_id)
+    if version is None or version == st.session_state.profile_version:
+        return
+    profile = store.load_profile(st.session_state.user_id)
+    # 다른 곳에서 세션이 기록됐으면 불러 둔 기록도 다시 불러온다
+    if (profile['total_sessions'], profile['total_minutes']) != (st.session_state.total_sessions,
+                                                                 st.session_state.total_minutes):
+        st.session_state.history_loaded = False
+    for key, val in profile.items():
         st.session_state[key] = val
-
-# 날짜 바뀌면 오늘 통계 리셋
-today_str = str(date.today())
-if st.session_state.last_date != today_str:
-    st.session_state.today_sessions = 0
-    st.session_state.today_minutes = 0
-    st.session_state.last_date = today_str
+    st.session_state.profile_version = version
+
+profiler.mark('hydrate')
+if 'user_id' not in st.session_state:
+    restore_session()
+refresh_profile()
+
+def resident(func):
+    """콜백/프래그먼트용. 스크립트 위쪽을 거치지 않으므로 세션이 내려가 있었으면 여기서 되살린다."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        session_memory.touch(current_session_id())
+        if 'user_id' not in st.session_state:
+            restore_session()
+            refresh_profile()
+            fill_remaining_seconds()
+        return func(*args, **kwargs)
+    return wrapper
 
 # =====================================================
 # 3. 유틸리티 함수
 # =====================================================
 
+def get_state():
+    """세션 상태 → 엔진 상태 객체"""
+    return PomodoroState.from_mapping(st.session_state)
+
+def put_state(state):
+    """엔진 상태 객체 → 세션 상태"""
+    for name in PomodoroState.__slots__:
+        st.session_state[name] = getattr(state, name)
+
 def apply_theme():
+    """적용 중인 테마의 스타일시트 참조만 내보냄 (CSS 본문은 브라우저 캐시)"""
     active_key = st.session_state.active_theme
     if active_key and active_key in THEME_STYLES:
-        st.markdown(f"<style>{THEME_STYLES[active_key]['css']}</style>", unsafe_allow_html=True)
-
+        st.markdown(theme_tag(THEME_STYLES[active_key], st.get_option('server.enableStaticServing')),
+                    unsafe_allow_html=True)
+
+def save_fields(*keys):
+    """세션 상태의 해당 키들만 저장소에 기록"""
+    store.save_profile(st.session_state.user_id, **{k: st.session_state[k] for k in keys})
+
+def sync_state():
+    """이번 실행에서 바뀐 필드만 상태 저장소에 덧붙임 (처음이면 전체)
+
+    이번 실행이 저장소에 쓴 것은 세션 상태에도 반영돼 있으므로 지금 버전을 같이 기록한다.
+    """
+    st.session_state.profile_version = store.profile_version(st.session_state.user_id)
+    values = snapshot_state(st.session_state)
+    state_store.save(st.session_state.user_id, values, st.session_state.state_synced)
+    st.session_state.state_synced = values
+
+HISTORY_PAGE_WEEKS = 53   # 일별 기록을 한 번에 불러오는 주 수 (히트맵 1년치)
+
+def load_history_page(before):
+    """before 이전 HISTORY_PAGE_WEEKS 주(월요일부터)의 일별 기록을 daily_history 에 합침"""
+    user_id = st.session_state.user_id
+    since = before - timedelta(days=before.weekday(), weeks=HISTORY_PAGE_WEEKS - 1)
+    page = store.load_daily_history(user_id, since=str(since), before=str(before + timedelta(days=1)))
+    st.session_state.daily_history.update(page)
+    st.session_state.history_since = str(since)
+    st.session_state.history_complete = not store.load_daily_history(user_id, before=str(since), limit=1)
+    bump_history_version()
+
+def ensure_history_loaded():
+    """통계 탭을 처음 열 때 최근 1년치만 불러옴. 이전 기록은 load_older_history"""
+    if not st.session_state.history_loaded:
+        st.session_state.daily_history = DailyHistory()
+        load_history_page(date.fromisoformat(st.session_state.last_date))
+        # 페이지 수는 세션 기록 행 수로 센다 (total_sessions 는 공부만, 기록에는 휴식도 있음)
+        st.session_state.session_log = SessionLog.from_entries(
+            store.load_session_log(st.session_state.user_id, limit=DEFAULT_CAPACITY),
+            total=store.count_sessions(st.session_state.user_id),
+        )
+        st.session_state.history_loaded = True
+        bump_history_version()
+
+@resident
+def load_older_history():
+    """불러온 구간 이전의 일별 기록 한 페이지 더"""
+    load_history_page(date.fromisoformat(st.session_state.history_since) - timedelta(days=1))
+
+def release_history():
+    """불러온 기록을 메모리에서 비움 (통계 탭을 다시 열면 저장소에서 읽는다)"""
+    st.session_state.daily_history = DailyHistory()
+    st.session_state.session_log = SessionLog()
+    st.session_state.history_loaded = False
+    bump_history_version()
+
+def bump_history_version():
+    st.session_state.history_version = time.time_ns()
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def get_history_summary(user_id, history_version, today, _daily_history):
+    """기록 버전이 같으면 다시 계산하지 않음 (_daily_history 는 해시하지 않음)"""
+    return summarize(_daily_history, today)
+
+LOG_PAGE_SIZE = 10
+LOG_TYPE_LABELS = {'study': "공부", 'short_break': "짧은 휴식", 'long_break': "긴 휴식"}
+
+def get_session_log_page(page):
+    """최신 순 세션 기록 한 페이지. 메모리에 없는 페이지는 저장소에서 읽음"""
+    session_log = st.session_state.session_log
+    offset = page * LOG_PAGE_SIZE
+    if session_log.covers(LOG_PAGE_SIZE, offset):
+        return session_log.recent(LOG_PAGE_SIZE, offset)
+    rows = store.load_session_log(st.session_state.user_id, limit=LOG_PAGE_SIZE, offset=offset)
+    return list(reversed(rows))
+
+@resident
 def update_durations():
-    st.session_state.study_duration = max(1, st.session_state.input_study)
-    st.session_state.break_duration = max(1, st.session_state.input_break)
-    st.session_state.remaining_study_seconds = int(st.session_state.study_duration * 60)
-    st.session_state.remaining_break_seconds = int(st.session_state.break_duration * 60)
-    st.session_state.is_study = True
-
-def check_achievements():
-    """업적 달성 여부 확인 후 보상 지급"""
-    newly_unlocked = []
-    stats = {
-        'total_sessions': st.session_state.total_sessions,
-        'total_minutes': st.session_state.total_minutes,
-        'total_coins_earned': st.session_state.total_coins_earned,
-        'today_sessions': st.session_state.today_sessions,
-        'completed_cycles': st.session_state.completed_cycles,
-    }
-    for key, ach in ACHIEVEMENTS.items():
-        if key not in st.session_state.unlocked_achievements:
-            if ach['condition'](stats):
-                st.session_state.unlocked_achievements.add(key)
-                st.session_state.coins += ach['reward']
-                st.session_state.total_coins_earned += ach['reward']
-                newly_unlocked.append(ach)
-    return newly_unlocked
+    state = get_state()
+    state.set_durations(st.session_state.input_study, st.session_state.input_break)
+    put_state(state)
+    save_fields('study_duration', 'break_duration', 'is_study', 'remaining_study_seconds', 'remaining_break_seconds')
+
+@resident
+def update_long_break():
+    state = get_state()
+    state.set_long_break_duration(st.session_state.input_long_break)
+    put_state(state)
+    save_fields('long_break_duration')
 
 def toggle_theme(item_key):
     if st.session_state.active_theme == item_key:
         st.session_state.active_theme = None
     else:
         st.session_state.active_theme = item_key
-    apply_theme()
+    save_fields('active_theme')
     st.rerun()
 
+@profiler.timed('buy_shop_logic')
 def buy_shop_logic(item_key, item_info):
     is_owned = item_key in st.session_state.owned_items
     is_theme = item_key in THEME_STYLES
@@ -187,9 +404,11 @@ def buy_shop_logic(item_key, item_info):
             st.success("✅ 소유 중")
     else:
         if st.button(f"구매 {item_info['price']}원", key=f"buy_{item_key}", use_container_width=True):
-            if st.session_state.coins >= item_info['price']:
-                st.session_state.coins -= item_info['price']
-                st.session_state.owned_items.add(item_key)
+            status = service.buy_item(store, catalog, st.session_state.user_id, item_key,
+                                      st.session_state.owned_items)
+            if status == service.PURCHASED:
+                # 잔액은 원장 기준 값으로 다시 읽음 (중복 클릭이면 차감되지 않았을 수 있음)
+                st.session_state.coins = store.balance(st.session_state.user_id)
                 if is_theme:
                     st.session_state.active_theme = item_key
                 st.success(f"{item_info['name']} 구매 완료!")
@@ -199,156 +418,198 @@ def buy_shop_logic(item_key, item_info):
 
 def get_next_session_type():
     """다음 세션이 짧은 휴식인지 긴 휴식인지 반환"""
-    if not st.session_state.cycle_mode:
-        return 'short_break'
-    count = st.session_state.current_cycle_count + 1  # 완료 후 카운트
-    if count >= st.session_state.sessions_before_long_break:
-        return 'long_break'
-    return 'short_break'
+    return get_state().next_session_type()
 
 # =====================================================
-# 4. 남은 시간 초기화 (세션 상태에 없을 때만)
+# 4. 남은 시간 초기화 (저장된 값이 없을 때만)
 # =====================================================
+profiler.mark('rollover')
 
-if 'remaining_study_seconds' not in st.session_state:
-    st.session_state.remaining_study_seconds = st.session_state.study_duration * 60
-if 'remaining_break_seconds' not in st.session_state:
-    st.session_state.remaining_break_seconds = st.session_state.break_duration * 60
-if 'remaining_long_break_seconds' not in st.session_state:
-    st.session_state.remaining_long_break_seconds = st.session_state.long_break_duration * 60
-# is_long_break 상태 추가
-if 'is_long_break' not in st.session_state:
-    st.session_state.is_long_break = False
+def fill_remaining_seconds():
+    """저장된 남은 시간이 없는(None) 세션은 세션 길이 전체로"""
+    for remaining_key, duration_key in (('remaining_study_seconds', 'study_duration'),
+                                        ('remaining_break_seconds', 'break_duration'),
+                                        ('remaining_long_break_seconds', 'long_break_duration')):
+        if st.session_state[remaining_key] is None:
+            st.session_state[remaining_key] = st.session_state[duration_key] * 60
+
+fill_remaining_seconds()
+
+# 날짜 바뀌면 오늘 통계 리셋
+_state = get_state()
+if _state.roll_over(str(clock.today())):
+    put_state(_state)
+    save_fields('today_sessions', 'today_minutes', 'last_date', 'current_streak')
 
 # =====================================================
 # 5. 타이머 로직
 # =====================================================
-
-def run_timer(is_study_session=True, is_long_break=False):
-    if is_study_session:
-        session_key = 'remaining_study_seconds'
-        duration_key = 'study_duration'
-    elif is_long_break:
-        session_key = 'remaining_long_break_seconds'
-        duration_key = 'long_break_duration'
-    else:
-        session_key = 'remaining_break_seconds'
-        duration_key = 'break_duration'
-
-    current_seconds = st.session_state[session_key]
-    timer_placeholder = st.empty()
-    progress_placeholder = st.empty()
-
-    is_golden = 'golden_font' in st.session_state.owned_items
-    has_bgm = 'focus_bgm' in st.session_state.owned_items
-    total_seconds = st.session_state[duration_key] * 60
-
-    for i in range(current_seconds, 0, -1):
-        st.session_state[session_key] = i - 1
-        minutes, seconds = divmod(i, 60)
-
-        if is_golden:
-            color = "#FFD700"
-        elif is_study_session:
-            color = "#FF4B4B"
-        elif is_long_break:
-            color = "#7B2FBE"
-        else:
-            color = "#1E88E5"
-
-        if is_study_session:
-            status_text = "📚 공부 중"
-            if has_bgm:
-                status_text += " 🎵"
-        elif is_long_break:
-            status_text = "🛌 긴 휴식 중"
+# 타이머는 마감 시각(timer_deadline)만 세션 상태에 저장하고,
+# 화면은 1초마다 다시 실행되는 프래그먼트가 벽시계 기준으로 그린다.
+# 스크립트 스레드를 붙잡고 sleep 하지 않으므로 실행 중인 타이머의 서버 비용은 거의 없다.
+# 전환 규칙은 engine.PomodoroState 에 있고 여기서는 세션 상태와 화면만 다룬다.
+
+def get_remaining_seconds():
+    """실행 중이면 마감 시각 기준, 아니면 저장된 남은 시간을 반환"""
+    return get_state().remaining(clock.time())
+
+def schedule_completion(state):
+    """서버 스케줄러에 마감 등록. 브라우저가 닫혀 있어도 마감 시각에 완료된다."""
+    user_id = st.session_state.user_id
+    scheduler.schedule(user_id, state.timer_deadline, partial(finalize_in_background, user_id, state.timer_deadline))
+
+def start_timer():
+    state = get_state()
+    service.start_timer(store, st.session_state.user_id, state, clock.time())
+    put_state(state)
+    schedule_completion(state)
+
+def stop_timer():
+    state = get_state()
+    service.stop_timer(store, st.session_state.user_id, state, clock.time())
+    put_state(state)
+    scheduler.cancel(st.session_state.user_id)
+
+def reload_profile():
+    """다른 곳(스케줄러 등)에서 처리된 결과를 저장소에서 다시 불러옴"""
+    st.session_state.profile_version = store.profile_version(st.session_state.user_id)
+    profile = store.load_profile(st.session_state.user_id)
+    for key, val in profile.items():
+        st.session_state[key] = val
+    fill_remaining_seconds()
+    st.session_state.history_loaded = False
+
+def push_notice(kind, text=None):
+    """다음 렌더링에 표시할 알림 저장 (완료 처리 후 st.rerun() 되어도 사라지지 않도록)"""
+    st.session_state.notices.append((kind, text))
+
+def show_notices():
+    for kind, text in st.session_state.notices:
+        if kind == 'balloons':
+            st.balloons()
+        elif kind == 'toast':
+            st.toast(text, icon="🎉")
+        elif kind == 'success':
+            st.success(text)
         else:
-            status_text = "☕ 휴식 중"
-
-        progress = (total_seconds - i) / total_seconds
-        progress_placeholder.progress(progress)
-        timer_placeholder.markdown(
-            f"<h2 style='text-align:center; color:{color};'>{status_text}</h2>"
-            f"<h1 style='text-align:center; color:{color}; font-size:72px;'>{minutes:02d}:{seconds:02d}</h1>",
-            unsafe_allow_html=True
-        )
-        time.sleep(1)
-
-    st.session_state.is_running = False
+            st.info(text)
+    st.session_state.notices = []
+
+@profiler.timed('complete_session')
+def complete_session():
+    """마감 시각이 지난 세션의 보상/기록 처리 (세션당 한 번만 실행)"""
+    state = get_state()
+    scheduler.cancel(st.session_state.user_id)
+    done = service.complete_session(
+        store, achievement_engine, st.session_state.user_id, state,
+        st.session_state.owned_items, st.session_state.unlocked_achievements,
+        expected_deadline=state.timer_deadline, clock=clock,
+    )
+
+    # 스케줄러가 먼저 완료했으면 결과만 읽어 온다
+    if done is None:
+        reload_profile()
+        push_notice('info', "✅ 세션이 완료되어 결과를 불러왔어요.")
+        return
+
+    put_state(state)
+    record_leaderboard(st.session_state.user_id, done)
 
     # --- 공부 완료 ---
-    if is_study_session:
-        duration_val = st.session_state[duration_key]
-        base_reward = int(duration_val * 40)
-        is_double = 'double_coin' in st.session_state.owned_items
-        reward = base_reward * 2 if is_double else base_reward
-
-        st.session_state.coins += reward
-        st.session_state.total_coins_earned += reward
-        st.session_state.total_sessions += 1
-        st.session_state.total_minutes += duration_val
-        st.session_state.today_sessions += 1
-        st.session_state.today_minutes += duration_val
-
-        # 사이클 관리
-        st.session_state.current_cycle_count += 1
-        if st.session_state.current_cycle_count >= st.session_state.sessions_before_long_break:
-            st.session_state.is_long_break = True
-            st.session_state.current_cycle_count = 0
-            st.session_state.completed_cycles += 1
-        else:
-            st.session_state.is_long_break = False
+    if done.study:
+        result = done.result
+        duration_val = result.duration
 
         # 일별 기록 저장
-        today = str(date.today())
-        if today not in st.session_state.daily_history:
-            st.session_state.daily_history[today] = {'sessions': 0, 'minutes': 0}
-        st.session_state.daily_history[today]['sessions'] += 1
-        st.session_state.daily_history[today]['minutes'] += duration_val
+        st.session_state.daily_history.add(done.day, 1, duration_val)
+        bump_history_version()
 
         # 세션 로그
-        st.session_state.session_log.append({
-            'time': datetime.now().strftime("%H:%M"),
-            'duration': duration_val,
-            'type': 'study'
-        })
+        st.session_state.session_log.append(done.entry)
 
-        st.balloons()
-        reward_text = f"**{reward} 코인** 지급!" + (" (2배!💎)" if is_double else "")
-        st.success(f"🥳 {duration_val}분 공부 완료! {reward_text}")
+        push_notice('balloons')
+        reward_text = f"**{result.reward} 코인** 지급!" + (" (2배!💎)" if result.is_double else "")
+        push_notice('success', f"🥳 {duration_val}분 공부 완료! {reward_text}")
 
-        # 업적 확인
-        newly = check_achievements()
-        for ach in newly:
-            st.toast(f"🏆 업적 달성: {ach['name']} (+{ach['reward']}코인)", icon="🎉")
+        # 업적
+        for ach in done.newly:
+            push_notice('toast', f"🏆 업적 달성: {ach['name']} (+{ach['reward']}코인)")
 
         if 'retro_alarm' in st.session_state.owned_items:
-            st.info("🚨 레트로 알림 띠리리링!")
+            push_notice('info', "🚨 레트로 알림 띠리리링!")
         else:
-            st.info("🔔 기본 알림이 울립니다.")
-
-        st.session_state.is_study = False
-        st.session_state.remaining_study_seconds = int(st.session_state.study_duration * 60)
+            push_notice('info', "🔔 기본 알림이 울립니다.")
 
     # --- 휴식 완료 ---
     else:
+        is_long_break = done.result
         break_type = "긴 휴식" if is_long_break else "휴식"
-        st.info(f"✅ {st.session_state[duration_key]}분 {break_type} 끝! 다시 집중해볼까요? 💪")
-        st.session_state.is_study = True
-        st.session_state.is_long_break = False
-        if is_long_break:
-            st.session_state.remaining_long_break_seconds = int(st.session_state.long_break_duration * 60)
-        else:
-            st.session_state.remaining_break_seconds = int(st.session_state.break_duration * 60)
+        duration = state.long_break_duration if is_long_break else state.break_duration
+        push_notice('info', f"✅ {duration}분 {break_type} 끝! 다시 집중해볼까요? 💪")
+
+def finish_if_due():
+    """마감 시각이 지났으면 완료 처리. 완료했으면 True"""
+    if not get_state().is_due(clock.time()):
+        return False
+    complete_session()
+    return True
+
+@st.fragment(run_every=1)
+@resident
+@profiler.timed('run_timer')
+def run_timer(is_study_session=True, is_long_break=False):
+    if not st.session_state.is_running:
+        return
+    if finish_if_due():
+        st.rerun()
 
-    st.rerun()
+    state = get_state()
+    _, duration_key = state.session_keys()
+    remaining = int(math.ceil(state.remaining(clock.time())))
+    total_seconds = getattr(state, duration_key) * 60
+    minutes, seconds = divmod(remaining, 60)
+
+    is_golden = 'golden_font' in st.session_state.owned_items
+    has_bgm = 'focus_bgm' in st.session_state.owned_items
+
+    if is_golden:
+        color = "#FFD700"
+    elif is_study_session:
+        color = "#FF4B4B"
+    elif is_long_break:
+        color = "#7B2FBE"
+    else:
+        color = "#1E88E5"
+
+    if is_study_session:
+        status_text = "📚 공부 중"
+        if has_bgm:
+            status_text += " 🎵"
+    elif is_long_break:
+        status_text = "🛌 긴 휴식 중"
+    else:
+        status_text = "☕ 휴식 중"
+
+    progress = min(1.0, max(0.0, (total_seconds - remaining) / total_seconds))
+    st.progress(progress)
+    st.markdown(
+        f"<h2 style='text-align:center; color:{color};'>{status_text}</h2>"
+        f"<h1 style='text-align:center; color:{color}; font-size:72px;'>{minutes:02d}:{seconds:02d}</h1>",
+        unsafe_allow_html=True
+    )
 
 # =====================================================
 # 6. 메인 레이아웃
 # =====================================================
 
+# 브라우저가 닫혀 있던 동안 마감된 세션도 다음 실행에서 한 번만 처리
+profiler.mark('finish_if_due')
+finish_if_due()
+
+profiler.mark('apply_theme')
 apply_theme()
 
+profiler.mark('metrics')
 st.title("📚 공부법은 위대하다!")
 
 # 상단 핵심 지표
@@ -363,6 +624,7 @@ with col_today:
     st.metric("📅 오늘 공부", f"{st.session_state.today_minutes}분")
 
 # 사이클 진행 표시
+profiler.mark('cycle_icons')
 if st.session_state.cycle_mode:
     cycle_count = st.session_state.current_cycle_count
     total_in_cycle = st.session_state.sessions_before_long_break
@@ -377,13 +639,21 @@ if st.session_state.cycle_mode:
 
 st.divider()
 
-tab_timer, tab_stats, tab_achievements, tab_shop = st.tabs(["⏱️ 타이머", "📊 통계", "🏆 업적", "🛒 상점"])
+# 선택된 탭만 실행 (on_change="rerun" 이면 각 탭의 .open 으로 선택 여부를 알 수 있음).
+# 통계/업적/상점은 각각 프래그먼트라 자기 위젯을 누를 때는 그 탭만 다시 실행되고,
+# 타이머 프래그먼트의 1초 틱도 다른 탭을 다시 그리지 않는다.
+tab_timer, tab_rooms, tab_stats, tab_achievements, tab_shop = st.tabs(
+    ["⏱️ 타이머", "👥 스터디룸", "📊 통계", "🏆 업적", "🛒 상점"], key='main_tab', on_change="rerun"
+)
 
 # =====================================================
 # 타이머 탭
 # =====================================================
+profiler.mark('tab_timer')
 with tab_timer:
 
+    show_notices()
+
     input_placeholder = st.empty()
     button_placeholder = st.empty()
     st.divider()
@@ -409,19 +679,25 @@ with tab_timer:
                     "🛌 긴 휴식 (분)", min_value=5, max_value=60,
                     value=int(st.session_state.long_break_duration), step=5,
                     key='input_long_break',
-                    on_change=lambda: setattr(st.session_state, 'long_break_duration', max(5, st.session_state.input_long_break)),
+                    on_change=update_long_break,
                     format="%d"
                 )
 
             col_mode, col_cycle_set = st.columns(2)
             with col_mode:
-                st.session_state.cycle_mode = st.toggle("🔄 사이클 모드 (긴 휴식 자동 전환)", value=st.session_state.cycle_mode)
+                cycle_mode = st.toggle("🔄 사이클 모드 (긴 휴식 자동 전환)", value=st.session_state.cycle_mode)
+                if cycle_mode != st.session_state.cycle_mode:
+                    st.session_state.cycle_mode = cycle_mode
+                    save_fields('cycle_mode')
             with col_cycle_set:
                 if st.session_state.cycle_mode:
-                    st.session_state.sessions_before_long_break = st.number_input(
+                    sessions_before = st.number_input(
                         "🍅 긴 휴식까지 세션 수", min_value=2, max_value=8,
                         value=st.session_state.sessions_before_long_break, step=1, format="%d"
                     )
+                    if sessions_before != st.session_state.sessions_before_long_break:
+                        st.session_state.sessions_before_long_break = sessions_before
+                        save_fields('sessions_before_long_break')
 
         # 현재 세션 상태
         if st.session_state.is_study:
@@ -448,16 +724,14 @@ with tab_timer:
             with button_placeholder.container():
                 col_reset, col_resume = st.columns(2)
                 if col_reset.button("🔄 초기화", use_container_width=True, key='reset_timer_button'):
-                    st.session_state.remaining_study_seconds = int(st.session_state.study_duration * 60)
-                    st.session_state.remaining_break_seconds = int(st.session_state.break_duration * 60)
-                    st.session_state.remaining_long_break_seconds = int(st.session_state.long_break_duration * 60)
-                    st.session_state.is_study = True
-                    st.session_state.is_long_break = False
-                    st.session_state.current_cycle_count = 0
+                    state = get_state()
+                    service.reset_timer(store, st.session_state.user_id, state)
+                    put_state(state)
+                    scheduler.cancel(st.session_state.user_id)
                     st.warning("타이머가 초기화되었습니다.")
                     st.rerun()
-                if col_resume.button(resume_text, type="warning", use_container_width=True, key='resume_button'):
-                    st.session_state.is_running = True
+                if col_resume.button(resume_text, type="primary", use_container_width=True, key='resume_button'):
+                    start_timer()
                     st.rerun()
         else:
             if st.session_state.is_study:
@@ -471,14 +745,14 @@ with tab_timer:
                 btn_key = 'start_break_button'
 
             if button_placeholder.button(btn_text, type=button_type, use_container_width=True, key=btn_key):
-                st.session_state.is_running = True
+                start_timer()
                 st.rerun()
 
     else:
         input_placeholder.empty()
 
         if button_placeholder.button("⏹️ 중지하기", use_container_width=True, key='stop_timer_button'):
-            st.session_state.is_running = False
+            stop_timer()
             st.warning("타이머가 중지되었습니다.")
             st.rerun()
 
@@ -489,11 +763,130 @@ with tab_timer:
         else:
             run_timer(is_study_session=False, is_long_break=False)
 
+# =====================================================
+# 스터디룸 탭
+# =====================================================
+# 방의 카운트다운은 허브가 tick 마다 한 번 계산해 발행한 값을 읽어서 그리기만 한다.
+# 보상은 허브가 공부 구간이 끝날 때 멤버 전원에게 한 번에 기록하므로
+# 화면은 구간이 바뀐 것을 보면 저장소에서 결과를 다시 읽는다.
+
+def phase_label(phase):
+    if phase.is_study:
+        return "📚 공부 중"
+    if phase.is_long_break:
+        return "🛌 긴 휴식 중"
+    return "☕ 휴식 중"
+
+def get_room_subscription(room_id):
+    """세션의 방 구독 (방이 바뀌면 새로 구독)"""
+    subscription = st.session_state.room_subscription
+    if subscription is None or subscription.room_id != room_id:
+        if subscription is not None:
+            subscription.close()
+        subscription = st.session_state.room_subscription = room_hub.subscribe(room_id)
+    return subscription
+
+@resident
+def join_room(room_id):
+    """방 입장. 개인 타이머가 돌고 있으면 멈춘다 (방 시계를 따름)"""
+    if st.session_state.is_running:
+        stop_timer()
+    room_hub.join(room_id, st.session_state.user_id)
+
+@resident
+def create_room():
+    name = st.session_state.input_room_name.strip() or "스터디룸"
+    if st.session_state.is_running:
+        stop_timer()
+    room_hub.create_room(
+        name, st.session_state.study_duration, st.session_state.break_duration,
+        st.session_state.long_break_duration, st.session_state.sessions_before_long_break,
+        owner=st.session_state.user_id,
+    )
+
+@resident
+def leave_room():
+    room_hub.leave(st.session_state.user_id)
+    st.session_state.room_phase_seen = None
+
+@st.fragment(run_every=1)
+@resident
+def run_room_timer(room_id):
+    tick = get_room_subscription(room_id).latest
+    if tick is None:
+        st.info("방 시계를 준비하고 있어요.")
+        return
+
+    seen = st.session_state.room_phase_seen
+    st.session_state.room_phase_seen = (room_id, tick.phase.index, tick.phase.is_study)
+    if seen is not None and seen[0] == room_id and seen[1] != tick.phase.index and seen[2]:
+        reload_profile()
+        push_notice('balloons')
+        push_notice('toast', "👥 방 공부 세션 완료! 보상이 지급됐어요.")  # 토스트는 어느 탭에서든 보임
+        st.rerun()
+
+    phase = tick.phase
+    remaining = int(math.ceil(tick.remaining))
+    total_seconds = phase.deadline - phase.start
+    minutes, seconds = divmod(remaining, 60)
+    color = "#FF4B4B" if phase.is_study else "#7B2FBE" if phase.is_long_break else "#1E88E5"
+
+    st.progress(min(1.0, max(0.0, (total_seconds - remaining) / total_seconds)))
+    st.markdown(
+        f"<h2 style='text-align:center; color:{color};'>{phase_label(phase)}</h2>"
+        f"<h1 style='text-align:center; color:{color}; font-size:72px;'>{minutes:02d}:{seconds:02d}</h1>",
+        unsafe_allow_html=True
+    )
+    cycle_icons = "".join("🍅 " if i < phase.cycle_count else "⬜ " for i in range(tick.sessions_before_long_break))
+    st.caption(f"{cycle_icons} · 함께 공부 중 {tick.members}명")
+
+@st.fragment
+@resident
+def render_rooms():
+    st.subheader("👥 스터디룸")
+    room_id = room_hub.room_of(st.session_state.user_id)
+
+    if room_id is not None:
+        tick = room_hub.latest(room_id)
+        if tick is not None:
+            st.markdown(f"### {tick.name}")
+        run_room_timer(room_id)
+        st.button("🚪 방 나가기", key='leave_room_button', on_click=leave_room, use_container_width=True)
+        return
+
+    st.caption("같은 방 사람들은 같은 뽀모도로 사이클을 따릅니다. 공부 구간이 끝나면 멤버 모두에게 보상이 지급돼요.")
+    rooms = sorted(room_hub.rooms(), key=lambda t: (-t.members, t.name))
+    if not rooms:
+        st.info("열려 있는 방이 없습니다. 새로 만들어 보세요!")
+    for tick in rooms:
+        col_name, col_phase, col_join = st.columns([3, 2, 1])
+        col_name.markdown(f"**{tick.name}** · {tick.members}명")
+        minutes, seconds = divmod(int(math.ceil(tick.remaining)), 60)
+        col_phase.caption(f"{phase_label(tick.phase)} · {minutes:02d}:{seconds:02d} 남음")
+        col_join.button("입장", key=f"join_room_{tick.room_id}", on_click=join_room, args=(tick.room_id,),
+                        use_container_width=True)
+
+    st.divider()
+    st.text_input("방 이름", key='input_room_name', max_chars=30, placeholder="스터디룸")
+    st.caption(f"지금 타이머 설정으로 만들어집니다: 공부 {st.session_state.study_duration}분 · "
+               f"휴식 {st.session_state.break_duration}분 · 긴 휴식 {st.session_state.long_break_duration}분 · "
+               f"{st.session_state.sessions_before_long_break}세션마다 긴 휴식")
+    st.button("➕ 방 만들기", key='create_room_button', on_click=create_room, type="primary",
+              use_container_width=True)
+
+profiler.mark('tab_rooms')
+with tab_rooms:
+    if tab_rooms.open:
+        render_rooms()
+
 # =====================================================
 # 통계 탭
 # =====================================================
-with tab_stats:
+@st.fragment
+@resident
+def render_stats():
     st.subheader("📊 나의 공부 통계")
+    ensure_history_loaded()
 
     # 전체 통계
     col1, col2, col3, col4 = st.columns(4)
@@ -522,12 +915,35 @@ with tab_stats:
 
     st.divider()
 
-    # 최근 세션 로그
+    # 집중 패턴 (완료할 때 갱신해 둔 값이라 기록 양과 상관없이 바로 읽음)
+    st.markdown("### ⏰ 집중 패턴")
+    state = get_state()
+    col_p1, col_p2 = st.columns(2)
+    with col_p1:
+        best = st.session_state.best_hour
+        st.metric("가장 많이 공부한 시간대", f"{best}시 ~ {best + 1}시" if best != NO_HOUR else "-")
+    with col_p2:
+        st.metric("평균 세션 길이", f"{state.avg_session_minutes:.1f}분")
+    if best != NO_HOUR:
+        st.bar_chart({'세션': st.session_state.hour_sessions}, x_label="시", y_label="세션", height=180)
+
+    st.divider()
+
+    # 최근 세션 로그 (페이지 단위로 읽기)
     st.markdown("### 📋 최근 세션 기록")
-    if st.session_state.session_log:
-        log_data = list(reversed(st.session_state.session_log[-10:]))
+    session_log = st.session_state.session_log
+    if session_log:
+        page_count = (len(session_log) + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE
+        page = 1
+        if page_count > 1:
+            page = st.number_input("페이지", min_value=1, max_value=page_count, value=1, step=1,
+                                   key='session_log_page', format="%d")
+        log_data = get_session_log_page(page - 1)
         for entry in log_data:
-            st.markdown(f"- **{entry['time']}** — {entry['duration']}분 공부 완료")
+            st.markdown(f"- **{entry['time']}** — {entry['duration']}분 "
+                        f"{LOG_TYPE_LABELS.get(entry['type'], entry['type'])} 완료")
+        if page_count > 1:
+            st.caption(f"{page} / {page_count} 페이지 · 총 {len(session_log)}회")
     else:
         st.info("아직 완료한 세션이 없어요. 지금 시작해볼까요? 🚀")
 
@@ -536,19 +952,173 @@ with tab_stats:
     # 일별 기록
     st.markdown("### 📆 일별 기록")
     if st.session_state.daily_history:
-        for day, data in sorted(st.session_state.daily_history.items(), reverse=True)[:7]:
-            h = data['minutes'] // 60
-            m = data['minutes'] % 60
-            bar_len = min(data['sessions'], 10)
+        summary = get_history_summary(
+            st.session_state.user_id, st.session_state.history_version,
+            st.session_state.last_date, st.session_state.daily_history,
+        )
+        col_s1, col_s2, col_s3 = st.columns(3)
+        with col_s1:
+            st.metric("🔥 연속 공부", f"{st.session_state.current_streak}일")
+        with col_s2:
+            st.metric("🏅 최장 연속", f"{st.session_state.longest_streak}일")
+        with col_s3:
+            st.metric("📈 최근 7일 평균", f"{summary['avg_7']:.0f}분")
+
+        # 기간 합계 (누적 합 배열이라 구간 길이와 상관없이 바로 계산)
+        history = st.session_state.daily_history
+        today = date.fromisoformat(st.session_state.last_date)
+        _, month_minutes = history.total(today.replace(day=1), today)
+        _, year_minutes = history.total(today.replace(month=1, day=1), today)
+        col_r1, col_r2, col_r3 = st.columns(3)
+        with col_r1:
+            st.metric("🗓️ 이번 달", f"{month_minutes // 60}시간 {month_minutes % 60}분")
+        with col_r2:
+            st.metric("📅 올해", f"{year_minutes // 60}시간 {year_minutes % 60}분")
+        with col_r3:
+            st.metric("♾️ 전체", f"{st.session_state.total_minutes // 60}시간 {st.session_state.total_minutes % 60}분")
+
+        render_heatmap(history, today)
+
+        for day, data in summary['recent_days'].iterrows():
+            h, m = divmod(int(data['minutes']), 60)
+            bar_len = min(int(data['sessions']), 10)
             bar = "🟩" * bar_len + "⬜" * (10 - bar_len)
-            st.markdown(f"**{day}** | {data['sessions']}세션 | {h}시간 {m}분  \n{bar}")
+            st.markdown(f"**{day.date()}** | {data['sessions']}세션 | {h}시간 {m}분  \n{bar}")
+
+        period = st.radio("기간별 공부 시간(분)", ["주별", "월별"], horizontal=True, key='stats_period')
+        rollup = summary['weekly'] if period == "주별" else summary['monthly']
+        st.bar_chart(rollup['minutes'].tail(12))
     else:
-        st.info("아직 기록이 없습니다.")
+        st.info(f"{st.session_state.history_since} 이후 기록이 없습니다." if not st.session_state.history_complete
+                else "아직 기록이 없습니다.")
+
+    if not st.session_state.history_complete:
+        st.caption(f"{st.session_state.history_since} 이후 기록 기준")
+        st.button("⏬ 이전 기록 더 불러오기", key='load_older_history', on_click=load_older_history)
+
+def render_heatmap(history, today):
+    """최근 1년 공부 시간 히트맵 (주 단위 열, 요일 단위 행)"""
+    cells = history.heatmap(today, weeks=HISTORY_PAGE_WEEKS)
+    st.vega_lite_chart({
+        'data': {'values': [
+            {'week': str(week), 'weekday': "월화수목금토일"[weekday], 'day': str(day), 'minutes': minutes}
+            for week, weekday, day, minutes in cells
+        ]},
+        'mark': {'type': 'rect', 'cornerRadius': 2},
+        'encoding': {
+            'x': {'field': 'week', 'type': 'ordinal', 'axis': None},
+            'y': {'field': 'weekday', 'type': 'ordinal', 'sort': list("월화수목금토일"), 'title': None},
+            'color': {'field': 'minutes', 'type': 'quantitative', 'title': '분',
+                      'scale': {'scheme': 'greens', 'domainMin': 0}},
+            'tooltip': [{'field': 'day', 'title': '날짜'}, {'field': 'minutes', 'title': '분'}],
+        },
+        'config': {'view': {'stroke': None}},
+        'height': 140,
+    }, use_container_width=True)
+
+@st.fragment
+@resident
+def render_leaderboard():
+    """랭킹 보드. 유지 중인 정렬 목록에서 앞부분과 내 순위만 읽는다."""
+    st.markdown("### 🏅 랭킹")
+    board = st.segmented_control("보드", list(BOARDS), format_func=BOARDS.get, default='today',
+                                 key='leaderboard_board', label_visibility='collapsed') or 'today'
+    user_id = st.session_state.user_id
+    today = clock.today()
+    unit = "세트" if board == 'cycles' else "분"
+    rows = leaderboard.top(board, 10, today)
+    if not rows:
+        st.info("아직 랭킹에 오른 사람이 없어요.")
+        return
+    for rank, other, score in rows:
+        medal = {1: "🥇", 2: "🥈", 3: "🥉"}.get(rank, f"{rank}.")
+        name = "**나**" if other == user_id else f"공부러 {other[:6]}"
+        st.markdown(f"{medal} {name} — {score:,}{unit}")
+    my_rank, my_score, size = leaderboard.rank(board, user_id, today)
+    if my_rank is None:
+        st.caption(f"아직 이 보드에 기록이 없어요 · 참가자 {size:,}명")
+    else:
+        st.caption(f"내 순위 {my_rank:,}위 / {size:,}명 · {my_score:,}{unit}")
+
+DATASET_LABELS = {'sessions': "세션 기록", 'daily': "일별 기록"}
+
+@resident
+def run_import():
+    """업로드한 세션 기록 가져오기. 결과는 알림으로 남기고 요약/기록을 다시 읽는다."""
+    uploaded = st.session_state.import_file
+    if uploaded is None:
+        return
+    user_id = st.session_state.user_id
+    uploaded.seek(0)
+    try:
+        result = import_history(store, achievement_engine, user_id, uploaded, uploaded.name,
+                                today=clock.today(), now=clock.time())
+    except ValueError as e:   # 필요한 열이 없거나(ImportFormatError) 파일을 읽을 수 없음
+        push_notice('info', f"⚠️ 가져오지 못했어요: {e}")
+        return
+    for day, minutes in result['added'].items():
+        leaderboard.record(user_id, day, minutes)
+    if result['imported']:
+        reload_profile()
+    for ach in result['achievements']:
+        push_notice('toast', f"🏆 업적 달성: {ach['name']} (+{ach['reward']}코인)")
+    st.session_state.import_result = result
+    st.session_state.import_rerun = bool(result['imported'])   # 상단 지표까지 다시 그리기
+
+@st.fragment
+@resident
+def render_data_transfer():
+    """기록 내보내기/가져오기 (묶음 단위로 읽고 씀)"""
+    st.markdown("### 💾 기록 내보내기 / 가져오기")
+    user_id = st.session_state.user_id
+    col_dataset, col_format = st.columns(2)
+    dataset = col_dataset.radio("내보낼 기록", list(DATASET_LABELS), format_func=DATASET_LABELS.get,
+                                horizontal=True, key='export_dataset')
+    fmt = col_format.radio("형식", FORMATS, format_func=str.upper, horizontal=True, key='export_format')
+    st.download_button(
+        "⬇️ 내보내기", data=lambda: export_history(store, user_id, dataset, fmt),
+        file_name=f"study-{dataset}-{clock.today()}.{fmt}", mime=MIME_TYPES[fmt],
+        key='export_button', use_container_width=True,
+    )
+
+    st.file_uploader("세션 기록 가져오기 (day, time, duration[, type] 열)", type=list(FORMATS),
+                     key='import_file')
+    st.button("⬆️ 가져오기", key='import_button', on_click=run_import, use_container_width=True,
+              disabled=st.session_state.get('import_file') is None)
+    if st.session_state.pop('import_rerun', False):
+        st.rerun()
+    result = st.session_state.get('import_result')
+    if result is not None:
+        st.success(f"{result['imported']:,}개 세션을 가져왔어요. "
+                   f"(읽은 행 {result['read']:,} · 중복 {result['duplicates']:,} · 잘못된 행 {result['invalid']:,}"
+                   f" · 다른 기록과 겹치거나 하루 상한을 넘은 행 {result['rejected']:,})")
+
+def render_widget_link():
+    """위젯(JSON API) 연결 정보. API 서버와 같은 STUDY_API_SECRET 이 있을 때만"""
+    secret = os.environ.get(SECRET_ENV)
+    if not secret:
+        return
+    user_id = st.session_state.user_id
+    with st.expander("📱 위젯 연결"):
+        st.caption("위젯 설정에 아래 사용자 ID 와 토큰을 넣으세요. 토큰은 다른 사람에게 보여 주지 마세요.")
+        st.code(f"user: {user_id}\ntoken: {user_token(secret, user_id)}", language=None)
+
+profiler.mark('tab_stats')
+with tab_stats:
+    if tab_stats.open:
+        render_stats()
+        st.divider()
+        render_leaderboard()
+        st.divider()
+        render_data_transfer()
+        render_widget_link()
 
 # =====================================================
 # 업적 탭
 # =====================================================
-with tab_achievements:
+@st.fragment
+@resident
+def render_achievements():
     st.subheader("🏆 업적")
 
     unlocked = st.session_state.unlocked_achievements
@@ -573,10 +1143,17 @@ with tab_achievements:
             else:
                 st.caption(reward_text)
 
+profiler.mark('tab_achievements')
+with tab_achievements:
+    if tab_achievements.open:
+        render_achievements()
+
 # =====================================================
 # 상점 탭
 # =====================================================
-with tab_shop:
+@st.fragment
+@resident
+def render_shop():
     st.subheader("🛒 아이템 상점")
     st.caption(f"현재 잔액: **{st.session_state.coins:,}원**")
 
@@ -600,3 +1177,54 @@ with tab_shop:
             st.caption(item_info['effect'])
         with col2:
             buy_shop_logic(item_key, item_info)
+
+profiler.mark('tab_shop')
+with tab_shop:
+    if tab_shop.open:
+        render_shop()
+
+# 실행이 끝날 때 바뀐 상태를 외부 저장소에 기록 (st.rerun() 으로 끊긴 실행은 다음 실행이 기록)
+profiler.mark('sync_state')
+sync_state()
+
+# 세션 메모리 계정. 타이머/방 시계 프래그먼트가 도는 동안은 내려쓰지 않는다.
+# 세션 예산을 넘으면 통계 탭에서 다시 불러올 수 있는 기록부터 비운다.
+# (ctx.session_state 는 관리 스레드에서도 이 세션을 가리킨다. st.session_state 는 실행 중인 스레드 기준)
+profiler.mark('account_memory')
+_ctx = get_script_run_ctx()
+if _ctx is not None:
+    session_bytes = session_memory.account(
+        _ctx.session_id, _ctx.session_state, st.session_state.to_dict(), st.session_state.user_id,
+        pinned=st.session_state.is_running or st.session_state.room_subscription is not None,
+    )
+    if session_bytes > session_memory.session_budget:
+        release_history()
+
+# =====================================================
+# 프로파일 패널 (STUDY_PROFILE=panel)
+# =====================================================
+def render_profile_panel():
+    """직전 재실행의 구간별 시간과 프로세스 누적 통계"""
+    last_run, elements = st.session_state.get('profile_last_run', ([], 0))
+    stats, counters = profiler.snapshot()
+    with st.expander("🔧 재실행 프로파일"):
+        if last_run:
+            st.caption(f"직전 재실행 · 화면 요소 {elements}개 · 이 세션 재실행 {st.session_state.profile_reruns}회")
+            st.table([{'구간': name, 'ms': round(ns / 1e6, 2)} for name, ns in last_run])
+        st.caption(" · ".join(f"{name} {value:,}" for name, value in counters.items()))
+        st.table([
+            {'이름': name, '횟수': count, '평균 ms': round(total / count, 2), '최대 ms': round(peak, 2)}
+            for name, (count, total, peak) in sorted(stats.items(), key=lambda kv: -kv[1][1])
+        ])
+        memory = session_memory.report()
+        st.caption(f"세션 메모리 {memory['bytes'] / 1024:,.1f}KB / 예산 {memory['budget'] / 2 ** 20:,.0f}MB · "
+                   f"메모리 세션 {memory['sessions']:,}개 · 디스크로 내린 세션 {memory['spilled']:,}개")
+        st.table([{'키': key, '바이트': size}
+                  for key, size in list(session_memory.sizes(current_session_id()).items())[:15]])
+
+if 'panel' in profiler.sinks:
+    profiler.mark('profile_panel')
+    render_profile_panel()
+
+if profiler.enabled:
+    st.session_state.profile_last_run = profiler.end_run()
@@ -0,0 +1,77 @@
+"""업적 확인 비용 벤치마크: 기존 람다 전체 순회 vs 기준값 인덱스
+
+    python bench/bench_achievements.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from achievements import AchievementEngine  # noqa: E402
+
+METRICS = ['total_sessions', 'total_minutes', 'total_coins_earned', 'today_sessions', 'completed_cycles']
+COMPLETIONS = 2000
+
+
+def make_catalog(size, seed=0):
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(size):
+        metric = rng.choice(METRICS)
+        catalog[f"ach_{i}"] = {
+            'name': f"업적 {i}", 'desc': '', 'metric': metric,
+            'threshold': rng.randint(1, 1_000_000), 'reward': rng.randint(1, 1000),
+        }
+    return catalog
+
+
+def completions():
+    """25분 공부 완료를 반복할 때의 (완료 전, 완료 후) 지표"""
+    stats = dict.fromkeys(METRICS, 0)
+    for _ in range(COMPLETIONS):
+        before = dict(stats)
+        stats['total_sessions'] += 1
+        stats['total_minutes'] += 25
+        stats['total_coins_earned'] += 1000
+        stats['today_sessions'] += 1
+        stats['completed_cycles'] = stats['total_sessions'] // 4
+        yield before, dict(stats)
+
+
+def bench_linear(catalog):
+    # 기존 방식: 매 완료마다 잠기지 않은 모든 업적의 조건 람다 호출
+    conditions = {k: (lambda s, m=a['metric'], t=a['threshold']: s[m] >= t) for k, a in catalog.items()}
+    unlocked = set()
+    start = time.perf_counter()
+    for _, stats in completions():
+        for key, cond in conditions.items():
+            if key not in unlocked and cond(stats):
+                unlocked.add(key)
+    return time.perf_counter() - start, len(unlocked)
+
+
+def bench_indexed(catalog):
+    engine = AchievementEngine(catalog)
+    unlocked = set()
+    start = time.perf_counter()
+    for before, stats in completions():
+        for metric in engine.metrics:
+            for key in engine.crossed(metric, before[metric], stats[metric]):
+                unlocked.add(key)
+    return time.perf_counter() - start, len(unlocked)
+
+
+def main():
+    print(f"{'catalog':>8} | {'linear us/op':>12} | {'indexed us/op':>13} | unlocked")
+    for size in (10, 100, 1000, 10000):
+        catalog = make_catalog(size)
+        linear, n_linear = bench_linear(catalog)
+        indexed, n_indexed = bench_indexed(catalog)
+        assert n_linear == n_indexed
+        print(f"{size:>8} | {linear / COMPLETIONS * 1e6:>12.2f} | {indexed / COMPLETIONS * 1e6:>13.2f} | {n_indexed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""JSON API 벤치마크: keep-alive 연결 여러 개로 요청을 보내 요청당 지연(p50/p95)과 처리량을 잰다
+
+    python bench/bench_api.py
+    python bench/bench_api.py --users 500 --clients 64 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api import Api, serve, user_token  # noqa: E402
+from catalog import CatalogSource  # noqa: E402
+from clock import system_clock  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+
+class Client:
+    """keep-alive 연결 하나"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        auth = f"Authorization: Bearer {token}\r\n" if token else ''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                          f"{auth}Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        length = next(int(line.split(':')[1]) for line in lines if line.lower().startswith('content-length'))
+        return int(lines[0].split()[1]), json.loads(await self.reader.readexactly(length))
+
+
+def make_request(rng, users, counter):
+    """읽기 위주의 위젯 트래픽 (조회 70%, 타이머 15%, 세션 동기화 10%, 구매 5%). users 는 {user_id: 토큰}"""
+    user_id = rng.choice(list(users))
+    token = users[user_id]
+    roll = rng.random()
+    if roll < 0.6:
+        return 'read', 'GET', f"/v1/users/{user_id}", None, token
+    if roll < 0.7:
+        return 'history', 'GET', f"/v1/users/{user_id}/history?days=30", None, token
+    if roll < 0.85:
+        action = rng.choice(('start', 'stop'))
+        return action, 'POST', f"/v1/users/{user_id}/timer/{action}", None, token
+    if roll < 0.95:
+        end = time.time() - rng.randrange(86400)
+        sessions = [{'id': f"{counter}-{i}", 'end': end - i * 1800, 'duration': 25} for i in range(5)]
+        return 'sync', 'POST', f"/v1/users/{user_id}/sessions", {'sessions': sessions}, token
+    return ('buy', 'POST', f"/v1/users/{user_id}/purchases",
+            {'item': rng.choice(('golden_font', 'double_coin'))}, token)
+
+
+async def run(api, users, clients, total, seed):
+    server = await serve(api, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    conns = [Client(*await asyncio.open_connection('127.0.0.1', port)) for _ in range(clients)]
+    rng = random.Random(seed)
+    latencies = {}
+    statuses = {}
+    counter = iter(range(total))
+
+    async def worker(client):
+        for n in counter:
+            kind, method, path, body, token = make_request(rng, users, n)
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, body, token)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in conns))
+    elapsed = time.perf_counter() - start
+    for client in conns:
+        client.writer.close()
+        await client.writer.wait_closed()
+    await asyncio.sleep(0.05)       # 서버 쪽 연결 처리가 EOF 를 보고 끝날 때까지
+    server.close()
+    await server.wait_closed()
+    return latencies, statuses, elapsed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16, help="동시 keep-alive 연결 수")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--pool', type=int, default=8, help="저장소 스레드 풀 크기")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    store = open_storage(os.path.join(tempfile.mkdtemp(prefix='study-bench-'), 'study.db'))
+    today = str(system_clock.today())
+    secret = os.urandom(16).hex()
+    users = {user_id: user_token(secret, user_id) for user_id in (f"api-{i:05d}" for i in range(args.users))}
+    for user_id in users:
+        store.create_profile(user_id, coins=20_000, last_date=today, remaining_study_seconds=1500,
+                             remaining_break_seconds=300, remaining_long_break_seconds=900)
+    api = Api(store, CatalogSource(), system_clock, secret, args.pool).start()
+    try:
+        latencies, statuses, elapsed = asyncio.run(run(api, users, args.clients, args.requests, args.seed))
+    finally:
+        api.close()
+
+    print(f"{args.requests:,} requests over {args.clients} connections in {elapsed:.2f}s "
+          f"({args.requests / elapsed:,.0f} req/s)  status {dict(sorted(statuses.items()))}")
+    print(f"  {'kind':<8} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    everything = []
+    for kind, values in sorted(latencies.items()):
+        everything += values
+        print(f"  {kind:<8} {len(values):>7,} {percentile(values, 0.5) * 1000:>8.2f} "
+              f"{percentile(values, 0.95) * 1000:>8.2f} {statistics.mean(values) * 1000:>8.2f}")
+    print(f"  {'all':<8} {len(everything):>7,} {percentile(everything, 0.5) * 1000:>8.2f} "
+          f"{percentile(everything, 0.95) * 1000:>8.2f} {statistics.mean(everything) * 1000:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""헤드리스 뽀모도로 엔진 전환 속도 벤치마크
+
+    python bench/bench_engine.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import PomodoroState  # noqa: E402
+
+CYCLES = 200_000
+
+
+def main():
+    state = PomodoroState(last_date='2024-01-01')
+    owned = {'double_coin'}
+    now = 0.0
+    transitions = 0
+    start = time.perf_counter()
+    for _ in range(CYCLES):
+        # 시작 → (마감) → 완료 를 공부/휴식 한 번씩
+        state.start(now)
+        now = state.timer_deadline
+        state.complete(owned)
+        state.start(now)
+        now = state.timer_deadline
+        state.complete(owned)
+        transitions += 4
+    elapsed = time.perf_counter() - start
+    print(f"{transitions:,} transitions in {elapsed:.2f}s "
+          f"({transitions / elapsed / 1e6:.2f}M transitions/s)")
+    print(f"sessions={state.total_sessions:,} cycles={state.completed_cycles:,} coins={state.coins:,}")
+
+
+if __name__ == '__main__':
+    main()
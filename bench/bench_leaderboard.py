@@ -0,0 +1,54 @@
+"""랭킹 인덱스 벤치마크: 사용자 수별 갱신/top-k/내 순위 시간
+
+    python bench/bench_leaderboard.py
+    python bench/bench_leaderboard.py --users 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard  # noqa: E402
+
+OPS = 100_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    users = [f"user-{i}" for i in range(args.users)]
+    start = time.perf_counter()
+    board = Leaderboard('2024-01-03', total_minutes={u: rng.randint(0, 50_000) for u in users})
+    print(f"build {args.users:,} users: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    start = time.perf_counter()
+    for _ in range(OPS):
+        board.record(rng.choice(users), '2024-01-03', 25, rng.random() < 0.25)
+    elapsed = time.perf_counter() - start
+    print(f"record: {elapsed / OPS * 1e6:.1f}us/op")
+
+    start = time.perf_counter()
+    for _ in range(OPS):
+        board.rank('all', rng.choice(users))
+    elapsed = time.perf_counter() - start
+    print(f"rank: {elapsed / OPS * 1e6:.1f}us/op")
+
+    start = time.perf_counter()
+    for _ in range(OPS):
+        board.top('all', 10)
+    elapsed = time.perf_counter() - start
+    print(f"top 10: {elapsed / OPS * 1e6:.1f}us/op")
+
+    start = time.perf_counter()
+    board.top('today', 10, '2024-01-04')
+    print(f"day rollover: {(time.perf_counter() - start) * 1e6:.1f}us")
+
+
+if __name__ == '__main__':
+    main()
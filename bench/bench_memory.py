@@ -0,0 +1,86 @@
+"""세션 메모리 벤치마크: 세션 하나의 상주 크기 vs 디스크 스냅샷 크기, 내려쓰기/되살리기 비용
+
+    python bench/bench_memory.py
+    python bench/bench_memory.py --sessions 5000 --days 365
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analytics import empty_hours  # noqa: E402
+from history import DailyHistory  # noqa: E402
+from session_log import SessionLog  # noqa: E402
+from session_memory import SessionMemory, measure  # noqa: E402
+from state_store import SQLiteBackend, StateStore, encode, snapshot  # noqa: E402
+
+
+class FakeSessionState(dict):
+    """세션 상태 대신 쓰는 dict (키 지우기/읽기만 필요)"""
+
+
+def make_state(user_no, days):
+    today = date.today()
+    history = DailyHistory.from_mapping({
+        str(today - timedelta(days=i)): {'sessions': 4, 'minutes': 100} for i in range(days) if i % 3})
+    log = SessionLog.from_entries([{'time': '09:00', 'duration': 25, 'type': 'study'}] * 50)
+    state = FakeSessionState(
+        coins=12_000, is_running=False, is_study=True, is_long_break=False,
+        owned_items={'golden_font', 'double_coin', 'sky_theme'}, active_theme='sky_theme',
+        study_duration=25, break_duration=5, long_break_duration=15, sessions_before_long_break=4,
+        current_cycle_count=1, completed_cycles=120, total_sessions=480, total_minutes=12_000,
+        total_coins_earned=500_000, today_sessions=2, today_minutes=50, last_date=str(today),
+        unlocked_achievements={'first_study', 'five_sessions', 'ten_sessions', 'one_hour', 'coin_100'},
+        cycle_mode=True, timer_deadline=None, notices=[],
+        remaining_study_seconds=1500, remaining_break_seconds=300, remaining_long_break_seconds=900,
+        current_streak=5, longest_streak=21, last_study_date=str(today), hour_sessions=empty_hours(),
+        best_hour=9, daily_history=history, session_log=log, history_loaded=True, history_complete=True,
+        history_since=str(today - timedelta(days=days)), history_version=time.time_ns(),
+        room_subscription=None, room_phase_seen=None, user_id=f"user-{user_no}",
+    )
+    state['state_synced'] = snapshot(state)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365, help="세션마다 불러온 일별 기록 일수")
+    args = parser.parse_args()
+
+    states = [make_state(i, args.days) for i in range(args.sessions)]
+    resident = sum(sum(measure(state).values()) for state in states) / len(states)
+    record = len(encode(snapshot(states[0])))
+    print(f"resident session: {resident / 1024:.1f}KB   spill record: {record}B   "
+          f"({resident / record:.0f}x smaller on disk)")
+    print(f"sessions per GB: {2 ** 30 / resident:,.0f} resident")
+
+    path = os.path.join(tempfile.mkdtemp(prefix='study-bench-'), 'spill.db')
+    memory = SessionMemory(StateStore(SQLiteBackend(path), prefix='spill:'), list(states[0]), idle_seconds=0)
+    start = time.perf_counter()
+    for i, state in enumerate(states):
+        memory.account(f"s{i}", state, state, state['user_id'])
+    elapsed = time.perf_counter() - start
+    print(f"account: {elapsed / len(states) * 1e6:.0f}us per rerun")
+
+    start = time.perf_counter()
+    spilled = memory.sweep()
+    elapsed = time.perf_counter() - start
+    left = sum(sum(measure(state).values()) for state in states) / len(states)
+    print(f"spill {spilled:,} sessions: {elapsed * 1000:.0f}ms ({elapsed / spilled * 1e6:.0f}us each), "
+          f"left in memory {left:.0f}B per session, spill file {os.path.getsize(path) / 1024:,.0f}KB")
+
+    start = time.perf_counter()
+    for i in range(len(states)):
+        memory.restore(f"s{i}")
+    elapsed = time.perf_counter() - start
+    print(f"restore: {elapsed / len(states) * 1e6:.0f}us per session")
+
+
+if __name__ == '__main__':
+    main()
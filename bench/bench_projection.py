@@ -0,0 +1,68 @@
+"""이벤트 재생 벤치마크: 시뮬레이션으로 만든 DB 를 처음부터/이어서 재생하는 시간을 잰다
+
+    python bench/bench_projection.py
+    python bench/bench_projection.py --users 5000 --days 90 --workers 8
+
+1. bench/simulate.py 와 같은 경로(타이머 → 완료 → 구매)로 DB 를 만든다
+2. 전체 재생을 저장 없이 돌려 지금 요약 필드와 다른 사용자 수를 본다 (0 이어야 한다)
+3. 처음부터 재생: 프로세스 1개 / --workers 개
+4. 며칠 더 시뮬레이션한 뒤 스냅샷 이후만 이어서 재생
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import projection  # noqa: E402
+from simulate import Simulation  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+
+def show(label, summary):
+    seconds = summary['seconds']
+    print(f"  {label:<22} {seconds:>7.2f}s  {summary['users']:>7,} users  {summary['events']:>9,} events "
+          f"({summary['events'] / max(seconds, 1e-9):>10,.0f} events/s)  "
+          f"from start {summary['from_start']:,}, applied {summary['applied']:,}"
+          + (f", changed {summary['changed']:,}" if 'changed' in summary else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--more-days', type=int, default=3, help="이어서 재생하기 전에 더 시뮬레이션할 날 수")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=projection.CHUNK_USERS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="DB 경로 (기본: 임시 파일)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='study-bench-'), 'study.db')
+    sim = Simulation(db_path, args.users, date.today() - timedelta(days=args.days + args.more_days), args.seed)
+    wall = time.perf_counter()
+    sim.run(args.days)
+    print(f"simulated {args.users:,} users x {args.days} days ({sim.completions:,} completions) "
+          f"in {time.perf_counter() - wall:.1f}s: {db_path}")
+
+    store = open_storage(db_path)
+    projector = projection.open_projector()
+    # 처음부터 재생은 스냅샷을 새로 쓰므로 스냅샷 이후 재생은 마지막에 잰다
+    show('dry run (compare)', projection.rebuild(store, projector, full=True, apply=False, chunk_users=args.chunk))
+    show('full, 1 process', projection.rebuild(store, projector, full=True, chunk_users=args.chunk))
+    show(f"full, {args.workers} processes", projection.rebuild(
+        store, projector, full=True, workers=args.workers, chunk_users=args.chunk))
+
+    sim.run(args.more_days)
+    show(f"catch-up +{args.more_days} days", projection.rebuild(
+        store, projector, workers=args.workers, chunk_users=args.chunk))
+    show('dry run (compare)', projection.rebuild(store, projector, full=True, apply=False, chunk_users=args.chunk))
+
+
+if __name__ == '__main__':
+    main()
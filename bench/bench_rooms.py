@@ -0,0 +1,63 @@
+"""스터디룸 허브 벤치마크: tick 비용(방 수, 구독자 수)과 멤버 일괄 보상 기록
+
+    python bench/bench_rooms.py
+    python bench/bench_rooms.py --rooms 1000 --viewers 100 --members 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import load_catalog  # noqa: E402
+from rooms import RoomHub  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--viewers', type=int, default=50, help="방마다 구독자 수")
+    parser.add_argument('--members', type=int, default=300, help="일괄 보상을 받는 방의 멤버 수")
+    args = parser.parse_args()
+
+    store = open_storage(os.path.join(tempfile.mkdtemp(prefix='study-bench-'), 'study.db'))
+    engine = load_catalog().engine
+    now = [time.time()]
+    hub = RoomHub(store, lambda: engine, clock=lambda: now[0])
+
+    for i in range(args.rooms):
+        store.create_profile(f"owner-{i}", last_date='2024-01-01')
+        room_id = hub.create_room(f"room-{i}", owner=f"owner-{i}")
+        for _ in range(args.viewers):
+            hub.subscribe(room_id)
+
+    ticks = 100
+    start = time.perf_counter()
+    for _ in range(ticks):
+        now[0] += 1
+        hub.tick()
+    elapsed = time.perf_counter() - start
+    print(f"{args.rooms} rooms x {args.viewers} viewers: {elapsed / ticks * 1000:.2f}ms per tick")
+
+    # 멤버 많은 방 하나의 공부 구간 완료
+    members = [f"member-{i}" for i in range(args.members)]
+    for user_id in members:
+        store.create_profile(user_id, last_date='2024-01-01')
+    room_id = hub.create_room("big", study_duration=1, owner=members[0])
+    for user_id in members[1:]:
+        hub.join(room_id, user_id)
+    hub.tick()
+    now[0] += 61
+    start = time.perf_counter()
+    hub.tick()
+    elapsed = time.perf_counter() - start
+    print(f"completion for {args.members} members: {elapsed * 1000:.1f}ms "
+          f"(coins={store.balance(members[-1])}, balance ok={store.verify_balance(members[-1])})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""동시 사용자 부하 테스트 / 재실행 지연 벤치마크 (Streamlit AppTest 기반)
+
+사용자마다 AppTest 세션을 하나씩 만들고 실제 사용 흐름을 재생한다:
+공부 시작 → 세션 완료 → 코인 2배 구매 → 스카이 테마 구매/적용 → 통계 탭 열기
+
+    python bench/load_test.py                      # 1, 10, 100 명
+    python bench/load_test.py --users 1,10,100,1000 --workers 8
+    python bench/load_test.py --save-baseline      # bench/baseline.json 갱신
+
+세션은 worker 프로세스들에 나눠 동시에 실행되고 같은 SQLite 저장소를 공유한다.
+baseline.json 이 있으면 p95 가 기준보다 25% 넘게 느려진 경우 종료 코드 1 로 끝난다.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+REGRESSION_TOLERANCE = 1.25  # 기준 대비 p95 가 25% 넘게 느려지면 회귀로 본다
+
+os.environ.setdefault('STUDY_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='study-bench-'), 'study.db'))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+sys.path.insert(0, ROOT)
+from storage import open_storage  # noqa: E402
+
+store = open_storage()
+
+
+def timed_run(at, step, latencies):
+    start = time.perf_counter()
+    at.run()
+    latencies.setdefault(step, []).append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+
+def user_flow(user_no, latencies):
+    """사용자 한 명의 흐름. 끝난 AppTest 를 반환 (메모리 측정용)"""
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    uid = f"bench-{user_no}-{time.time_ns()}"
+    at.query_params['uid'] = uid
+    timed_run(at, 'first_load', latencies)
+
+    at.button(key='start_study_button').click()
+    timed_run(at, 'start_study', latencies)
+
+    # 마감 시각을 과거로 당겨서 완료시키기 (저장소의 마감 조건과 맞춰야 함)
+    deadline = time.time() - 1
+    store.save_profile(uid, timer_deadline=deadline)
+    at.session_state.timer_deadline = deadline
+    timed_run(at, 'complete_session', latencies)
+
+    # 구매 흐름을 위해 코인 충전 (저장소와 세션 상태 모두)
+    store.save_profile(uid, coins=100_000)
+    at.session_state['coins'] = 100_000
+    at.session_state['main_tab'] = '🛒 상점'
+    timed_run(at, 'open_shop', latencies)
+
+    at.button(key='buy_double_coin').click()
+    timed_run(at, 'buy_double_coin', latencies)
+
+    at.button(key='buy_sky_theme').click()
+    timed_run(at, 'buy_sky_theme', latencies)
+
+    at.button(key='deactivate_sky_theme').click()
+    timed_run(at, 'toggle_sky_theme', latencies)
+
+    at.session_state['main_tab'] = '📊 통계'
+    timed_run(at, 'open_stats', latencies)
+    return at
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def run_worker(user_nos):
+    """worker 프로세스 하나가 맡은 사용자들을 차례로 실행"""
+    user_flow(-1, {})  # 워밍업 (import, 캐시 초기화 비용 제외)
+    latencies = {}
+    for n in user_nos:
+        user_flow(n, latencies)
+
+    # 세션 하나가 붙잡고 있는 메모리 (tracemalloc 은 느려서 지연 측정과 분리)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    at = user_flow(-2, {})
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del at
+    return latencies, retained
+
+
+def run_level(users, workers):
+    workers = max(1, min(workers, users))
+    shards = [list(range(i, users, workers)) for i in range(workers)]
+    latencies = {}
+    retained = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_latencies, shard_retained in pool.map(run_worker, shards):
+            for step, xs in shard_latencies.items():
+                latencies.setdefault(step, []).extend(xs)
+            retained.append(shard_retained)
+    elapsed = time.perf_counter() - start
+
+    all_runs = [x for xs in latencies.values() for x in xs]
+    return {
+        'users': users,
+        'reruns': len(all_runs),
+        'throughput_rps': len(all_runs) / elapsed,
+        'p50_ms': percentile(all_runs, 50) * 1000,
+        'p95_ms': percentile(all_runs, 95) * 1000,
+        'p99_ms': percentile(all_runs, 99) * 1000,
+        'mem_per_session_kb': sum(retained) / len(retained) / 1024,
+        'steps': {step: {'p50_ms': percentile(xs, 50) * 1000, 'p95_ms': percentile(xs, 95) * 1000}
+                  for step, xs in latencies.items()},
+    }
+
+
+def print_result(r):
+    print(f"users={r['users']:>5} reruns={r['reruns']:>6} {r['throughput_rps']:>7.1f} rerun/s "
+          f"p50={r['p50_ms']:>7.1f}ms p95={r['p95_ms']:>7.1f}ms p99={r['p99_ms']:>7.1f}ms "
+          f"mem/session={r['mem_per_session_kb']:>8.1f}KB")
+    for step, s in r['steps'].items():
+        print(f"    {step:<18} p50={s['p50_ms']:>7.1f}ms p95={s['p95_ms']:>7.1f}ms")
+
+
+def compare(results, baseline):
+    """기준값 대비 p95 회귀 목록"""
+    regressions = []
+    for r in results:
+        base = baseline.get(str(r['users']))
+        if base and r['p95_ms'] > base['p95_ms'] * REGRESSION_TOLERANCE:
+            regressions.append(f"users={r['users']}: p95 {base['p95_ms']:.1f}ms → {r['p95_ms']:.1f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', default='1,10,100', help="쉼표로 구분한 동시 사용자 수")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="동시에 실행할 worker 프로세스 수")
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    for users in (int(u) for u in args.users.split(',')):
+        r = run_level(users, args.workers)
+        print_result(r)
+        results.append(r)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({str(r['users']): r for r in results}, f, indent=2)
+        print(f"baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""가상 시계 시뮬레이션: 여러 사용자의 몇 달치 공부를 몇 초 만에 재생
+
+    python bench/simulate.py                                # 200명, 90일
+    python bench/simulate.py --users 2000 --days 180 --db /tmp/sim.db
+
+사용자마다 공부하는 요일 비율, 시작 시각, 하루 세션 수, 세션 길이, 사고 싶은 아이템 순서를 정해 두고
+VirtualClock 을 step 초씩 넘기며 재생한다. 타이머는 브라우저를 열어 둔 앱과 같은 경로를 탄다:
+메모리의 PomodoroState.start → 저장소에 마감 시각 기록 → DeadlineScheduler → service.complete_session.
+기록 시각(원장, 업적 달성 시각)도 가상 시계 기준이라 끝난 뒤 DB 를 그대로 분석할 수 있다.
+
+출력: 처리량, 코인 경제(지급/소비/잔액 분포, 아이템별 구매), 기록 증가량(행 수, DB 크기),
+업적별 달성 인원과 달성까지 걸린 날짜(중앙값)
+"""
+import argparse
+import heapq
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import service  # noqa: E402
+from catalog import load_catalog  # noqa: E402
+from clock import VirtualClock  # noqa: E402
+from engine import PomodoroState  # noqa: E402
+from ledger import REASONS  # noqa: E402
+from scheduler import DeadlineScheduler  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+DAY = 24 * 60 * 60
+START_HOURS = [6, 7, 8, 9, 10, 13, 14, 15, 19, 20, 21, 22]
+STUDY_DURATIONS = [25, 25, 25, 50, 15]
+
+
+class Persona:
+    """사용자 한 명의 공부 습관"""
+
+    __slots__ = ('user_id', 'active', 'start_hour', 'max_sessions', 'wishlist')
+
+    def __init__(self, user_id, rng, shop):
+        self.user_id = user_id
+        self.active = rng.uniform(0.2, 0.95)          # 공부하는 날의 비율
+        self.start_hour = rng.choice(START_HOURS)
+        self.max_sessions = rng.randint(1, 8)         # 하루 공부 세션 수 상한
+        self.wishlist = rng.sample(list(shop), rng.randint(0, len(shop)))
+
+
+class Simulation:
+    def __init__(self, db_path, users, start, seed=0, step=60):
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock(datetime.combine(start, datetime.min.time()).timestamp())
+        self.store = open_storage(db_path, clock=self.clock)
+        catalog = load_catalog()
+        self.engine = catalog.engine
+        self.shop = {key: info['price'] for key, info in {**catalog.items, **catalog.themes}.items()}
+        self.themes = set(catalog.themes)
+        self.scheduler = DeadlineScheduler(tick=step, clock=self.clock.time)
+        self.step = step
+        self.starts = []            # (시작 시각, user_id) 힙
+        self.left = {}              # user_id → 오늘 남은 공부 세션 수 (공부 중인 사용자만)
+        self.states = {}            # user_id → (PomodoroState, owned_items, unlocked) 앱의 세션 상태 역할
+        self.completions = 0
+        self.purchases = 0
+
+        self.personas = {}
+        for i in range(users):
+            persona = Persona(f"sim-{i:06d}", self.rng, self.shop)
+            duration = self.rng.choice(STUDY_DURATIONS)
+            self.store.create_profile(
+                persona.user_id, study_duration=duration, remaining_study_seconds=duration * 60,
+                remaining_break_seconds=5 * 60, remaining_long_break_seconds=15 * 60,
+                last_date=str(start))
+            self.personas[persona.user_id] = persona
+            profile = self.store.load_profile(persona.user_id)
+            self.states[persona.user_id] = (PomodoroState.from_mapping(profile), profile['owned_items'],
+                                            profile['unlocked_achievements'])
+
+    def plan_day(self, midnight):
+        for persona in self.personas.values():
+            if persona.user_id in self.left or self.rng.random() > persona.active:
+                continue
+            at = midnight + persona.start_hour * 3600 + self.rng.randrange(3600)
+            heapq.heappush(self.starts, (at, persona.user_id))
+
+    def begin(self, user_id, sessions=None):
+        """다음 세션(공부든 휴식이든) 타이머 시작 (앱의 start_timer + schedule_completion)"""
+        if sessions is not None:
+            self.left[user_id] = sessions
+        state = self.states[user_id][0]
+        state.start(self.clock.time())
+        self.store.save_profile(user_id, is_running=True, timer_deadline=state.timer_deadline)
+        self.scheduler.schedule(user_id, state.timer_deadline, partial(self.finish, user_id, state.timer_deadline))
+
+    def finish(self, user_id, deadline):
+        """스케줄러 콜백: 완료 처리 후 살 수 있는 아이템을 사고 다음 세션을 시작"""
+        state, owned, unlocked = self.states[user_id]
+        done = service.complete_session(self.store, self.engine, user_id, state, owned, unlocked, deadline,
+                                        clock=self.clock)
+        if done is None:
+            return
+        self.completions += 1
+        if done.study:
+            self.left[user_id] -= 1
+            self.shop_for(user_id)
+        if self.left[user_id] > 0:
+            self.begin(user_id)
+        else:
+            del self.left[user_id]
+
+    def shop_for(self, user_id):
+        wishlist = self.personas[user_id].wishlist
+        if not wishlist:
+            return
+        key = wishlist[0]
+        if self.store.balance(user_id) >= self.shop[key]:
+            fields = {'active_theme': key} if key in self.themes else None
+            if self.store.purchase(user_id, key, self.shop[key], fields):
+                self.states[user_id][1].add(key)
+                wishlist.pop(0)
+                self.purchases += 1
+
+    def run(self, days):
+        midnight = self.clock.time()
+        end = midnight + days * DAY
+        while self.clock.time() < end:
+            now = self.clock.advance(self.step)
+            while midnight <= now and midnight < end:
+                self.plan_day(midnight)
+                midnight += DAY
+            while self.starts and self.starts[0][0] <= now:
+                _, user_id = heapq.heappop(self.starts)
+                self.begin(user_id, self.rng.randint(1, self.personas[user_id].max_sessions))
+            self.scheduler.run_due()
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(db_path, started_at, users):
+    conn = sqlite3.connect(db_path)
+    print("\n[coin economy]")
+    for code, total, count in conn.execute(
+            "SELECT reason, SUM(amount), COUNT(*) FROM coin_ledger GROUP BY reason ORDER BY reason"):
+        print(f"  {REASONS[code]:<12} {total:>14,} coins  ({count:,} entries)")
+    balances = [coins for (coins,) in conn.execute("SELECT coins FROM users")]
+    print(f"  balance      median {statistics.median(balances):,.0f}  p90 {percentile(balances, 0.9):,}  "
+          f"max {max(balances):,}")
+    for item, count in conn.execute(
+            "SELECT ref, COUNT(*) FROM coin_ledger WHERE reason = ? GROUP BY ref ORDER BY 2 DESC",
+            (REASONS.index('purchase'),)):
+        print(f"  bought {item:<18} {count:>6,} users")
+
+    print("\n[history growth]")
+    for table in ('sessions', 'daily_rollups', 'coin_ledger', 'ledger_snapshots', 'achievements', 'hour_stats'):
+        (rows,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        print(f"  {table:<17} {rows:>10,} rows  ({rows / users:,.1f} per user)")
+    size = sum(os.path.getsize(db_path + suffix) for suffix in ('', '-wal') if os.path.exists(db_path + suffix))
+    print(f"  database          {size / 1024 / 1024:>10,.1f} MB    ({size / users / 1024:,.1f} KB per user)")
+
+    print("\n[achievements]  users unlocked / median days to unlock")
+    for key, count, times in conn.execute(
+            "SELECT ach_key, COUNT(*), GROUP_CONCAT(unlocked_at) FROM achievements GROUP BY ach_key ORDER BY 2 DESC"):
+        days = statistics.median((float(t) - started_at) / DAY for t in times.split(','))
+        print(f"  {key:<16} {count:>7,} ({count / users:>5.1%})  {days:>6.1f} days")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--start', type=date.fromisoformat, default=date.today() - timedelta(days=90),
+                        help="시뮬레이션 첫 날 (YYYY-MM-DD)")
+    parser.add_argument('--step', type=int, default=60, help="가상 시계를 한 번에 넘기는 초 (스케줄러 tick)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="결과 DB 경로 (기본: 임시 파일)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='study-sim-'), 'study.db')
+    sim = Simulation(db_path, args.users, args.start, args.seed, args.step)
+    started_at = sim.clock.time()
+    wall = time.perf_counter()
+    sim.run(args.days)
+    elapsed = time.perf_counter() - wall
+    print(f"{args.users:,} users x {args.days} days: {sim.completions:,} completions, "
+          f"{sim.purchases:,} purchases in {elapsed:.1f}s "
+          f"({sim.completions / elapsed:,.0f} completions/s, {args.days * DAY / elapsed:,.0f}x real time)")
+    print(f"database: {db_path}")
+    report(db_path, started_at, args.users)
+
+
+if __name__ == '__main__':
+    main()
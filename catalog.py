@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import threading
+import time
+import tomllib
+
+from achievements import AchievementEngine
+from themes import STATIC_DIR, compile_themes
+
+# =====================================================
+# 카탈로그 (테마, 아이템, 업적)
+# =====================================================
+# 상점/업적 정의를 코드가 아니라 data/ 아래 파일에서 읽는다.
+#
+#     data/items.json | items.toml                 [{key, name, price, effect}, ...]
+#     data/achievements.json | achievements.toml   [{key, name, desc, condition, reward}, ...]
+#     data/themes/<key>.css                        테마 (themes.py)
+#     data/catalog.d/*.json | *.toml               시즌 카탈로그 {"items": [...], "achievements": [...]}
+#
+# catalog.d 의 파일은 이름 순으로 덮어쓰므로 같은 key 로 가격을 바꾸거나 항목을 추가할 수 있다.
+# 파싱/컴파일은 프로세스당 한 번이고, CatalogSource 가 파일 수정 시각이 바뀐 것을 보면
+# 백그라운드에서 새 카탈로그를 만든 뒤 참조만 바꿔 끼운다. 이미 실행 중인 재실행은
+# 자기가 받은 카탈로그를 끝까지 쓰므로 다시 읽는 동안 막히지 않는다.
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SEASON_DIR = 'catalog.d'
+CHECK_INTERVAL = 1.0    # 파일 변경 확인 간격 (초)
+
+
+class Catalog:
+    """한 시점의 카탈로그. 만든 뒤에는 바꾸지 않는다."""
+
+    __slots__ = ('themes', 'items', 'achievements', 'engine', 'stamp')
+
+    def __init__(self, themes, items, achievements, stamp=()):
+        self.themes = themes
+        self.items = items
+        self.achievements = achievements
+        self.engine = AchievementEngine(achievements)
+        self.stamp = stamp
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        if path.endswith('.toml'):
+            return tomllib.load(f)
+        return json.load(f)
+
+
+def _rows(data, section):
+    """최상위가 목록이면 그대로, 표(dict)면 해당 섹션"""
+    return data if isinstance(data, list) else data.get(section, [])
+
+
+def _catalog_files(data_dir):
+    """(섹션, 경로) 목록. 기본 파일 → 시즌 파일 순"""
+    files = []
+    for section in ('items', 'achievements'):
+        for ext in ('.json', '.toml'):
+            path = os.path.join(data_dir, section + ext)
+            if os.path.exists(path):
+                files.append((section, path))
+    season_dir = os.path.join(data_dir, SEASON_DIR)
+    if os.path.isdir(season_dir):
+        for name in sorted(os.listdir(season_dir)):
+            if name.endswith(('.json', '.toml')):
+                files.append((None, os.path.join(season_dir, name)))
+    return files
+
+
+def scan(data_dir=DATA_DIR):
+    """변경 감지용 (경로, 수정 시각) 목록. 폴더도 넣어서 파일 추가/삭제를 알아챈다."""
+    paths = [data_dir, os.path.join(data_dir, 'themes'), os.path.join(data_dir, SEASON_DIR)]
+    paths += [path for _, path in _catalog_files(data_dir)]
+    themes_dir = os.path.join(data_dir, 'themes')
+    if os.path.isdir(themes_dir):
+        paths += [os.path.join(themes_dir, name) for name in sorted(os.listdir(themes_dir))]
+    stamp = []
+    for path in paths:
+        try:
+            stamp.append((path, os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            pass
+    return tuple(stamp)
+
+
+def load_catalog(data_dir=DATA_DIR, static_dir=STATIC_DIR):
+    """파일들을 읽어 Catalog 생성. 조건식이 잘못됐으면 ValueError"""
+    stamp = scan(data_dir)
+    sections = {'items': {}, 'achievements': {}}
+    for section, path in _catalog_files(data_dir):
+        data = _read(path)
+        for name in ([section] if section else sections):
+            for row in _rows(data, name):
+                row = dict(row)
+                sections[name][row.pop('key')] = row
+    for item in sections['items'].values():
+        item['price'] = int(item['price'])
+    themes = compile_themes(os.path.join(data_dir, 'themes'), static_dir)
+    return Catalog(themes, sections['items'], sections['achievements'], stamp)
+
+
+class CatalogSource:
+    """프로세스 전체가 공유하는 카탈로그. 파일이 바뀌면 백그라운드에서 다시 읽는다."""
+
+    def __init__(self, data_dir=DATA_DIR, static_dir=STATIC_DIR, check_interval=CHECK_INTERVAL,
+                 clock=time.monotonic):
+        self.data_dir = data_dir
+        self.static_dir = static_dir
+        self.check_interval = check_interval
+        self.clock = clock
+        self._catalog = load_catalog(data_dir, static_dir)
+        self._checked = clock()
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def current(self):
+        """지금 카탈로그. 확인 간격이 지났으면 수정 시각만 보고, 바뀌었으면 다시 읽기를 시작한다."""
+        now = self.clock()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval and not self._reloading:
+                    self._checked = now
+                    if scan(self.data_dir) != self._catalog.stamp:
+                        self._reloading = True
+                        threading.Thread(target=self._reload, name='catalog-reload', daemon=True).start()
+        return self._catalog
+
+    def reload(self):
+        """지금 바로 다시 읽기 (실패하면 이전 카탈로그 유지). 성공 여부 반환"""
+        try:
+            self._catalog = load_catalog(self.data_dir, self.static_dir)
+            return True
+        except Exception:
+            logger.exception("catalog reload failed; keeping previous catalog")
+            return False
+
+    def _reload(self):
+        try:
+            if not self.reload():
+                # 잘못된 파일을 매 확인마다 다시 읽지 않도록 지금 상태를 기억해 둔다
+                self._catalog = _with_stamp(self._catalog, scan(self.data_dir))
+        finally:
+            self._reloading = False
+
+
+def _with_stamp(catalog, stamp):
+    copy = Catalog.__new__(Catalog)
+    for name in Catalog.__slots__:
+        setattr(copy, name, getattr(catalog, name))
+    copy.stamp = stamp
+    return copy
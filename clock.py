@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# =====================================================
+# 시계 (벽시계 / 가상 시계)
+# =====================================================
+# 타이머 마감, 날짜 변경(last_date), 일별 기록 날짜, 세션 로그 시각은 모두 이 시계로 정한다.
+# 엔진(engine.py)은 원래 시각을 인자로 받으므로, 시계를 바꾸면 앱/스케줄러/스터디룸/저장소가
+# 같은 가상 시간 위에서 돈다.
+#
+#     SystemClock    벽시계 (기본값)
+#     VirtualClock   advance() 할 때만 흐르는 시계 (시뮬레이션, 테스트)
+#     ScaledClock    벽시계보다 speed 배 빠르게 흐르는 시계 (25분 세션을 25초에 확인)
+#
+# 마감 시각 등이 가상 시간으로 저장되므로 빠른 시계로 돌릴 때는 저장소(STUDY_DB_PATH)를 따로 쓴다.
+
+
+class SystemClock:
+    """time.time() 기준 시계. time() 만 바꾸면 나머지는 따라온다."""
+
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def today(self):
+        return self.now().date()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock(SystemClock):
+    """advance()/set() 으로만 움직이는 시계. sleep 은 기다리지 않고 시계를 넘긴다."""
+
+    def __init__(self, start=None):
+        self._now = float(start if start is not None else time.time())
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def set(self, timestamp):
+        with self._lock:
+            self._now = float(timestamp)
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += seconds
+            return self._now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+
+class ScaledClock(SystemClock):
+    """start 시각부터 벽시계의 speed 배로 흐르는 시계"""
+
+    def __init__(self, speed, start=None):
+        self.speed = float(speed)
+        self.origin = float(start if start is not None else time.time())
+        self._real_origin = time.monotonic()
+
+    def time(self):
+        return self.origin + (time.monotonic() - self._real_origin) * self.speed
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.speed)
+
+
+system_clock = SystemClock()
+
+
+def open_clock(speed=None, start=None):
+    """환경 변수 STUDY_CLOCK_SPEED(배속), STUDY_CLOCK_START(시작 날짜/시각, ISO) 의 시계
+
+    둘 다 없으면 벽시계. 예: STUDY_CLOCK_SPEED=60 이면 25분 세션이 25초에 끝난다.
+    """
+    speed = speed or os.environ.get('STUDY_CLOCK_SPEED')
+    start = start or os.environ.get('STUDY_CLOCK_START')
+    if not speed and not start:
+        return system_clock
+    if start is not None and not isinstance(start, (int, float)):
+        start = datetime.fromisoformat(str(start)).timestamp()
+    return ScaledClock(float(speed or 1), start)
@@ -0,0 +1,128 @@
+import ast
+from functools import reduce
+
+from engine import DERIVED_METRICS, STATE_DEFAULTS
+
+# =====================================================
+# 업적 조건식 컴파일러
+# =====================================================
+# 카탈로그의 업적 조건은 작은 파이썬식 문자열로 적는다.
+#
+#     "total_sessions >= 10"
+#     "today_minutes >= 120 and current_cycle_count == 0"
+#     "total_minutes >= 600 or completed_cycles >= 5"
+#
+# 쓸 수 있는 이름은 엔진 상태 필드(engine.STATE_DEFAULTS)와 파생 지표(engine.DERIVED_METRICS)뿐이고,
+# 비교/논리/산술 연산과 숫자/문자열 상수만 허용한다. 한 번 검사한 뒤
+# `lambda s: s.total_sessions >= 10` 형태의 함수로 컴파일하므로 평가 비용은 손으로 쓴 람다와 같다.
+# "지표 >= 상수" 꼴은 threshold() 로 알아내서 업적 엔진의 이분 탐색 인덱스에 넣는다.
+# compile_vector() 는 같은 식을 이름별 배열(numpy) 위에서 한 번에 평가하는 함수로 만든다 (projection.py).
+
+NAMES = frozenset(STATE_DEFAULTS) | frozenset(DERIVED_METRICS)
+
+_ALLOWED = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Name, ast.Load, ast.Constant,
+)
+
+
+class ConditionError(ValueError):
+    """허용되지 않는 조건식"""
+
+
+def parse(expr):
+    """조건식 → 검사를 마친 AST"""
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ConditionError(f"{expr!r}: {e.msg}") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED):
+            raise ConditionError(f"{expr!r}: {type(node).__name__} is not allowed")
+        if isinstance(node, ast.Name) and node.id not in NAMES:
+            raise ConditionError(f"{expr!r}: unknown name {node.id!r}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+            raise ConditionError(f"{expr!r}: unsupported constant {node.value!r}")
+    return tree
+
+
+def threshold(expr):
+    """'지표 >= 상수' 꼴이면 (지표, 상수), 아니면 None"""
+    body = parse(expr).body
+    if (isinstance(body, ast.Compare) and len(body.ops) == 1 and isinstance(body.ops[0], ast.GtE)
+            and isinstance(body.left, ast.Name) and isinstance(body.comparators[0], ast.Constant)
+            and isinstance(body.comparators[0].value, (int, float))):
+        return body.left.id, body.comparators[0].value
+    return None
+
+
+class _ToAttribute(ast.NodeTransformer):
+    """이름 x → s.x"""
+
+    def visit_Name(self, node):
+        return ast.copy_location(ast.Attribute(ast.Name('s', ast.Load()), node.id, ast.Load()), node)
+
+
+def compile_condition(expr):
+    """조건식 → predicate(state). state 는 상태 필드를 속성으로 가진 객체 (engine.PomodoroState)"""
+    body = _ToAttribute().visit(parse(expr)).body
+    func = ast.Expression(ast.Lambda(
+        ast.arguments(posonlyargs=[], args=[ast.arg('s')], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body))
+    ast.fix_missing_locations(func)
+    return eval(compile(func, f"<condition {expr}>", 'eval'), {'__builtins__': {}})
+
+
+def names(expr):
+    """조건식에 쓰인 이름 집합"""
+    return {node.id for node in ast.walk(parse(expr)) if isinstance(node, ast.Name)}
+
+
+def _truth(node):
+    return ast.Compare(node, [ast.NotEq()], [ast.Constant(0)])
+
+
+def _all(nodes, op):
+    return reduce(lambda left, right: ast.BinOp(left, op, right), nodes)
+
+
+class _ToColumn(ast.NodeTransformer):
+    """이름 x → s['x'], and/or/not → &/|/~, a < b < c → (a < b) & (b < c)"""
+
+    def visit_Name(self, node):
+        return ast.copy_location(ast.Subscript(ast.Name('s', ast.Load()), ast.Constant(node.id), ast.Load()), node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return ast.copy_location(_all([_truth(value) for value in node.values], op), node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.copy_location(ast.UnaryOp(ast.Invert(), _truth(node.operand)), node)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        pairs = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            pairs.append(ast.Compare(left, [op], [right]))
+            left = right
+        return ast.copy_location(_all(pairs, ast.BitAnd()), node)
+
+
+def compile_vector(expr):
+    """조건식 → predicate(columns). columns 는 {이름: 배열}, 결과는 행마다의 bool 배열
+
+    파이썬의 and/or/not 은 배열에 쓸 수 없으므로 원소별 연산(&, |, ~)으로 바꾼다.
+    """
+    body = _ToColumn().visit(parse(expr)).body
+    func = ast.Expression(ast.Lambda(
+        ast.arguments(posonlyargs=[], args=[ast.arg('s')], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body))
+    ast.fix_missing_locations(func)
+    return eval(compile(func, f"<vector condition {expr}>", 'eval'), {'__builtins__': {}})
@@ -0,0 +1,226 @@
+# =====================================================
+# 뽀모도로 상태 엔진 (Streamlit 독립)
+# =====================================================
+# 사이클 전환, 보상 계산, 타이머 마감 처리를 순수 파이썬 객체로 모았다.
+# app.py 는 st.session_state 와 이 객체 사이를 복사하는 얇은 어댑터만 가진다.
+# 시간은 항상 인자(now)로 받으므로 백그라운드 작업자, API, 시뮬레이션에서도 그대로 쓸 수 있다.
+
+from analytics import NO_HOUR, advance_streak, average_session, bump_hour, empty_hours, streak_broken
+
+REWARD_PER_MINUTE = 40
+
+STATE_DEFAULTS = {
+    'coins': 0,
+    'is_running': False,
+    'is_study': True,
+    'is_long_break': False,
+    'timer_deadline': None,
+    'study_duration': 25,
+    'break_duration': 5,
+    'long_break_duration': 15,
+    'sessions_before_long_break': 4,
+    'current_cycle_count': 0,
+    'completed_cycles': 0,
+    'cycle_mode': True,
+    'total_sessions': 0,
+    'total_minutes': 0,
+    'total_coins_earned': 0,
+    'today_sessions': 0,
+    'today_minutes': 0,
+    'last_date': None,
+    'remaining_study_seconds': 25 * 60,
+    'remaining_break_seconds': 5 * 60,
+    'remaining_long_break_seconds': 15 * 60,
+    # 누적 분석 지표 (analytics.py)
+    'current_streak': 0,
+    'longest_streak': 0,
+    'last_study_date': None,
+    'hour_sessions': None,      # 완료 시각(시)별 공부 세션 수 24칸. None 이면 아직 없음
+    'best_hour': NO_HOUR,
+}
+
+# 상태 필드에서 바로 계산되는 지표 (업적 조건식에서도 쓸 수 있음)
+DERIVED_METRICS = ('avg_session_minutes',)
+
+
+def study_reward(duration, owned_items=()):
+    """공부 완료 보상: 분당 40코인, 코인 2배 아이템이 있으면 2배"""
+    base_reward = int(duration * REWARD_PER_MINUTE)
+    is_double = 'double_coin' in owned_items
+    return (base_reward * 2 if is_double else base_reward), is_double
+
+
+class StudyResult:
+    """공부 세션 1회 완료 결과"""
+
+    __slots__ = ('duration', 'reward', 'is_double', 'cycle_completed')
+
+    def __init__(self, duration, reward, is_double, cycle_completed):
+        self.duration = duration
+        self.reward = reward
+        self.is_double = is_double
+        self.cycle_completed = cycle_completed
+
+
+class PomodoroState:
+    """한 사용자의 타이머/사이클/누적 통계 상태"""
+
+    __slots__ = tuple(STATE_DEFAULTS)
+
+    def __init__(self, **fields):
+        for name, default in STATE_DEFAULTS.items():
+            setattr(self, name, fields.get(name, default))
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """st.session_state 같은 매핑에서 읽기 (없는 키는 기본값)"""
+        state = cls.__new__(cls)
+        for name, default in STATE_DEFAULTS.items():
+            setattr(state, name, mapping[name] if name in mapping else default)
+        return state
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def metrics(self):
+        """상태 필드 + 파생 지표 (업적 재평가용)"""
+        values = self.to_dict()
+        for name in DERIVED_METRICS:
+            values[name] = getattr(self, name)
+        return values
+
+    @property
+    def avg_session_minutes(self):
+        return average_session(self.total_minutes, self.total_sessions)
+
+    # --- 세션 종류 ---
+
+    def session_keys(self):
+        """현재 세션의 (남은 시간 필드, 길이 필드)"""
+        if self.is_study:
+            return 'remaining_study_seconds', 'study_duration'
+        if self.is_long_break:
+            return 'remaining_long_break_seconds', 'long_break_duration'
+        return 'remaining_break_seconds', 'break_duration'
+
+    def next_session_type(self):
+        """다음 세션이 짧은 휴식인지 긴 휴식인지 반환"""
+        if not self.cycle_mode:
+            return 'short_break'
+        if self.current_cycle_count + 1 >= self.sessions_before_long_break:
+            return 'long_break'
+        return 'short_break'
+
+    # --- 설정 ---
+
+    def set_durations(self, study, brk):
+        self.study_duration = max(1, study)
+        self.break_duration = max(1, brk)
+        self.remaining_study_seconds = int(self.study_duration * 60)
+        self.remaining_break_seconds = int(self.break_duration * 60)
+        self.is_study = True
+
+    def set_long_break_duration(self, minutes):
+        self.long_break_duration = max(5, minutes)
+
+    def roll_over(self, today):
+        """날짜가 바뀌었으면 오늘 통계 리셋 (어제 공부하지 않았으면 연속 공부일도). 리셋했으면 True"""
+        if self.last_date == today:
+            return False
+        self.today_sessions = 0
+        self.today_minutes = 0
+        self.last_date = today
+        if streak_broken(self.last_study_date, today):
+            self.current_streak = 0
+        return True
+
+    # --- 타이머 ---
+
+    def remaining(self, now):
+        """실행 중이면 마감 시각 기준, 아니면 저장된 남은 시간(초)"""
+        if self.is_running and self.timer_deadline is not None:
+            return max(0.0, self.timer_deadline - now)
+        return getattr(self, self.session_keys()[0])
+
+    def start(self, now):
+        self.timer_deadline = now + getattr(self, self.session_keys()[0])
+        self.is_running = True
+
+    def stop(self, now):
+        setattr(self, self.session_keys()[0], int(round(self.remaining(now))))
+        self.timer_deadline = None
+        self.is_running = False
+
+    def is_due(self, now):
+        return self.is_running and self.timer_deadline is not None and now >= self.timer_deadline
+
+    def reset_timer(self):
+        self.remaining_study_seconds = int(self.study_duration * 60)
+        self.remaining_break_seconds = int(self.break_duration * 60)
+        self.remaining_long_break_seconds = int(self.long_break_duration * 60)
+        self.is_study = True
+        self.is_long_break = False
+        self.current_cycle_count = 0
+
+    # --- 완료 전환 ---
+
+    def complete_study(self, owned_items=(), day=None, hour=None):
+        """공부 완료: 보상/누적 통계/사이클 갱신 후 휴식으로 전환"""
+        self.is_running = False
+        self.timer_deadline = None
+        duration = self.study_duration
+        reward, is_double = self.credit_study(duration, owned_items, day, hour)
+
+        # 사이클 관리
+        self.current_cycle_count += 1
+        cycle_completed = self.current_cycle_count >= self.sessions_before_long_break
+        if cycle_completed:
+            self.is_long_break = True
+            self.current_cycle_count = 0
+            self.completed_cycles += 1
+        else:
+            self.is_long_break = False
+
+        self.is_study = False
+        self.remaining_study_seconds = int(self.study_duration * 60)
+        return StudyResult(duration, reward, is_double, cycle_completed)
+
+    def credit_study(self, duration, owned_items=(), day=None, hour=None):
+        """공부 duration 분의 보상/누적 통계만 반영 (사이클은 그대로). (보상, 2배 여부) 반환
+
+        day("YYYY-MM-DD"), hour(0~23) 는 완료 시각. 주면 연속 공부일/시간대 분포도 갱신한다.
+        """
+        reward, is_double = study_reward(duration, owned_items)
+        self.coins += reward
+        self.total_coins_earned += reward
+        self.total_sessions += 1
+        self.total_minutes += duration
+        self.today_sessions += 1
+        self.today_minutes += duration
+        if day is not None:
+            self.current_streak, self.longest_streak, self.last_study_date = advance_streak(
+                self.last_study_date, self.current_streak, self.longest_streak, day)
+        if hour is not None:
+            if self.hour_sessions is None:
+                self.hour_sessions = empty_hours()
+            self.best_hour = bump_hour(self.hour_sessions, self.best_hour, hour)
+        return reward, is_double
+
+    def complete_break(self):
+        """휴식 완료: 공부로 전환. 긴 휴식이었으면 True"""
+        self.is_running = False
+        self.timer_deadline = None
+        was_long = self.is_long_break
+        self.is_study = True
+        self.is_long_break = False
+        if was_long:
+            self.remaining_long_break_seconds = int(self.long_break_duration * 60)
+        else:
+            self.remaining_break_seconds = int(self.break_duration * 60)
+        return was_long
+
+    def complete(self, owned_items=()):
+        """현재 세션 완료. 공부면 StudyResult, 휴식이면 긴 휴식 여부"""
+        if self.is_study:
+            return self.complete_study(owned_items)
+        return self.complete_break()
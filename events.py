@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import ledger
+
+# =====================================================
+# 이벤트 기록 (요약 필드의 원본)
+# =====================================================
+# 요약 필드(total_*, today_*, completed_cycles, 연속 공부일, 시간대 분포), 일별 기록, 업적은
+# 모두 이 기록을 재생해서 다시 만들 수 있다 (projection.py). 보상/업적 규칙이 바뀌면 재생으로 맞춘다.
+# 완료/구매/초기화를 기록하는 저장소 트랜잭션 안에서 같이 추가만 한다(append-only).
+#
+#     study     보상을 받은 공부 세션. ref: 'cycle'(이 세션으로 사이클 완료) | 방 id | 'widget' | None
+#     import    기록 가져오기로 들어온 공부 세션 (보상 없음)
+#     purchase  아이템 구매. ref: 아이템 키
+#     reset     타이머 초기화 (사이클 위치가 0 으로)
+#
+# 사이클 완료 여부는 그때의 사용자 설정(sessions_before_long_break)에 달려 있어 규칙이 아니라
+# 사실이므로 study 이벤트에 같이 남긴다. 날짜/시(day, hour)도 기록 시점의 지역 시각으로 저장해
+# 재생 결과가 실행하는 곳의 시간대에 따라 달라지지 않게 한다.
+# 모든 함수는 storage 의 쓰기 트랜잭션 안에서 받은 연결(conn)로 호출한다.
+
+KINDS = ('study', 'import', 'purchase', 'reset')
+KIND_CODES = {name: code for code, name in enumerate(KINDS)}
+
+# 사용자별 (user_id, seq) 로 묶인 WITHOUT ROWID 테이블 (coin_ledger 와 같은 구조)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    at INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    ref TEXT,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_events_at ON events (user_id, at);
+CREATE TABLE IF NOT EXISTS projection_snapshots (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    rules TEXT NOT NULL,
+    last_at INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def event(kind, at, minutes=0, ref=None):
+    """(kind, at, day, hour, minutes, ref) 한 줄. 날짜/시는 at 의 지역 시각"""
+    when = datetime.fromtimestamp(at)
+    return (kind, int(at), str(when.date()), when.hour, int(minutes), ref)
+
+
+def session_event(session, kind='study'):
+    """저장소 세션 dict({'day', 'time', 'duration', 'at'?, 'ref'?})의 이벤트. at 이 없으면 day + time"""
+    at = session.get('at')
+    if at is None:
+        at = datetime.fromisoformat(f"{session['day']} {session['time']}").timestamp()
+    return (kind, int(at), session['day'], int(session['time'][:2]), int(session['duration']), session.get('ref'))
+
+
+def exists(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'").fetchone() is not None
+
+
+def backfill(conn):
+    """이벤트 기록이 생기기 전의 세션/구매를 이벤트로 옮김 (events 테이블을 처음 만들 때 한 번)
+
+    예전 세션은 보상 여부와 사이클 완료 여부가 남아 있지 않으므로 모든 공부 세션을 study 로 보고,
+    사용자의 지금 sessions_before_long_break 번째마다 사이클을 완료한 것으로 본다.
+    """
+    conn.execute(
+        "INSERT INTO events (user_id, seq, kind, at, day, hour, minutes, ref) "
+        "SELECT user_id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY at, src, id), kind, at, day, hour, "
+        "minutes, CASE WHEN src = 0 AND cycle_len > 0 "
+        "AND ROW_NUMBER() OVER (PARTITION BY user_id, src ORDER BY at, id) % cycle_len = 0 "
+        "THEN 'cycle' ELSE ref END "
+        "FROM ("
+        " SELECT s.user_id, s.id, 0 AS src, ? AS kind,"
+        " CAST(strftime('%s', s.day || ' ' || s.time, 'utc') AS INTEGER) AS at,"
+        " s.day, CAST(substr(s.time, 1, 2) AS INTEGER) AS hour, s.duration AS minutes, NULL AS ref,"
+        " u.sessions_before_long_break AS cycle_len"
+        " FROM sessions s JOIN users u ON u.user_id = s.user_id WHERE s.type = 'study'"
+        " UNION ALL"
+        " SELECT user_id, seq, 1, ?, created_at, date(created_at, 'unixepoch', 'localtime'),"
+        " CAST(strftime('%H', created_at, 'unixepoch', 'localtime') AS INTEGER), 0, ref, 0"
+        " FROM coin_ledger WHERE reason = ?"
+        ")",
+        (KIND_CODES['study'], KIND_CODES['purchase'], ledger.REASONS.index('purchase')))
+
+
+def append(conn, user_id, rows):
+    """[(kind, at, day, hour, minutes, ref), ...] 를 사용자 기록 끝에 추가"""
+    if rows:
+        append_many(conn, [(user_id, rows)])
+
+
+def append_many(conn, batches):
+    """여러 사용자의 이벤트 [(user_id, rows), ...] 를 쿼리 두 번으로 추가 (방 세션)"""
+    batches = [(user_id, rows) for user_id, rows in batches if rows]
+    if not batches:
+        return
+    users = [user_id for user_id, _ in batches]
+    marks = ", ".join("?" for _ in users)
+    seqs = dict(conn.execute(f"SELECT user_id, MAX(seq) FROM events WHERE user_id IN ({marks}) GROUP BY user_id",
+                             users))
+    values = []
+    for user_id, rows in batches:
+        seq = seqs.get(user_id, 0)
+        for kind, at, day, hour, minutes, ref in rows:
+            seq += 1
+            values.append((user_id, seq, KIND_CODES[kind], at, day, hour, minutes, ref))
+        seqs[user_id] = seq
+    conn.executemany("INSERT INTO events (user_id, seq, kind, at, day, hour, minutes, ref) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
@@ -0,0 +1,169 @@
+import sys
+from array import array
+from datetime import date, timedelta
+
+# =====================================================
+# 일별 기록 (날짜 오프셋 배열)
+# =====================================================
+# 하루에 dict 하나를 두는 대신 첫 날(start)부터의 오프셋을 인덱스로 쓰는 정수 배열 두 개
+# (세션 수, 분)로 보관한다. 하루 8바이트라 몇 년치도 수 KB 이다.
+# 구간 합계는 누적 합 배열로 O(1) 에 답하고, 누적 합은 값이 바뀐 뒤 처음 물을 때만 다시 만든다
+# (마지막 날에 더하는 평소 경우는 제자리에서 갱신).
+
+_TYPECODE = 'I'     # 부호 없는 32비트
+
+
+def _to_date(day):
+    return day if isinstance(day, date) else date.fromisoformat(day)
+
+
+class DailyHistory:
+    """start 부터 연속된 날짜별 (세션 수, 분)"""
+
+    __slots__ = ('start', 'sessions', 'minutes', '_cum_sessions', '_cum_minutes')
+
+    def __init__(self, start=None):
+        self.start = start          # 첫 날 (date). 비어 있으면 None
+        self.sessions = array(_TYPECODE)
+        self.minutes = array(_TYPECODE)
+        self._cum_sessions = None   # 누적 합 (앞에 0 하나). None 이면 다시 만들어야 함
+        self._cum_minutes = None
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """{"2024-01-01": {"sessions": N, "minutes": M}} → DailyHistory"""
+        history = cls()
+        history.update(mapping)
+        return history
+
+    def __len__(self):
+        """첫 날부터 마지막 날까지의 일수 (기록 없는 날 포함)"""
+        return len(self.sessions)
+
+    def __contains__(self, day):
+        return self._offset(_to_date(day)) is not None
+
+    def __getitem__(self, day):
+        offset = self._offset(_to_date(day))
+        if offset is None:
+            raise KeyError(day)
+        return {'sessions': self.sessions[offset], 'minutes': self.minutes[offset]}
+
+    @property
+    def first_day(self):
+        return self.start
+
+    @property
+    def last_day(self):
+        return self.start + timedelta(days=len(self) - 1) if self.start else None
+
+    @property
+    def nbytes(self):
+        return (len(self.sessions) + len(self.minutes)) * self.sessions.itemsize
+
+    def __sizeof__(self):
+        """배열/누적 합까지 포함한 크기 (sys.getsizeof, 세션 메모리 계정용)"""
+        return object.__sizeof__(self) + sum(
+            sys.getsizeof(a) for a in (self.sessions, self.minutes, self._cum_sessions, self._cum_minutes)
+            if a is not None)
+
+    def _offset(self, day):
+        if self.start is None:
+            return None
+        offset = (day - self.start).days
+        return offset if 0 <= offset < len(self) else None
+
+    def _cover(self, day):
+        """day 가 범위 안에 들도록 배열을 늘리고 오프셋 반환"""
+        if self.start is None:
+            self.start = day
+        offset = (day - self.start).days
+        if offset < 0:
+            pad = array(_TYPECODE, bytes(-offset * self.sessions.itemsize))
+            self.sessions = pad + self.sessions
+            self.minutes = pad + self.minutes
+            self.start = day
+            self._cum_sessions = self._cum_minutes = None
+            offset = 0
+        elif offset >= len(self):
+            pad = array(_TYPECODE, bytes((offset - len(self) + 1) * self.sessions.itemsize))
+            self.sessions.extend(pad)
+            self.minutes.extend(pad)
+            if self._cum_sessions is not None:
+                last_s, last_m = self._cum_sessions[-1], self._cum_minutes[-1]
+                self._cum_sessions.extend([last_s] * len(pad))
+                self._cum_minutes.extend([last_m] * len(pad))
+        return offset
+
+    # --- 쓰기 ---
+
+    def add(self, day, sessions=1, minutes=0):
+        """그날 기록에 더함"""
+        offset = self._cover(_to_date(day))
+        self.sessions[offset] += sessions
+        self.minutes[offset] += minutes
+        if self._cum_sessions is not None:
+            if offset == len(self) - 1:
+                self._cum_sessions[-1] += sessions
+                self._cum_minutes[-1] += minutes
+            else:
+                self._cum_sessions = self._cum_minutes = None
+
+    def update(self, mapping):
+        """{"날짜": {"sessions", "minutes"}} 로 덮어씀 (이전 페이지 합치기)"""
+        if not mapping:
+            return
+        days = sorted(mapping)
+        self._cover(_to_date(days[0]))
+        self._cover(_to_date(days[-1]))
+        for day in days:
+            offset = self._offset(_to_date(day))
+            self.sessions[offset] = mapping[day]['sessions']
+            self.minutes[offset] = mapping[day]['minutes']
+        self._cum_sessions = self._cum_minutes = None
+
+    # --- 읽기 ---
+
+    def _prefix(self):
+        if self._cum_sessions is None:
+            cum_s, cum_m = array('Q', [0]), array('Q', [0])
+            s = m = 0
+            for sessions, minutes in zip(self.sessions, self.minutes):
+                s += sessions
+                m += minutes
+                cum_s.append(s)
+                cum_m.append(m)
+            self._cum_sessions, self._cum_minutes = cum_s, cum_m
+        return self._cum_sessions, self._cum_minutes
+
+    def total(self, first=None, last=None):
+        """first ~ last (포함) 의 (세션 수, 분) 합계. 생략하면 처음/끝까지. O(1)"""
+        if self.start is None:
+            return 0, 0
+        lo = 0 if first is None else max(0, (_to_date(first) - self.start).days)
+        hi = len(self) if last is None else min(len(self), (_to_date(last) - self.start).days + 1)
+        if lo >= hi:
+            return 0, 0
+        cum_s, cum_m = self._prefix()
+        return cum_s[hi] - cum_s[lo], cum_m[hi] - cum_m[lo]
+
+    def items(self):
+        """기록이 있는 날만 (date, 세션 수, 분)"""
+        for offset, (sessions, minutes) in enumerate(zip(self.sessions, self.minutes)):
+            if sessions or minutes:
+                yield self.start + timedelta(days=offset), sessions, minutes
+
+    def heatmap(self, end, weeks=53):
+        """end 가 들어 있는 주까지 weeks 주의 분(minutes) 격자
+
+        [(주 시작 월요일, 요일 0~6, 날짜, 분)] 목록. end 이후 날짜는 빠진다.
+        """
+        end = _to_date(end)
+        first_monday = end - timedelta(days=end.weekday()) - timedelta(weeks=weeks - 1)
+        cells = []
+        for offset in range((end - first_monday).days + 1):
+            day = first_monday + timedelta(days=offset)
+            index = self._offset(day)
+            minutes = self.minutes[index] if index is not None else 0
+            cells.append((first_monday + timedelta(weeks=offset // 7), offset % 7, day, minutes))
+        return cells
@@ -0,0 +1,193 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+
+# =====================================================
+# 랭킹 (사용자 간 비교)
+# =====================================================
+# 보드마다 (-점수, user_id) 정렬 목록을 유지하고 세션이 완료될 때만 그 사용자 항목을 옮긴다.
+# 조회 때마다 전체 사용자를 훑지 않는다.
+#
+#     top(k)      앞에서 k 개 → O(k)
+#     rank(user)  이분 탐색 → O(log n)
+#     갱신        이분 탐색으로 찾아 빼고 다시 끼움 (목록 이동은 C 의 memmove 라 수십만 명도 μs 단위)
+#
+# 오늘/이번 주 보드는 날짜(주)가 바뀌면 빈 보드로 바꿔 끼우기만 한다 (앱의 last_date 리셋과 같은 방식).
+# 프로세스가 시작할 때 저장소에서 한 번 채우고(storage.load_leaderboard) 이 프로세스의 완료는 증가량만 바로 반영한다.
+# 위젯 동기화(API), 다른 복제본, 가져오기, 재생(projection)은 이 프로세스를 거치지 않으므로
+# 백그라운드 스레드가 SYNC_SECONDS 마다 그 사이 바뀐 사용자(users.updated_at 색인)만 읽어 점수를 값으로 맞춘다.
+# 조회 경로에서는 저장소를 읽지 않는다. 값으로 덮어쓰므로 읽는 사이에 들어온 record() 가 덮여도
+# 그 사용자는 다음 번에 다시 읽혀 맞춰진다 (읽는 범위를 SYNC_OVERLAP 초만큼 겹친다).
+
+BOARDS = {
+    'today': "오늘 공부 시간",
+    'week': "이번 주 공부 시간",
+    'all': "전체 공부 시간",
+    'cycles': "완료 사이클",
+}
+
+SYNC_SECONDS = 30
+SYNC_OVERLAP = 120      # 늦게 커밋된 쓰기(기록 시각이 앞선)를 놓치지 않도록 지난번 범위와 겹쳐 읽는 초
+
+logger = logging.getLogger(__name__)
+
+
+def week_start(day):
+    """day 가 속한 주의 월요일 (date)"""
+    day = day if isinstance(day, date) else date.fromisoformat(day)
+    return day - timedelta(days=day.weekday())
+
+
+class RankedIndex:
+    """점수 높은 순 정렬 목록 + 사용자별 점수. 점수가 0 인 사용자는 넣지 않는다."""
+
+    __slots__ = ('_scores', '_order')
+
+    def __init__(self, scores=None):
+        self._scores = {user_id: score for user_id, score in (scores or {}).items() if score > 0}
+        self._order = sorted((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def score(self, user_id):
+        return self._scores.get(user_id, 0)
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, user_id))]
+            del self._scores[user_id]
+        if score > 0:
+            insort(self._order, (-score, user_id))
+            self._scores[user_id] = score
+
+    def add(self, user_id, delta):
+        if delta:
+            self.set(user_id, self.score(user_id) + delta)
+
+    def rank(self, user_id):
+        """(순위, 점수). 같은 점수는 같은 순위 (1, 2, 2, 4). 보드에 없으면 None"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._order, (-score,)) + 1, score
+
+    def top(self, k):
+        """[(순위, user_id, 점수)] 앞에서 k 개"""
+        rows = []
+        rank = 0
+        previous = None
+        for i, (neg, user_id) in enumerate(self._order[:k]):
+            if neg != previous:
+                rank, previous = i + 1, neg
+            rows.append((rank, user_id, -neg))
+        return rows
+
+
+class Leaderboard:
+    """오늘/이번 주/전체 공부 시간, 완료 사이클 보드 묶음 (프로세스당 하나, 스레드 안전)"""
+
+    def __init__(self, today, daily=None, weekly=None, total_minutes=None, cycles=None):
+        self.day = str(today)
+        self.week = str(week_start(today))
+        self.boards = {
+            'today': RankedIndex(daily),
+            'week': RankedIndex(weekly),
+            'all': RankedIndex(total_minutes),
+            'cycles': RankedIndex(cycles),
+        }
+        self._lock = threading.Lock()
+        self._store = None
+        self._since = None          # 마지막으로 읽은 사용자 중 가장 늦은 updated_at
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_store(cls, store, today):
+        """저장소에서 한 번 채움 (시작할 때만 전체를 읽는다)"""
+        scores = store.load_leaderboard(str(today), str(week_start(today)))
+        since = scores.pop('until')
+        board = cls(today, **scores)
+        board._store = store
+        board._since = since
+        return board
+
+    def sync(self, today):
+        """지난번 이후 저장소에서 바뀐 사용자만 다시 읽어 점수를 값으로 맞춤. 맞춘 사용자 수 반환"""
+        with self._lock:
+            self._roll_over(str(today))
+            day, week = self.day, self.week
+        changed = self._store.load_leaderboard(day, week, since=self._since - SYNC_OVERLAP)
+        with self._lock:
+            if (day, week) == (self.day, self.week):
+                for user_id in changed['total_minutes']:
+                    self.boards['today'].set(user_id, changed['daily'].get(user_id, 0))
+                    self.boards['week'].set(user_id, changed['weekly'].get(user_id, 0))
+            for user_id, minutes in changed['total_minutes'].items():
+                self.boards['all'].set(user_id, minutes)
+                self.boards['cycles'].set(user_id, changed['cycles'][user_id])
+        self._since = max(self._since, changed['until'])
+        return len(changed['total_minutes'])
+
+    def _roll_over(self, day):
+        """날짜/주가 바뀌었으면 해당 보드를 빈 것으로 교체"""
+        if day > self.day:
+            self.day = day
+            self.boards['today'] = RankedIndex()
+            week = str(week_start(day))
+            if week != self.week:
+                self.week = week
+                self.boards['week'] = RankedIndex()
+
+    def record(self, user_id, day, minutes, cycles=0):
+        """완료된 공부 세션 하나 반영. day 는 세션 날짜 ("YYYY-MM-DD")"""
+        with self._lock:
+            self._roll_over(day)
+            if day == self.day:
+                self.boards['today'].add(user_id, minutes)
+            if str(week_start(day)) == self.week:
+                self.boards['week'].add(user_id, minutes)
+            self.boards['all'].add(user_id, minutes)
+            self.boards['cycles'].add(user_id, cycles)
+
+    def top(self, board, k=10, today=None):
+        with self._lock:
+            if today is not None:
+                self._roll_over(str(today))
+            return self.boards[board].top(k)
+
+    def rank(self, board, user_id, today=None):
+        """(순위, 점수, 보드 인원). 보드에 없으면 순위는 None"""
+        with self._lock:
+            if today is not None:
+                self._roll_over(str(today))
+            index = self.boards[board]
+            found = index.rank(user_id)
+            return (found[0] if found else None), index.score(user_id), len(index)
+
+    # --- 스레드 ---
+
+    def start(self, today=date.today, interval=SYNC_SECONDS):
+        """interval 초마다 sync. today 는 오늘 날짜를 돌려주는 함수 (clock.today)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(today, interval), name='leaderboard-sync',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, today, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sync(today())
+            except Exception:
+                logger.exception("leaderboard sync failed")
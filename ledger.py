@@ -0,0 +1,197 @@
+import time
+
+# =====================================================
+# 코인 원장
+# =====================================================
+# 코인 증감은 전부 이 원장에 추가만 되는(append-only) 항목으로 남긴다.
+# - 항목마다 멱등 키(idem_key)가 있어 같은 보상/구매가 두 번 반영되지 않는다.
+# - 현재 잔액은 users.coins 에 같은 트랜잭션으로 유지되므로 읽기는 O(1) 이다 (users.updated_at, version 도 같이 갱신).
+# - SNAPSHOT_EVERY 개마다 잔액 스냅샷을 남겨 검증/재계산은 마지막 스냅샷 이후만 더한다.
+# 모든 함수는 storage 의 쓰기 트랜잭션 안에서 받은 연결(conn)로 호출한다.
+
+REASONS = ('study', 'achievement', 'purchase', 'adjust', 'import')
+_REASON_CODES = {name: code for code, name in enumerate(REASONS)}
+
+SNAPSHOT_EVERY = 100
+
+# 사용자별 (user_id, seq) 로 묶인 WITHOUT ROWID 테이블. 사유는 정수 코드, 시각은 초 단위 정수.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS coin_ledger (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    reason INTEGER NOT NULL,
+    ref TEXT,
+    idem_key TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_coin_ledger_idem ON coin_ledger (user_id, idem_key);
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class InsufficientCoins(Exception):
+    """잔액보다 큰 금액을 차감하려 할 때"""
+
+
+def migrate(conn):
+    """예전 ledger 테이블(AUTOINCREMENT, 문자열 사유) 내용을 coin_ledger 로 옮김"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ledger'").fetchone():
+        return
+    rows = conn.execute("SELECT id, user_id, amount, reason, ref, created_at FROM ledger ORDER BY id").fetchall()
+    seqs = {}
+    for row_id, user_id, amount, reason, ref, created_at in rows:
+        seqs[user_id] = seqs.get(user_id, 0) + 1
+        conn.execute(
+            "INSERT INTO coin_ledger (user_id, seq, amount, reason, ref, idem_key, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, seqs[user_id], amount, _REASON_CODES.get(reason, _REASON_CODES['adjust']), ref,
+             f"legacy:{row_id}", int(created_at)))
+    conn.execute("DROP TABLE ledger")
+
+
+def applied(conn, user_id, idem_key):
+    return conn.execute(
+        "SELECT 1 FROM coin_ledger WHERE user_id = ? AND idem_key = ?", (user_id, idem_key)).fetchone() is not None
+
+
+def applied_keys(conn, user_id, idem_keys):
+    """idem_keys 중 이미 반영된 키 집합"""
+    idem_keys = list(idem_keys)
+    if not idem_keys:
+        return set()
+    marks = ", ".join("?" for _ in idem_keys)
+    return {key for (key,) in conn.execute(
+        f"SELECT idem_key FROM coin_ledger WHERE user_id = ? AND idem_key IN ({marks})", (user_id, *idem_keys))}
+
+
+def _fresh(entries, done):
+    """이미 반영된 키 집합 done 을 뺀 항목 목록. 업적 외 항목(공부 보상, 구매 등)의 키가 이미 있으면
+    묶음 전체가 반영된 것이므로 None. 업적 보상은 다른 경로(방, 위젯, 스케줄러)에서 먼저 받았을 수
+    있으므로 그 항목만 뺀다."""
+    if any(idem_key in done for _, reason, _, idem_key in entries if reason != 'achievement'):
+        return None
+    fresh = []
+    for entry in entries:
+        if entry[3] not in done:
+            done = done | {entry[3]}
+            fresh.append(entry)
+    return fresh
+
+
+def fresh_entries(conn, user_id, entries):
+    """entries 중 아직 반영되지 않은 항목 (규칙은 _fresh). 묶음이 이미 반영됐으면 None"""
+    return _fresh(entries, applied_keys(conn, user_id, [entry[3] for entry in entries]))
+
+
+def post(conn, user_id, entries, now=None):
+    """[(amount, reason, ref, idem_key), ...] 를 한꺼번에 반영
+
+    업적 외 항목의 멱등 키가 이미 있으면 이전에 반영된 묶음이므로 아무것도 하지 않고 False.
+    이미 받은 업적 보상 항목은 빼고 나머지만 반영한다 (남는 항목이 없으면 False).
+    차감 후 잔액이 음수가 되면 InsufficientCoins (트랜잭션은 호출한 쪽에서 롤백된다).
+    """
+    if not entries:
+        return True
+    entries = fresh_entries(conn, user_id, entries)
+    if not entries:
+        return False
+    stamp = now if now is not None else time.time()
+    now = int(stamp)
+    delta = sum(amount for amount, _, _, _ in entries)
+    cur = conn.execute("UPDATE users SET coins = coins + ?, updated_at = ?, version = version + 1 "
+                       "WHERE user_id = ? AND coins + ? >= 0", (delta, stamp, user_id, delta))
+    if cur.rowcount == 0:
+        raise InsufficientCoins(user_id)
+
+    last = conn.execute(
+        "SELECT seq FROM coin_ledger WHERE user_id = ? ORDER BY seq DESC LIMIT 1", (user_id,)).fetchone()
+    seq = last[0] if last else 0
+    rows = []
+    for amount, reason, ref, idem_key in entries:
+        seq += 1
+        rows.append((user_id, seq, amount, _REASON_CODES[reason], ref, idem_key, now))
+    conn.executemany(
+        "INSERT INTO coin_ledger (user_id, seq, amount, reason, ref, idem_key, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # 스냅샷 경계를 넘었으면 현재 잔액 기록
+    if seq // SNAPSHOT_EVERY != (seq - len(rows)) // SNAPSHOT_EVERY:
+        balance = conn.execute("SELECT coins FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO ledger_snapshots (user_id, seq, balance) VALUES (?, ?, ?)",
+                     (user_id, seq, balance))
+    return True
+
+
+def post_many(conn, batches, now=None):
+    """여러 사용자의 지급 묶음 [(user_id, entries), ...] 을 쿼리 몇 번으로 반영 (방 세션 보상)
+
+    사용자마다 post() 와 같은 규칙이지만 지급(양수)만 받으므로 잔액 검사는 하지 않는다.
+    묶음이 이미 반영된 사용자는 건너뛰고 이미 받은 업적 보상 항목은 빼서, 실제로 반영한
+    묶음 목록 [(user_id, 반영한 항목)] 을 반환한다.
+    """
+    batches = [(user_id, entries) for user_id, entries in batches if entries]
+    if not batches:
+        return []
+    pairs = [(user_id, entry[3]) for user_id, entries in batches for entry in entries]
+    done = {}
+    for user_id, idem_key in conn.execute(
+            "SELECT user_id, idem_key FROM coin_ledger WHERE (user_id, idem_key) IN "
+            f"(VALUES {', '.join('(?, ?)' for _ in pairs)})", [v for pair in pairs for v in pair]):
+        done.setdefault(user_id, set()).add(idem_key)
+    batches = [(user_id, _fresh(entries, done.get(user_id, set()))) for user_id, entries in batches]
+    batches = [(user_id, entries) for user_id, entries in batches if entries]
+    if not batches:
+        return []
+    stamp = now if now is not None else time.time()
+    now = int(stamp)
+    users = [user_id for user_id, _ in batches]
+    marks = ", ".join("?" for _ in users)
+    seqs = dict(conn.execute(
+        f"SELECT user_id, MAX(seq) FROM coin_ledger WHERE user_id IN ({marks}) GROUP BY user_id", users))
+    conn.executemany("UPDATE users SET coins = coins + ?, updated_at = ?, version = version + 1 WHERE user_id = ?",
+                     [(sum(amount for amount, _, _, _ in entries), stamp, user_id) for user_id, entries in batches])
+
+    rows = []
+    crossed = []
+    for user_id, entries in batches:
+        seq = first = seqs.get(user_id, 0)
+        for amount, reason, ref, idem_key in entries:
+            seq += 1
+            rows.append((user_id, seq, amount, _REASON_CODES[reason], ref, idem_key, now))
+        if seq // SNAPSHOT_EVERY != first // SNAPSHOT_EVERY:
+            crossed.append((user_id, seq))
+    conn.executemany(
+        "INSERT INTO coin_ledger (user_id, seq, amount, reason, ref, idem_key, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    for user_id, seq in crossed:
+        conn.execute("INSERT OR REPLACE INTO ledger_snapshots (user_id, seq, balance) "
+                     "SELECT user_id, ?, coins FROM users WHERE user_id = ?", (seq, user_id))
+    return batches
+
+
+def replay_balance(conn, user_id):
+    """마지막 스냅샷 + 그 이후 항목 합으로 잔액 재계산 (users.coins 검증용)"""
+    snap = conn.execute(
+        "SELECT seq, balance FROM ledger_snapshots WHERE user_id = ? ORDER BY seq DESC LIMIT 1",
+        (user_id,)).fetchone()
+    seq, balance = snap if snap else (0, 0)
+    tail = conn.execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM coin_ledger WHERE user_id = ? AND seq > ?",
+        (user_id, seq)).fetchone()[0]
+    return balance + tail
+
+
+def history(conn, user_id, limit=50):
+    """최근 항목부터 [{'seq','amount','reason','ref','created_at'}]"""
+    rows = conn.execute(
+        "SELECT seq, amount, reason, ref, created_at FROM coin_ledger WHERE user_id = ? "
+        "ORDER BY seq DESC LIMIT ?", (user_id, limit))
+    return [{'seq': s, 'amount': a, 'reason': REASONS[r], 'ref': ref, 'created_at': c}
+            for s, a, r, ref, c in rows]
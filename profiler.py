@@ -0,0 +1,254 @@
+import functools
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter_ns
+
+# =====================================================
+# 재실행 프로파일러
+# =====================================================
+# app.py 의 구간(mark)과 함수(span/timed)에 이름을 붙여 시간을 잰다.
+# 환경 변수 STUDY_PROFILE 에 출력 방식을 쉼표로 적으면 켜진다.
+#
+#     STUDY_PROFILE=log               재실행마다 구간별 시간을 로그 한 줄로
+#     STUDY_PROFILE=prometheus        STUDY_PROFILE_PORT(기본 9464)의 /metrics 로 노출
+#     STUDY_PROFILE=panel             화면 아래 디버그 패널
+#
+# 꺼져 있으면 span() 은 아무 일도 하지 않는 공용 객체를 돌려주고 timed() 는 함수를
+# 그대로 돌려주므로 비용은 속성 확인 한 번 정도다.
+
+logger = logging.getLogger(__name__)
+
+SINKS = ('log', 'prometheus', 'panel')
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, perf_counter_ns() - self.start)
+        return False
+
+
+class SpanStats:
+    """이름 하나의 누적 통계 (횟수, 합계, 최대, 히스토그램)"""
+
+    __slots__ = ('count', 'total_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        ms = ns / 1e6
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Profiler:
+    """구간/함수 시간과 카운터를 모으는 프로세스 공용 객체"""
+
+    def __init__(self, sinks=()):
+        unknown = set(sinks) - set(SINKS)
+        if unknown:
+            raise ValueError(f"unknown profile sink(s): {', '.join(sorted(unknown))}")
+        self.sinks = frozenset(sinks)
+        self.enabled = bool(self.sinks)
+        self._stats = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- 기록 ---
+
+    def span(self, name):
+        """with profiler.span('이름'): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name=None):
+        """함수 데코레이터. 꺼져 있으면 함수를 그대로 돌려준다."""
+        def decorate(func):
+            if not self.enabled:
+                return func
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Span(self, span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, ns):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = SpanStats()
+            stats.add(ns)
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            run.append((name, ns))
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """지금 값 (메모리 사용량처럼 오르내리는 값)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    # --- 재실행 단위 구간 ---
+    # 스크립트는 위에서 아래로 한 번 실행되므로 with 로 감싸는 대신 구간 시작점만 찍는다.
+
+    def begin_run(self):
+        if not self.enabled:
+            return
+        self._local.run = []
+        self._local.mark = None
+        self._local.run_start = perf_counter_ns()
+        self._local.elements = 0
+        self.count('reruns')
+
+    def mark(self, name):
+        """이전 구간을 닫고 name 구간을 시작"""
+        if not self.enabled or getattr(self._local, 'run', None) is None:
+            return
+        now = perf_counter_ns()
+        previous = self._local.mark
+        if previous is not None:
+            self.record('section.' + previous[0], now - previous[1])
+        self._local.mark = (name, now)
+
+    def end_run(self):
+        """재실행 끝. 이번 실행의 ([(이름, ns)], 화면 요소 수) 를 돌려주고 log 출력이면 한 줄 남긴다."""
+        if not self.enabled or getattr(self._local, 'run', None) is None:
+            return [], 0
+        self.mark(None)
+        total = perf_counter_ns() - self._local.run_start
+        self.record('rerun', total)
+        run, elements = self._local.run, self._local.elements
+        self._local.run = None
+        if 'log' in self.sinks:
+            parts = " ".join(f"{name}={ns / 1e6:.2f}ms" for name, ns in run if name != 'rerun')
+            logger.info("rerun %.2fms elements=%d %s", total / 1e6, elements, parts)
+        return run, elements
+
+    # --- Streamlit 연결 ---
+
+    def watch_context(self, ctx):
+        """스크립트 실행 컨텍스트의 ForwardMsg 전송 함수를 감싸 화면 요소 갱신(delta) 수를 센다"""
+        if not self.enabled or ctx is None or getattr(ctx, '_profiled', False):
+            return
+        enqueue = getattr(ctx, '_enqueue', None)
+        if enqueue is None:
+            return
+
+        def counting_enqueue(msg):
+            if msg.WhichOneof('type') == 'delta':
+                self._local.elements = getattr(self._local, 'elements', 0) + 1
+                self.count('element_updates')
+            enqueue(msg)
+
+        ctx._enqueue = counting_enqueue
+        ctx._profiled = True
+
+    # --- 출력 ---
+
+    def snapshot(self):
+        """{이름: (횟수, 합계 ms, 최대 ms)}, {카운터: 값}"""
+        with self._lock:
+            stats = {name: (s.count, s.total_ns / 1e6, s.max_ns / 1e6) for name, s in self._stats.items()}
+            return stats, dict(self._counters)
+
+    def render_prometheus(self):
+        """Prometheus 텍스트 형식"""
+        lines = []
+        with self._lock:
+            lines.append("# TYPE study_span_seconds histogram")
+            for name, s in sorted(self._stats.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, s.buckets):
+                    cumulative += n
+                    lines.append(f'study_span_seconds_bucket{{span="{name}",le="{bound / 1000}"}} {cumulative}')
+                lines.append(f'study_span_seconds_bucket{{span="{name}",le="+Inf"}} {s.count}')
+                lines.append(f'study_span_seconds_sum{{span="{name}"}} {s.total_ns / 1e9}')
+                lines.append(f'study_span_seconds_count{{span="{name}"}} {s.count}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE study_{name}_total counter")
+                lines.append(f"study_{name}_total {value}")
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE study_{name} gauge")
+                lines.append(f"study_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """/metrics 를 내보내는 HTTP 서버를 데몬 스레드로 시작"""
+        profiler = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = profiler.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=server.serve_forever, name='profile-metrics', daemon=True).start()
+        return server
+
+
+def from_env():
+    sinks = [s.strip() for s in os.environ.get('STUDY_PROFILE', '').split(',') if s.strip()]
+    return Profiler(sinks)
+
+
+# 프로세스 공용 프로파일러 (모듈을 import 하는 모든 곳이 같은 객체를 쓴다)
+profiler = from_env()
+METRICS_PORT = int(os.environ.get('STUDY_PROFILE_PORT', 9464))
@@ -0,0 +1,438 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import events
+from analytics import HOURS, NO_HOUR
+from catalog import load_catalog
+from conditions import compile_vector, names
+from engine import REWARD_PER_MINUTE, study_reward
+from storage import open_storage
+
+# =====================================================
+# 이벤트 재생 (요약 필드 다시 만들기)
+# =====================================================
+# events.py 의 기록을 지금 규칙(보상, 업적 정의)으로 다시 재생해 요약 필드, 일별 기록,
+# 시간대 분포, 업적을 맞춘다. 규칙이 바뀐 뒤(분당 보상, 새 업적) 한 번 돌리면 된다.
+#
+#     python projection.py                     전체 사용자, 스냅샷 이후만 (규칙이 바뀌었으면 처음부터)
+#     python projection.py --full --workers 8  처음부터, 프로세스 8개
+#     python projection.py --user abc --dry-run
+#
+# 사용자 CHUNK_USERS 명씩 이벤트를 한 번에 읽어 numpy 배열 위에서 한 번에 계산한다.
+# 누적값은 사용자 경계에서 끊는 누적합, 연속 공부일은 날짜 차이로 나눈 구간의 길이,
+# 최다 시간대는 (시간대별 누적 횟수, -시) 의 누적 최댓값, 업적 조건은 배열 위에서 평가해
+# 처음 참이 되는 행을 찾는다 (보상이 누적 코인을 늘려 다른 업적을 여는 경우까지 바뀌지 않을 때까지 반복).
+# 보상 계산은 engine.study_reward 를 (세션 길이, 보상에 영향을 주는 보유 아이템) 조합마다 한 번 불러
+# 표로 만들어 쓰므로 엔진 규칙이 곧 재생 규칙이다.
+#
+# 사용자마다 마지막 재생 상태를 스냅샷으로 남기고(SNAPSHOT_EVERY 개 이상 새 이벤트가 쌓였을 때),
+# 다음 재생은 스냅샷 이후의 이벤트만 읽는다. 스냅샷은 규칙 키(rules_key)가 같을 때만 쓰고,
+# 스냅샷보다 이른 시각의 이벤트가 나중에 들어왔으면(위젯 동기화, 기록 가져오기) 그 사용자만 처음부터 다시 한다.
+# 코인 잔액은 원장이 기준이라 바꾸지 않는다 (새로 달성한 업적의 보상만 원장으로 지급).
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION = 1           # 재생 계산 방식을 바꾸면 올린다 (스냅샷 무효화)
+CHUNK_USERS = 2000
+SNAPSHOT_EVERY = 100
+
+STUDY, IMPORT, PURCHASE, RESET = (events.KIND_CODES[kind] for kind in ('study', 'import', 'purchase', 'reset'))
+REWARD_SAMPLES = (1, 5, 25, 50, 90)     # 규칙 키에 넣는 보상 표본 (세션 길이, 분)
+_NEVER = np.iinfo(np.int64).max
+
+# 재생 상태 (스냅샷 JSON 과 같은 모양)
+EMPTY_STATE = {
+    'seq': 0,
+    'last_at': 0,
+    'total_sessions': 0,
+    'total_minutes': 0,
+    'study_coins': 0,               # 공부 보상 합계 (업적 보상 제외)
+    'total_coins_earned': 0,
+    'completed_cycles': 0,
+    'current_cycle_count': 0,
+    'today_day': None,              # 마지막으로 공부한 날과 그날의 통계
+    'today_sessions': 0,
+    'today_minutes': 0,
+    'current_streak': 0,
+    'longest_streak': 0,
+    'last_study_date': None,
+    'hour_sessions': [0] * HOURS,
+    'hour_minutes': [0] * HOURS,
+    'owned': [],                    # 보상에 영향을 주는 아이템 중 보유한 것
+    'unlocked': {},                 # 업적 키 → 달성 시각
+}
+
+
+def _condition(ach):
+    return ach['condition'] if 'condition' in ach else f"{ach['metric']} >= {ach['threshold']}"
+
+
+def reward_items(catalog):
+    """가지고 있으면 공부 보상이 달라지는 아이템 키 (지금은 double_coin)"""
+    base = study_reward(25)[0]
+    return sorted(key for key in {**catalog.items, **catalog.themes} if study_reward(25, {key})[0] != base)
+
+
+def rules_key(definitions, items):
+    """보상/업적 규칙의 지문. 바뀌면 예전 스냅샷을 쓰지 않는다."""
+    rules = {
+        'version': RULES_VERSION,
+        'reward_per_minute': REWARD_PER_MINUTE,
+        'rewards': [study_reward(d, owned)[0] for d in REWARD_SAMPLES for owned in ((), set(items))],
+        'achievements': {key: [_condition(ach), ach['reward']] for key, ach in definitions.items()},
+    }
+    return hashlib.sha1(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def _starts(*columns):
+    """정렬된 열들의 값이 바뀌는 행 (첫 행 포함)"""
+    starts = np.zeros(len(columns[0]), dtype=bool)
+    if len(starts):
+        starts[0] = True
+        for column in columns:
+            starts[1:] |= column[1:] != column[:-1]
+    return starts
+
+
+def _segment_cumsum(values, starts):
+    """starts 가 True 인 행에서 다시 시작하는 누적합"""
+    total = np.cumsum(values)
+    if not len(values):
+        return total
+    first = np.flatnonzero(starts)
+    offset = (total - values)[first]
+    return total - np.repeat(offset, np.diff(np.append(first, len(values))))
+
+
+def _segment_cummax(values, starts):
+    """starts 가 True 인 행에서 다시 시작하는 누적 최댓값 (values >= 0)"""
+    shift = np.cumsum(starts).astype(np.int64) << 40
+    return np.maximum.accumulate(values + shift) - shift if len(values) else values
+
+
+def _first_of_segment(values, starts):
+    """각 행이 속한 구간의 첫 행 값"""
+    return values[np.flatnonzero(starts)][np.cumsum(starts) - 1]
+
+
+def _day_numbers(days):
+    return np.asarray(days, dtype='datetime64[D]').astype(np.int64)
+
+
+def _day_number(day, missing):
+    return int(_day_numbers([day])[0]) if day else missing
+
+
+class Projector:
+    """한 규칙(업적 정의 + 보상 아이템)으로 여러 사용자의 이벤트를 한 번에 재생"""
+
+    def __init__(self, definitions, items):
+        self.definitions = definitions
+        self.items = list(items)
+        self.rules = rules_key(definitions, self.items)
+        self.keys = list(definitions)
+        self.rewards = np.array([definitions[key]['reward'] for key in self.keys], dtype=np.int64)
+        self.conditions = [compile_vector(_condition(definitions[key])) for key in self.keys]
+        # 재생으로 만들지 않는 이름(설정값 등)은 지금 프로필 값으로 평가한다
+        used = set()
+        for ach in definitions.values():
+            used |= names(_condition(ach))
+        self.profile_names = sorted(used - set(EMPTY_STATE) - {'best_hour', 'avg_session_minutes', 'last_date'})
+        self._reward_table = {}
+
+    def _study_rewards(self, minutes, masks):
+        """(세션 길이, 보유 아이템 비트마스크) 조합마다 engine.study_reward 를 한 번씩 불러 표로"""
+        width = len(self.items)
+        combo = minutes << width | masks
+        unique, inverse = np.unique(combo, return_inverse=True)
+        table = np.empty(len(unique), dtype=np.int64)
+        for i, value in enumerate(unique.tolist()):
+            if value not in self._reward_table:
+                owned = {item for bit, item in enumerate(self.items) if value >> bit & 1}
+                self._reward_table[value] = study_reward(value >> width, owned)[0]
+            table[i] = self._reward_table[value]
+        return table[inverse.reshape(-1)]
+
+    def run(self, user_ids, rows, init=None, profiles=None):
+        """user_ids(정렬)의 이벤트 rows(load_events 결과)를 init({user_id: 상태}) 뒤에 이어 재생
+
+        ({user_id: 새 상태}, 일별 기록 [(user_id, day, sessions, minutes)]) 반환. 이벤트가 없는 사용자는 빠진다.
+        """
+        if not rows:
+            return {}, []
+        init = init or {}
+        profiles = profiles or {}
+        states = [init.get(user_id) or EMPTY_STATE for user_id in user_ids]
+        n_users = len(user_ids)
+        index = {user_id: i for i, user_id in enumerate(user_ids)}
+        users, seqs, kinds, ats, days, hours, minutes, refs = zip(*rows)
+        u = np.fromiter((index[user_id] for user_id in users), np.int64, len(rows))
+        seq = np.array(seqs, dtype=np.int64)
+        kind = np.array(kinds, dtype=np.int64)
+        at = np.array(ats, dtype=np.int64)
+        ref = np.array(refs, dtype=object)
+        pos = np.arange(len(rows))
+        user_first = _starts(u)
+
+        def initial(name):
+            return np.array([state[name] for state in states], dtype=np.int64)
+
+        # --- 보유 아이템 (보상에 영향을 주는 것만): 처음 산 행 이후면 보유 ---
+        masks = np.zeros(len(rows), dtype=np.int64)
+        owned_bits = np.zeros(n_users, dtype=np.int64)
+        for bit, item in enumerate(self.items):
+            first = np.array([-1 if item in state['owned'] else _NEVER for state in states], dtype=np.int64)
+            bought = (kind == PURCHASE) & (ref == item)
+            np.minimum.at(first, u[bought], pos[bought])
+            masks |= (pos > first[u]).astype(np.int64) << bit
+            owned_bits |= (first != _NEVER).astype(np.int64) << bit
+
+        # --- 사이클 위치: 타이머 세션마다 1, 사이클 완료와 초기화에서 0 ---
+        boundary = (kind == RESET) | ((kind == STUDY) & (ref == 'cycle'))
+        timer = (kind == STUDY) & np.equal(ref, None)
+        segment_starts = user_first | boundary
+        cycle = _segment_cumsum(timer.astype(np.int64), segment_starts)
+        segment = np.cumsum(segment_starts)
+        carried = (segment == _first_of_segment(segment, user_first)) & ~_first_of_segment(boundary, user_first)
+        cycle += np.where(carried, initial('current_cycle_count')[u], 0)
+
+        # --- 공부 세션 행 ---
+        idx = np.flatnonzero((kind == STUDY) | (kind == IMPORT))
+        m = len(idx)
+        su = u[idx]
+        smin = np.array(minutes, dtype=np.int64)[idx]
+        shour = np.array(hours, dtype=np.int64)[idx]
+        sday = np.array(days, dtype=object)[idx]
+        dayn = _day_numbers(sday)
+        ones = np.ones(m, dtype=np.int64)
+        s_first = _starts(su)
+        day_first = _starts(su, dayn)
+
+        rewards = np.where(kind[idx] == STUDY, self._study_rewards(smin, masks[idx]), 0)
+        study_coins = initial('study_coins')[su] + _segment_cumsum(rewards, s_first)
+        metrics = {
+            'total_sessions': initial('total_sessions')[su] + _segment_cumsum(ones, s_first),
+            'total_minutes': initial('total_minutes')[su] + _segment_cumsum(smin, s_first),
+            'completed_cycles': initial('completed_cycles')[su] + _segment_cumsum(
+                ((kind == STUDY) & (ref == 'cycle'))[idx].astype(np.int64), s_first),
+            'current_cycle_count': cycle[idx],
+        }
+
+        # 오늘 통계: (사용자, 날짜) 구간 누적 + 스냅샷의 같은 날 값
+        same_day = dayn == np.array([_day_number(s['today_day'], -1) for s in states], dtype=np.int64)[su]
+        metrics['today_sessions'] = _segment_cumsum(ones, day_first) + np.where(
+            same_day, initial('today_sessions')[su], 0)
+        metrics['today_minutes'] = _segment_cumsum(smin, day_first) + np.where(
+            same_day, initial('today_minutes')[su], 0)
+
+        # 연속 공부일: 날짜별 첫 행에서 전날과 이어지는지 보고 이어진 구간의 길이를 센다
+        d_rows = np.flatnonzero(day_first)
+        du, dd = su[d_rows], dayn[d_rows]
+        d_first = s_first[d_rows]
+        last_study = np.array([_day_number(s['last_study_date'], -2) for s in states], dtype=np.int64)
+        prev = np.where(d_first, last_study[du], np.append(0, dd[:-1]))
+        same = dd == prev                                   # 스냅샷의 마지막 공부일과 같은 날
+        new_run = ~((dd - prev == 1) | same)
+        run_starts = d_first | new_run
+        run = np.cumsum(run_starts)
+        continued = (run == _first_of_segment(run, d_first)) & ~_first_of_segment(new_run, d_first)
+        streak = _segment_cumsum(np.ones(len(d_rows), dtype=np.int64), run_starts) + np.where(
+            continued, initial('current_streak')[du] - _first_of_segment(same, d_first), 0)
+        longest = np.maximum(_segment_cummax(streak, d_first), initial('longest_streak')[du])
+        day_of_row = np.cumsum(day_first) - 1
+        metrics['current_streak'] = streak[day_of_row]
+        metrics['longest_streak'] = longest[day_of_row]
+
+        # 최다 시간대: 시간대별 누적 횟수로 (횟수, 31 - 시) 의 누적 최댓값 (동률이면 이른 시)
+        hour_sessions = np.array([s['hour_sessions'] for s in states], dtype=np.int64).reshape(n_users, HOURS)
+        order = np.lexsort((np.arange(m), shour, su))
+        count = np.empty(m, dtype=np.int64)
+        count[order] = _segment_cumsum(ones[order], _starts(su[order], shour[order]))
+        count += hour_sessions[su, shour]
+        init_key = np.where(hour_sessions.any(axis=1),
+                            (hour_sessions * 32 + (31 - np.arange(HOURS))).max(axis=1), 0)
+        key = np.maximum(_segment_cummax(count * 32 + (31 - shour), s_first), init_key[su])
+        metrics['best_hour'] = np.where(key > 0, 31 - key % 32, NO_HOUR)
+        metrics['avg_session_minutes'] = metrics['total_minutes'] / np.maximum(metrics['total_sessions'], 1)
+        metrics['last_date'] = metrics['last_study_date'] = sday
+        for name in self.profile_names:
+            metrics[name] = np.array([profiles.get(user_id, {}).get(name, 0) for user_id in user_ids])[su]
+
+        # --- 업적: 조건이 처음 참이 되는 행. 업적 보상이 누적 코인을 늘려 다른 업적을 열 수 있으므로
+        # 달성 행이 더 바뀌지 않을 때까지 반복한다 (달성 행은 앞당겨지기만 하므로 끝난다) ---
+        already = np.array([[key in state['unlocked'] for key in self.keys] for state in states],
+                           dtype=bool).reshape(n_users, len(self.keys))
+        unlock = np.where(already, -1, _NEVER)
+        row = np.arange(m)
+        changed = True
+        while changed:
+            metrics['total_coins_earned'] = study_coins + (self.rewards * (row[:, None] >= unlock[su])).sum(axis=1)
+            changed = False
+            for k, condition in enumerate(self.conditions):
+                hit = np.broadcast_to(np.asarray(condition(metrics), dtype=bool), (m,)) & ~already[su, k]
+                first = unlock[:, k].copy()
+                np.minimum.at(first, su[hit], row[hit])
+                if (first != unlock[:, k]).any():
+                    unlock[:, k] = first
+                    changed = True
+
+        # --- 사용자별 마지막 값 ---
+        last_event = np.full(n_users, -1)
+        np.maximum.at(last_event, u, pos)
+        last_seq = np.zeros(n_users, dtype=np.int64)
+        np.maximum.at(last_seq, u, seq)
+        last_row = np.full(n_users, -1)
+        np.maximum.at(last_row, su, row)
+        np.add.at(hour_sessions, (su, shour), 1)
+        hour_minutes = np.array([s['hour_minutes'] for s in states], dtype=np.int64).reshape(n_users, HOURS)
+        np.add.at(hour_minutes, (su, shour), smin)
+        study_at = at[idx]
+
+        result = {}
+        for i in np.flatnonzero(last_event >= 0).tolist():
+            state = dict(states[i])
+            e, r = last_event[i], last_row[i]
+            state['seq'] = int(last_seq[i])
+            state['last_at'] = max(state['last_at'], int(at[e]))
+            state['current_cycle_count'] = int(cycle[e])
+            state['owned'] = [item for bit, item in enumerate(self.items) if owned_bits[i] >> bit & 1]
+            if r >= 0:
+                for name in ('total_sessions', 'total_minutes', 'completed_cycles', 'today_sessions',
+                             'today_minutes', 'current_streak', 'longest_streak'):
+                    state[name] = int(metrics[name][r])
+                state['study_coins'] = int(study_coins[r])
+                state['today_day'] = state['last_study_date'] = sday[r]
+                state['hour_sessions'] = hour_sessions[i].tolist()
+                state['hour_minutes'] = hour_minutes[i].tolist()
+            unlocked = dict(state['unlocked'])
+            for k in np.flatnonzero((unlock[i] >= 0) & (unlock[i] != _NEVER)).tolist():
+                unlocked[self.keys[k]] = int(study_at[unlock[i, k]])
+            state['unlocked'] = unlocked
+            state['total_coins_earned'] = state['study_coins'] + sum(
+                self.definitions[key]['reward'] for key in unlocked if key in self.definitions)
+            result[user_ids[i]] = state
+
+        # 일별 기록 (재생한 날짜만, 스냅샷의 같은 날 값 포함)
+        sessions = np.diff(np.append(d_rows, m))
+        day_minutes = np.add.reduceat(smin, d_rows) if m else smin
+        daily = []
+        for j, r in enumerate(d_rows.tolist()):
+            i = su[r]
+            extra = states[i]['today_day'] == sday[r]
+            daily.append((user_ids[i], sday[r],
+                          int(sessions[j]) + (states[i]['today_sessions'] if extra else 0),
+                          int(day_minutes[j]) + (states[i]['today_minutes'] if extra else 0)))
+        return result, daily
+
+
+# =====================================================
+# 재생 실행 (사용자 묶음 / 프로세스 풀)
+# =====================================================
+
+def open_projector(catalog=None):
+    """지금 카탈로그 규칙의 Projector"""
+    catalog = catalog or load_catalog()
+    return Projector(catalog.achievements, reward_items(catalog))
+
+
+def project_chunk(store, projector, user_ids, full=False, apply=True):
+    """사용자 묶음 하나를 재생하고 (apply 면) 저장. 요약 dict"""
+    snapshots = {} if full else store.load_projection_snapshots(user_ids, projector.rules)
+    init = {user_id: json.loads(state) for user_id, (_, _, state) in snapshots.items()}
+    rows = store.load_events(user_ids, {user_id: state['seq'] for user_id, state in init.items()})
+    # 스냅샷보다 이른 시각의 이벤트가 나중에 들어온 사용자는 처음부터
+    late = sorted({row[0] for row in rows if row[0] in init and row[3] < init[row[0]]['last_at']})
+    if late:
+        for user_id in late:
+            del init[user_id]
+        rows = sorted([row for row in rows if row[0] not in late] + store.load_events(late),
+                      key=lambda row: (row[0], row[3], row[1]))
+    profiles = store.load_profiles(user_ids) if projector.profile_names or not apply else {}
+    result, daily = projector.run(user_ids, rows, init, profiles)
+
+    summary = {'users': len(user_ids), 'events': len(rows), 'projected': len(result),
+               'from_start': sum(1 for user_id in result if user_id not in init), 'applied': 0, 'achievements': 0}
+    if apply:
+        keep = {user_id: (projector.rules, json.dumps(state, separators=(',', ':')))
+                for user_id, state in result.items()
+                if user_id not in init or state['seq'] - init[user_id]['seq'] >= SNAPSHOT_EVERY}
+        applied, unlocked = store.apply_projections(
+            result, daily, {key: ach['reward'] for key, ach in projector.definitions.items()}, keep,
+            {user_id for user_id in result if user_id not in init})
+        summary.update(applied=len(applied), achievements=unlocked)
+    else:
+        summary['changed'] = sum(1 for user_id, state in result.items() if _differs(profiles.get(user_id), state))
+    return summary
+
+
+COMPARED = ('total_sessions', 'total_minutes', 'total_coins_earned', 'completed_cycles', 'longest_streak')
+
+
+def _differs(profile, state):
+    if profile is None:
+        return True
+    return (any(profile[name] != state[name] for name in COMPARED)
+            or not set(state['unlocked']) <= set(profile['unlocked_achievements']))
+
+
+_worker = None
+
+
+def _init_worker(db_path, definitions, items):
+    global _worker
+    _worker = (open_storage(db_path), Projector(definitions, items))
+
+
+def _run_chunk(args):
+    store, projector = _worker
+    return project_chunk(store, projector, *args)
+
+
+def rebuild(store, projector, user_ids=None, full=False, apply=True, workers=1, chunk_users=CHUNK_USERS):
+    """사용자 전체(또는 user_ids)를 chunk_users 명씩 재생. workers > 1 이면 프로세스 풀에서 나눠 돈다.
+
+    각 프로세스는 자기 저장소 연결로 읽고 쓴다 (쓰기는 SQLite 잠금으로 차례대로). 합친 요약 dict 반환
+    """
+    started = time.perf_counter()
+    user_ids = sorted(user_ids) if user_ids else store.projection_users()
+    chunks = [(user_ids[i:i + chunk_users], full, apply) for i in range(0, len(user_ids), chunk_users)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(store.path, projector.definitions, projector.items)) as pool:
+            summaries = list(pool.map(_run_chunk, chunks))
+    else:
+        summaries = [project_chunk(store, projector, *chunk) for chunk in chunks]
+    total = {'users': 0, 'events': 0, 'projected': 0, 'from_start': 0, 'applied': 0, 'achievements': 0}
+    for summary in summaries:
+        for key, value in summary.items():
+            total[key] = total.get(key, 0) + value
+    total['seconds'] = time.perf_counter() - started
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이벤트 기록을 지금 규칙으로 재생해 요약 필드를 다시 만든다")
+    parser.add_argument('--user', action='append', help="이 사용자만 (여러 번 지정 가능)")
+    parser.add_argument('--full', action='store_true', help="스냅샷을 쓰지 않고 처음부터")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=CHUNK_USERS, help="한 번에 재생하는 사용자 수")
+    parser.add_argument('--dry-run', action='store_true', help="계산만 하고 저장하지 않음 (달라질 사용자 수 출력)")
+    parser.add_argument('--db', help="저장소 경로 (기본: STUDY_DB_PATH)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = open_storage(args.db)
+    projector = open_projector()
+    summary = rebuild(store, projector, args.user, args.full, not args.dry_run, args.workers, args.chunk)
+    logger.info("rules %s: %s", projector.rules, summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import service
+
+# =====================================================
+# 스터디룸 (방 하나에 시계 하나)
+# =====================================================
+# 방의 공부/휴식 사이클은 생성 시각(started_at)과 세션 길이만으로 정해진다.
+# 허브 스레드가 tick 마다 방별로 현재 구간을 한 번 계산해 RoomTick 으로 발행하고,
+# 보는 사람들은 그 객체를 읽기만 한다. 구독자가 몇 명이든 tick 비용은 방 수에 비례한다.
+# 공부 구간이 끝나면 멤버 전원의 보상을 service.complete_room_session 으로 한 번에 기록한다.
+#
+# 시계가 시각만의 함수이므로 여러 복제본이 각자 허브를 돌려도 같은 구간을 보고,
+# 보상은 원장의 멱등 키(room:<방>:<구간 번호>)로 한 번만 지급된다.
+# 방 목록/멤버는 저장소가 원본이고 허브는 REFRESH_INTERVAL 마다 다시 읽는다.
+# 보상 처리가 끝난 마지막 구간 번호(credited_phase)도 저장소에 남기므로, 재시작하거나
+# 허브가 멈춘 사이 끝난 공부 구간은 다음 tick 에 따라잡는다 (CATCH_UP_PHASES 개까지).
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 5.0   # 다른 복제본에서 생긴 방/멤버 변경을 다시 읽는 간격 (초)
+CATCH_UP_PHASES = 48     # 한 번에 따라잡는 지난 구간 수 상한 (기본 설정으로 약 12시간)
+
+
+class RoomPhase:
+    """방 시계의 한 구간. index 는 방이 생긴 뒤 몇 번째 구간인지 (보상 멱등 키에 씀)"""
+
+    __slots__ = ('index', 'is_study', 'is_long_break', 'start', 'deadline', 'cycle_count')
+
+    def __init__(self, index, is_study, is_long_break, start, deadline, cycle_count):
+        self.index = index
+        self.is_study = is_study
+        self.is_long_break = is_long_break
+        self.start = start
+        self.deadline = deadline
+        self.cycle_count = cycle_count      # 이번 사이클에서 끝낸 공부 수
+
+    @property
+    def duration(self):
+        """구간 길이 (분)"""
+        return int(round((self.deadline - self.start) / 60))
+
+
+class RoomClock:
+    """공부 n 번, 그 사이 짧은 휴식, 마지막에 긴 휴식을 반복하는 방 시계 (엔진 사이클 규칙과 같음)"""
+
+    __slots__ = ('started_at', '_segments', '_cycle_seconds')
+
+    def __init__(self, started_at, study_duration, break_duration, long_break_duration,
+                 sessions_before_long_break):
+        self.started_at = started_at
+        segments = []
+        for i in range(sessions_before_long_break):
+            segments.append((True, False, study_duration * 60))
+            if i < sessions_before_long_break - 1:
+                segments.append((False, False, break_duration * 60))
+        segments.append((False, True, long_break_duration * 60))
+        self._segments = segments
+        self._cycle_seconds = sum(seconds for _, _, seconds in segments)
+
+    def phase_at(self, now):
+        cycle, offset = divmod(max(0.0, now - self.started_at), self._cycle_seconds)
+        cycle = int(cycle)
+        start = self.started_at + cycle * self._cycle_seconds
+        studies = 0
+        for i, (is_study, is_long_break, seconds) in enumerate(self._segments):
+            if offset < seconds:
+                return RoomPhase(cycle * len(self._segments) + i, is_study, is_long_break,
+                                 start, start + seconds, studies)
+            offset -= seconds
+            start += seconds
+            studies += is_study
+        # 부동소수 오차로 끝에 닿은 경우: 다음 사이클 첫 구간
+        return self.phase_at(start + 1e-6)
+
+    def phase(self, index):
+        """index 번째 구간 (지난 구간을 다시 계산할 때)"""
+        cycle, position = divmod(index, len(self._segments))
+        start = self.started_at + cycle * self._cycle_seconds
+        studies = 0
+        for is_study, _, seconds in self._segments[:position]:
+            start += seconds
+            studies += is_study
+        is_study, is_long_break, seconds = self._segments[position]
+        return RoomPhase(index, is_study, is_long_break, start, start + seconds, studies)
+
+
+class RoomTick:
+    """한 tick 에 방별로 한 번 만들어 모든 구독자가 같이 읽는 값 (바꾸지 않는다)"""
+
+    __slots__ = ('room_id', 'name', 'phase', 'remaining', 'members', 'at',
+                 'sessions_before_long_break')
+
+    def __init__(self, room, phase, now):
+        self.room_id = room.room_id
+        self.name = room.name
+        self.phase = phase
+        self.remaining = max(0.0, phase.deadline - now)
+        self.members = len(room.members)
+        self.at = now
+        self.sessions_before_long_break = room.settings['sessions_before_long_break']
+
+
+class Room:
+    __slots__ = ('room_id', 'name', 'settings', 'clock', 'members', 'joined', 'credited', 'latest', 'subscribers')
+
+    def __init__(self, room_id, name, settings, joined=None, credited=-1):
+        self.room_id = room_id
+        self.name = name
+        self.settings = settings
+        self.clock = RoomClock(**settings)
+        self.joined = dict(joined or {})   # user_id → 입장 시각
+        self.members = set(self.joined)
+        self.credited = credited    # 보상 처리가 끝난 마지막 구간 번호
+        self.latest = None          # 마지막으로 발행한 RoomTick
+        self.subscribers = {}       # 토큰 → 콜백 (알림이 필요한 구독자만)
+
+
+class Subscription:
+    """방 구독. latest 는 허브가 마지막으로 발행한 RoomTick (계산 없이 참조만 읽음)"""
+
+    __slots__ = ('hub', 'room_id', 'token')
+
+    def __init__(self, hub, room_id, token):
+        self.hub = hub
+        self.room_id = room_id
+        self.token = token
+
+    @property
+    def latest(self):
+        return self.hub.latest(self.room_id)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class RoomHub:
+    """모든 방의 시계를 worker 스레드 하나로 돌리고 구독자에게 발행"""
+
+    def __init__(self, store, engine_source, tick=1.0, clock=time.time, on_complete=None):
+        self.store = store
+        self.engine_source = engine_source      # 호출하면 지금 업적 엔진 (카탈로그가 바뀔 수 있음)
+        self.on_complete = on_complete          # on_complete(보상받은 user_id 목록, 날짜, 분)
+        self.tick_interval = tick
+        self.clock = clock
+        self._rooms = {}
+        self._room_of = {}          # user_id → room_id
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._refreshed = None
+        self.refresh()
+
+    # --- 방/멤버 ---
+
+    def refresh(self):
+        """저장소의 방 목록/멤버로 맞춤. 이미 있는 방의 시계와 마지막 구간은 유지한다.
+        보상 처리한 구간 번호는 저장소 쪽이 앞서 있으면(다른 복제본) 따라간다."""
+        rows = self.store.load_rooms()
+        with self._lock:
+            rooms = {}
+            for row in rows:
+                room = self._rooms.get(row['room_id'])
+                if room is None:
+                    settings = {k: row[k] for k in ('started_at', 'study_duration', 'break_duration',
+                                                    'long_break_duration', 'sessions_before_long_break')}
+                    room = Room(row['room_id'], row['name'], settings)
+                room.joined = dict(row['joined'])
+                room.members = set(row['members'])
+                room.credited = max(room.credited, row['credited_phase'])
+                rooms[room.room_id] = room
+            self._rooms = rooms
+            self._room_of = {user_id: room.room_id for room in rooms.values() for user_id in room.members}
+        self._refreshed = self.clock()
+
+    def create_room(self, name, study_duration=25, break_duration=5, long_break_duration=15,
+                    sessions_before_long_break=4, owner=None):
+        """방을 만들고 owner 를 입장시킴. room_id 반환. 시계는 지금부터 공부 구간으로 시작한다."""
+        room_id = uuid.uuid4().hex[:8]
+        settings = {
+            'started_at': self.clock(),
+            'study_duration': max(1, int(study_duration)),
+            'break_duration': max(1, int(break_duration)),
+            'long_break_duration': max(1, int(long_break_duration)),
+            'sessions_before_long_break': max(1, int(sessions_before_long_break)),
+        }
+        self.store.create_room(room_id, name=name, **settings)
+        with self._lock:
+            self._rooms[room_id] = Room(room_id, name, settings)
+        if owner is not None:
+            self.join(room_id, owner)
+        self.publish(self._rooms[room_id], self.clock())
+        return room_id
+
+    def join(self, room_id, user_id):
+        joined_at = self.store.join_room(room_id, user_id)
+        with self._lock:
+            changed = [self._leave_locked(user_id)]
+            room = self._rooms.get(room_id)
+            if room is not None:
+                room.members.add(user_id)
+                room.joined[user_id] = joined_at
+                self._room_of[user_id] = room_id
+                changed.append(room)
+        self._republish(changed)
+
+    def leave(self, user_id):
+        self.store.leave_room(user_id)
+        with self._lock:
+            room = self._leave_locked(user_id)
+        self._republish([room])
+
+    def _leave_locked(self, user_id):
+        """멤버를 빼고 남은 방 반환 (방이 비어 없어졌거나 방에 없었으면 None)"""
+        room = self._rooms.get(self._room_of.pop(user_id, None))
+        if room is None:
+            return None
+        room.members.discard(user_id)
+        room.joined.pop(user_id, None)
+        if not room.members:
+            del self._rooms[room.room_id]
+            return None
+        return room
+
+    def _republish(self, rooms):
+        """멤버 수가 바뀐 방은 다음 tick 을 기다리지 않고 다시 발행 (이미 발행된 방만)"""
+        now = self.clock()
+        for room in rooms:
+            if room is not None and room.latest is not None:
+                self.publish(room, now, room.latest.phase)
+
+    def room_of(self, user_id):
+        return self._room_of.get(user_id)
+
+    def rooms(self):
+        """모든 방의 마지막 RoomTick (아직 발행 전인 방은 빠짐)"""
+        return [room.latest for room in list(self._rooms.values()) if room.latest is not None]
+
+    # --- 구독 ---
+
+    def subscribe(self, room_id, callback=None):
+        """callback 을 주면 발행할 때마다 callback(RoomTick) 을 부른다 (푸시가 필요한 구독자).
+        화면처럼 주기적으로 다시 그리는 구독자는 callback 없이 latest 만 읽으면 된다."""
+        subscription = Subscription(self, room_id, uuid.uuid4().hex)
+        if callback is not None:
+            with self._lock:
+                room = self._rooms.get(room_id)
+                if room is not None:
+                    room.subscribers[subscription.token] = callback
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            room = self._rooms.get(subscription.room_id)
+            if room is not None:
+                room.subscribers.pop(subscription.token, None)
+
+    def latest(self, room_id):
+        room = self._rooms.get(room_id)
+        return room.latest if room is not None else None
+
+    def publish(self, room, now, phase=None):
+        tick = RoomTick(room, phase or room.clock.phase_at(now), now)
+        room.latest = tick
+        for callback in list(room.subscribers.values()):
+            try:
+                callback(tick)
+            except Exception:
+                logger.exception("room subscriber failed: %s", room.room_id)
+        return tick
+
+    # --- tick ---
+
+    def tick(self, now=None):
+        """방마다 현재 구간을 한 번 계산해 발행하고, 끝난 공부 구간은 보상 기록. 완료한 구간 수 반환"""
+        now = self.clock() if now is None else now
+        if now - self._refreshed >= REFRESH_INTERVAL:
+            self.refresh()
+        completed = 0
+        for room in list(self._rooms.values()):
+            phase = room.clock.phase_at(now)
+            # 보상을 먼저 기록하고 발행해야 새 구간을 본 구독자가 보상도 읽을 수 있다.
+            completed += self._settle(room, phase)
+            self.publish(room, now, phase)
+        return completed
+
+    def _settle(self, room, phase):
+        """phase 전에 끝났는데 아직 처리하지 않은 공부 구간의 보상 기록. 완료한 구간 수 반환
+
+        평소에는 막 끝난 구간 하나지만, 재시작/멈춤 뒤에는 그동안 끝난 구간을 모두 따라잡는다.
+        """
+        first = room.credited + 1
+        if phase.index - first > CATCH_UP_PHASES:
+            logger.warning("room %s: skipping %d missed phases", room.room_id, phase.index - first - CATCH_UP_PHASES)
+            first = phase.index - CATCH_UP_PHASES
+        completed = 0
+        for index in range(first, phase.index):
+            missed = room.clock.phase(index)
+            if missed.is_study:
+                self._complete(room, missed)
+                completed += 1
+        room.credited = max(room.credited, phase.index - 1)
+        return completed
+
+    def _complete(self, room, phase):
+        with self._lock:
+            joined = dict(room.joined)
+        when = datetime.fromtimestamp(phase.deadline)
+        try:
+            credited = service.complete_room_session(self.store, self.engine_source(), room.room_id, phase.index,
+                                                     phase.duration, joined, when, phase.start)
+            # 보상과 따로 기록하지만, 그 사이에 죽어 다시 처리해도 원장 멱등 키로 한 번만 지급된다
+            self.store.mark_room_phase(room.room_id, phase.index)
+            if credited and self.on_complete is not None:
+                self.on_complete(credited, str(when.date()), phase.duration)
+        except Exception:
+            logger.exception("room completion failed: %s #%d", room.room_id, phase.index)
+
+    # --- 스레드 ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='room-hub', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.tick_interval):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("room tick failed")
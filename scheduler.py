@@ -0,0 +1,118 @@
+import logging
+import math
+import threading
+import time
+
+# =====================================================
+# 마감 시각 스케줄러 (해시 타이머 휠)
+# =====================================================
+# 프로세스 전체에서 스레드 하나가 모든 사용자의 세션 마감을 처리한다.
+# 브라우저 탭이 닫혀 있어도 마감 시각이 되면 완료 콜백이 실행된다.
+# 등록/취소는 슬롯 dict 에 넣고 빼는 것뿐이라 O(1) 이다.
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """tick 초 단위 슬롯 slots 개짜리 해시 타이머 휠. 키당 타이머 하나
+
+    마감 시각이 휠 한 바퀴(tick * slots 초)보다 멀면 같은 슬롯을 몇 바퀴 지나친 뒤 실행된다.
+    """
+
+    def __init__(self, tick=1.0, slots=512, now=0.0):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]
+        self._slot_of = {}                   # key → 슬롯 번호
+        self._cursor = int(now // tick)      # 다음에 처리할 tick 번호
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def _tick_of(self, deadline):
+        """마감 시각 이후 첫 tick (그 tick 을 처리할 때는 반드시 마감이 지나 있음)"""
+        return math.ceil(deadline / self.tick)
+
+    def schedule(self, key, deadline, callback):
+        """같은 키의 기존 타이머는 대체된다"""
+        self.cancel(key)
+        tick = self._tick_of(deadline)
+        if tick < self._cursor:
+            tick = self._cursor       # 이미 지난 마감은 다음 처리 때 바로 실행
+        index = tick % len(self.slots)
+        self.slots[index][key] = (deadline, callback)
+        self._slot_of[key] = index
+
+    def cancel(self, key):
+        index = self._slot_of.pop(key, None)
+        if index is None:
+            return False
+        del self.slots[index][key]
+        return True
+
+    def advance(self, now):
+        """now 까지 마감된 (key, deadline, callback) 목록을 꺼내 반환"""
+        target = int(now // self.tick)
+        due = []
+        # 휠 한 바퀴 이상 밀렸으면 모든 슬롯을 한 번씩만 보면 된다
+        start = max(self._cursor, target - len(self.slots) + 1)
+        for tick in range(start, target + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            for key, (deadline, callback) in list(slot.items()):
+                if deadline <= now:
+                    del slot[key]
+                    del self._slot_of[key]
+                    due.append((key, deadline, callback))
+        self._cursor = max(self._cursor, target + 1)
+        return due
+
+
+class DeadlineScheduler:
+    """TimerWheel 을 worker 스레드 하나로 돌리는 스케줄러"""
+
+    def __init__(self, tick=1.0, slots=512, clock=time.time):
+        self.wheel = TimerWheel(tick, slots, clock())
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='deadline-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, key, deadline, callback):
+        with self._lock:
+            self.wheel.schedule(key, deadline, callback)
+
+    def cancel(self, key):
+        with self._lock:
+            return self.wheel.cancel(key)
+
+    def pending(self):
+        with self._lock:
+            return len(self.wheel)
+
+    def run_due(self):
+        """마감된 콜백 실행. 실행한 개수 반환 (worker 스레드가 주기적으로 호출)"""
+        with self._lock:
+            due = self.wheel.advance(self.clock())
+        for key, deadline, callback in due:
+            try:
+                callback()
+            except Exception:
+                logger.exception("deadline callback failed: %s @ %s", key, deadline)
+        return len(due)
+
+    def _run(self):
+        while not self._stop.wait(self.wheel.tick):
+            self.run_due()
@@ -0,0 +1,373 @@
+from bisect import bisect_right, insort
+from datetime import datetime, time
+
+from clock import system_clock
+from engine import PomodoroState
+from profiler import profiler
+
+# =====================================================
+# 세션 완료 처리 (엔진 규칙 + 저장소 기록)
+# =====================================================
+# 앱(브라우저가 열려 있을 때)과 스케줄러(브라우저가 닫혀 있을 때)가 같은 함수로
+# 세션을 완료한다. 저장소 기록은 마감 시각 조건부라 둘 중 하나만 성공한다.
+# 타이머 시작/정지, 구매, 위젯 세션 동기화도 앱과 JSON API(api.py)가 같이 쓴다.
+
+
+class Completion:
+    """완료 처리 결과. study 가 아니면 result 는 긴 휴식 여부(bool)"""
+
+    __slots__ = ('study', 'result', 'newly', 'entry', 'day')
+
+    def __init__(self, study, result, newly, entry, day):
+        self.study = study
+        self.result = result
+        self.newly = newly
+        self.entry = entry
+        self.day = day
+
+
+def complete_session(store, ach_engine, user_id, state, owned_items, unlocked, expected_deadline=None,
+                     clock=system_clock):
+    """state 의 현재 세션을 완료하고 저장소에 기록. 이미 다른 쪽에서 처리했으면 None
+
+    state, unlocked 는 제자리에서 바뀐다. 기록 날짜/시각은 마감 시각(없으면 clock 의 지금) 기준이다.
+    """
+    when = datetime.fromtimestamp(expected_deadline) if expected_deadline is not None else clock.now()
+    day = str(when.date())
+    rolled_over = state.roll_over(day)
+
+    if not state.is_study:
+        was_long = state.complete_break()
+        fields = {'is_study': state.is_study, 'is_long_break': state.is_long_break}
+        remaining_key = 'remaining_long_break_seconds' if was_long else 'remaining_break_seconds'
+        fields[remaining_key] = getattr(state, remaining_key)
+        if rolled_over:
+            fields.update(today_sessions=0, today_minutes=0, last_date=day)
+        if not store.record_completion(user_id, {}, fields, None, [], [], expected_deadline):
+            return None
+        return Completion(False, was_long, [], None, day)
+
+    before = ach_engine.snapshot(state)
+    result = state.complete_study(owned_items, day, when.hour)
+    with profiler.span('check_achievements'):
+        newly = ach_engine.unlock_crossed(before, state, unlocked)
+    entry = {'time': when.strftime("%H:%M"), 'duration': result.duration, 'type': 'study'}
+
+    # 합계는 증가량으로, 사이클 상태는 값으로 기록 (날짜가 바뀌었으면 오늘 통계도 값으로).
+    # 코인은 원장 항목으로만 바뀐다. 멱등 키는 세션 마감 시각과 업적 키.
+    ach_reward = sum(ach['reward'] for ach in newly)
+    counters = {
+        'total_coins_earned': result.reward + ach_reward,
+        'total_sessions': 1,
+        'total_minutes': result.duration,
+    }
+    fields = {
+        'current_cycle_count': state.current_cycle_count,
+        'completed_cycles': state.completed_cycles,
+        'is_long_break': state.is_long_break,
+        'is_study': state.is_study,
+        'remaining_study_seconds': state.remaining_study_seconds,
+        'current_streak': state.current_streak,
+        'longest_streak': state.longest_streak,
+        'last_study_date': state.last_study_date,
+    }
+    if rolled_over:
+        fields.update(today_sessions=state.today_sessions, today_minutes=state.today_minutes, last_date=day)
+    else:
+        counters.update(today_sessions=1, today_minutes=result.duration)
+
+    ok = store.record_completion(
+        user_id, counters, fields,
+        session={'day': day, **entry, 'at': expected_deadline or when.timestamp(),
+                 'ref': 'cycle' if result.cycle_completed else None},
+        entries=[(result.reward, 'study', None, f"study:{expected_deadline or when.timestamp()}")]
+        + [(ach['reward'], 'achievement', ach['key'], f"achievement:{ach['key']}") for ach in newly],
+        achievements=[ach['key'] for ach in newly],
+        expected_deadline=expected_deadline,
+    )
+    if not ok:
+        return None
+    return Completion(True, result, newly, entry, day)
+
+
+def finalize_from_store(store, ach_engine, user_id, deadline):
+    """브라우저 없이 저장소의 상태만으로 마감된 세션을 완료 (스케줄러 콜백)"""
+    profile = store.load_profile(user_id)
+    if profile is None or not profile['is_running'] or profile['timer_deadline'] != deadline:
+        return None
+    state = PomodoroState.from_mapping(profile)
+    return complete_session(store, ach_engine, user_id, state, profile['owned_items'],
+                            profile['unlocked_achievements'], deadline)
+
+
+# 방 공부 구간이 시작하고 이만큼 안에 들어온 멤버까지 그 구간 보상을 받는다 (초).
+# 방을 만든 사람도 생성 직후에 입장하므로 0 이면 안 된다.
+ROOM_JOIN_GRACE = 60
+
+
+def complete_room_session(store, ach_engine, room_id, phase_index, duration, members, when, started_at=None):
+    """방의 공부 세션 하나를 멤버 전원에 대해 완료. 보상이 반영된 user_id 목록 반환
+
+    members 는 {user_id: 입장 시각}. started_at(구간 시작 시각)을 주면 구간이 시작하고
+    ROOM_JOIN_GRACE 가 지난 뒤 들어온 멤버는 이번 구간 보상에서 뺀다.
+    프로필은 한 번에 읽고 보상/업적은 메모리에서 계산한 뒤 한 트랜잭션으로 기록한다.
+    방 세션은 개인 사이클(current_cycle_count 등)을 바꾸지 않는다.
+    """
+    if started_at is not None:
+        members = [user_id for user_id, joined_at in members.items() if joined_at <= started_at + ROOM_JOIN_GRACE]
+    if not members:
+        return []
+    day = str(when.date())
+    credits = []
+    for user_id, profile in store.load_profiles(members).items():
+        state = PomodoroState.from_mapping(profile)
+        state.roll_over(day)
+        before = ach_engine.snapshot(state)
+        reward, _ = state.credit_study(duration, profile['owned_items'], day, when.hour)
+        newly = ach_engine.unlock_crossed(before, state, set(profile['unlocked_achievements']))
+        credits.append((user_id, [(reward, 'study', room_id, f"room:{room_id}:{phase_index}")]
+                        + [(ach['reward'], 'achievement', ach['key'], f"achievement:{ach['key']}")
+                           for ach in newly]))
+    session = {'time': when.strftime("%H:%M"), 'duration': duration, 'type': 'study', 'at': when.timestamp()}
+    return store.record_room_completion(day, session, credits)
+
+
+def unlock_satisfied(store, ach_engine, user_id):
+    """저장된 요약 필드로 이미 만족하는 업적을 한 번에 달성 처리 (기록 가져오기 후). 새 업적 목록 반환"""
+    profile = store.load_profile(user_id)
+    state = PomodoroState.from_mapping(profile)
+    unlocked = set(profile['unlocked_achievements'])
+    newly = []
+    # 업적 보상으로 늘어난 누적 코인이 다른 기준을 넘을 수 있으므로 더 없을 때까지
+    while True:
+        keys = [key for key in ach_engine.satisfied(state.metrics()) if key not in unlocked]
+        if not keys:
+            break
+        for key in keys:
+            ach = ach_engine.definitions[key]
+            unlocked.add(key)
+            state.total_coins_earned += ach['reward']
+            newly.append({'key': key, **ach})
+    if not newly:
+        return []
+    ok = store.record_completion(
+        user_id, {'total_coins_earned': sum(ach['reward'] for ach in newly)}, {}, None,
+        entries=[(ach['reward'], 'achievement', ach['key'], f"achievement:{ach['key']}") for ach in newly],
+        achievements=[ach['key'] for ach in newly],
+    )
+    return newly if ok else []
+
+
+# --- 타이머 / 상점 / 위젯 동기화 ---
+
+def start_timer(store, user_id, state, now):
+    """현재 세션 타이머 시작(이어서 하기 포함). state 는 제자리에서 바뀐다."""
+    state.start(now)
+    store.save_profile(user_id, is_running=True, timer_deadline=state.timer_deadline)
+
+
+def stop_timer(store, user_id, state, now):
+    """타이머 일시정지. 남은 시간을 저장한다."""
+    state.stop(now)
+    remaining_key = state.session_keys()[0]
+    store.save_profile(user_id, is_running=False, timer_deadline=None,
+                       **{remaining_key: getattr(state, remaining_key)})
+
+
+def reset_timer(store, user_id, state):
+    """타이머와 사이클 위치 초기화"""
+    state.reset_timer()
+    store.reset_timer(user_id, **{key: getattr(state, key) for key in (
+        'is_study', 'is_long_break', 'current_cycle_count', 'remaining_study_seconds',
+        'remaining_break_seconds', 'remaining_long_break_seconds')})
+
+
+# buy_item 결과
+PURCHASED = 'purchased'
+OWNED = 'owned'
+UNKNOWN_ITEM = 'unknown_item'
+INSUFFICIENT = 'insufficient'
+
+
+def buy_item(store, catalog, user_id, item_key, owned_items):
+    """카탈로그 아이템/테마 구매 (테마는 바로 적용). 결과 상수 반환, 성공하면 owned_items 에 추가"""
+    info = catalog.themes.get(item_key) or catalog.items.get(item_key)
+    if info is None:
+        return UNKNOWN_ITEM
+    if item_key in owned_items:
+        return OWNED
+    fields = {'active_theme': item_key} if item_key in catalog.themes else None
+    if not store.purchase(user_id, item_key, info['price'], fields):
+        return INSUFFICIENT
+    owned_items.add(item_key)
+    return PURCHASED
+
+
+# 위젯 세션과 가져온 기록은 서버 마감 시각 없이 클라이언트가 알려 준 시각/길이로 들어오므로 말이 되는 것만 받는다
+SYNC_WINDOW = 7 * 24 * 60 * 60      # 이보다 오래전에 끝난 위젯 세션은 받지 않음 (초)
+MAX_SESSION_SECONDS = 24 * 60 * 60
+CLIENT_DAILY_MINUTES = 4 * 60       # 하루에 위젯/가져오기로 받는 공부 분 상한 (서버 타이머 세션은 따로)
+
+
+class _StudyTimeline:
+    """이미 기록된 공부 구간(끝 시각 순)과 날짜별 공부 분. admit 으로 새 세션을 하나씩 받아 들인다.
+
+    - [end - 분, end] 구간이 기록된 공부 세션(가져온 것 포함)이나 앞서 받은 세션과 겹치면 안 된다
+    - 하루(끝난 날짜 기준) 공부 분 합계가 그날 지나간 시간을 넘으면 안 된다
+    - 하루 위젯/가져오기 분 합계가 CLIENT_DAILY_MINUTES 를 넘으면 안 된다 (클라이언트가 알려 준 길이는 확인할 수 없으므로)
+    """
+
+    __slots__ = ('intervals', 'minutes', 'claimed', 'now')
+
+    def __init__(self, store, user_id, since, now):
+        self.intervals = []
+        self.minutes = {}
+        self.claimed = {}
+        self.now = now
+        for start, end, kind, ref in store.load_study_intervals(user_id, since):
+            self.intervals.append((start, end))
+            self._count(end, (end - start) / 60, kind == 'import' or ref == 'widget')
+
+    def _count(self, end, duration, claimed):
+        day = datetime.fromtimestamp(end).date()
+        self.minutes[day] = self.minutes.get(day, 0) + duration
+        if claimed:
+            self.claimed[day] = self.claimed.get(day, 0) + duration
+
+    def block(self, start, end):
+        """겹치면 안 되는 구간 추가 (실행 중인 공부 타이머)"""
+        insort(self.intervals, (start, end), key=lambda iv: iv[1])
+
+    def admit(self, end, duration):
+        """클라이언트가 알려 준 세션 하나. 받을 수 있으면 기록하고 True"""
+        start = end - duration * 60
+        day = datetime.fromtimestamp(end).date()
+        midnight = datetime.combine(day, time.min).timestamp()
+        elapsed = (min(self.now, midnight + MAX_SESSION_SECONDS) - midnight) / 60
+        if (self.minutes.get(day, 0) + duration > elapsed
+                or self.claimed.get(day, 0) + duration > CLIENT_DAILY_MINUTES
+                or _overlaps(self.intervals, start, end)):
+            return False
+        self.block(start, end)
+        self._count(end, duration, True)
+        return True
+
+
+def _plausible(store, user_id, profile, fresh, now):
+    """fresh [(end, id, 분)] (끝 시각 순) 중 받을 수 있는 세션과 거절한 수
+
+    SYNC_WINDOW 안에 끝났어야 하고, 실행 중인 공부 타이머와도 겹치면 안 된다 (나머지는 _StudyTimeline).
+    """
+    earliest = now - SYNC_WINDOW
+    timeline = _StudyTimeline(store, user_id, earliest - MAX_SESSION_SECONDS, now)
+    if profile['is_running'] and profile['is_study'] and profile['timer_deadline']:
+        deadline = profile['timer_deadline']
+        timeline.block(deadline - profile['study_duration'] * 60, deadline)
+    accepted = [(end, sid, duration) for end, sid, duration in fresh
+                if end >= earliest and timeline.admit(end, duration)]
+    return accepted, len(fresh) - len(accepted)
+
+
+def plausible_imports(store, user_id, rows, now):
+    """가져올 세션 [(day, time, duration, type)] 중 받을 수 있는 것과 거절한 수 (위젯 동기화와 같은 규칙)
+
+    보상과 업적에 쓰이는 공부 세션만 본다. time 은 끝난 시각(앱이 기록/내보내는 값)이고 now 이후면 안 된다.
+    이미 같은 날짜/시각/길이로 기록된 세션(내보냈다가 다시 가져온 경우)은 그대로 넘겨 저장소가 중복으로 거른다.
+    """
+    study = sorted((datetime.fromisoformat(f"{row[0]} {row[1]}").timestamp(), row)
+                   for row in rows if row[3] == 'study')
+    if not study:
+        return list(rows), 0
+    timeline = _StudyTimeline(store, user_id, study[0][0] - MAX_SESSION_SECONDS, now)
+    known = {(datetime.fromtimestamp(end).strftime("%Y-%m-%d %H:%M"), round((end - start) / 60))
+             for start, end in timeline.intervals}
+    rejected = set()
+    for end, row in study:
+        if (f"{row[0]} {row[1]}", row[2]) in known:
+            continue
+        if end > now or not timeline.admit(end, row[2]):
+            rejected.add(row)
+    return [row for row in rows if row not in rejected], len(rejected)
+
+
+def _overlaps(intervals, start, end):
+    """끝 시각 순 [(시작, 끝)] 에 [start, end) 와 겹치는 구간이 있는지. 구간 길이는 하루 이하이므로
+    start 이후에 끝나는 구간부터 end + 하루 전에 끝나는 구간까지만 본다."""
+    for other_start, other_end in intervals[bisect_right(intervals, start, key=lambda iv: iv[1]):]:
+        if other_end - MAX_SESSION_SECONDS >= end:
+            return False
+        if other_start < end:
+            return True
+    return False
+
+
+def sync_sessions(store, ach_engine, user_id, sessions, clock=system_clock):
+    """위젯이 오프라인으로 끝낸 공부 세션들을 한 번에 반영. 없는 사용자면 None
+
+    sessions 는 [{'id', 'end'(epoch 초), 'duration'(분)}]. 멱등 키가 widget:<id> 라 같은 세션을
+    다시 보내도 한 번만 지급된다. 방 세션처럼 보상/누적 통계만 반영하고 개인 사이클은 바꾸지 않는다.
+    오늘보다 이전 날짜의 세션은 오늘 통계에 넣지 않고, 연속 공부일은 기록으로 다시 계산한다.
+    다른 세션과 겹치거나 오래됐거나 하루 경과 시간/위젯 상한을 넘는 세션은 받지 않는다 (_plausible).
+    {'applied', 'duplicates', 'rejected', 'coins', 'achievements'} 반환
+    """
+    profile = store.load_profile(user_id)
+    if profile is None:
+        return None
+    by_id = {str(s['id']): s for s in sessions}
+    done = store.applied_keys(user_id, [f"widget:{sid}" for sid in by_id])
+    fresh = sorted(((s['end'], sid, s['duration']) for sid, s in by_id.items() if f"widget:{sid}" not in done))
+    result = {'applied': 0, 'duplicates': len(sessions) - len(fresh), 'rejected': 0, 'coins': 0,
+              'achievements': []}
+    fresh, result['rejected'] = _plausible(store, user_id, profile, fresh, clock.time())
+    if not fresh:
+        return result
+
+    state = PomodoroState.from_mapping(profile)
+    unlocked = set(profile['unlocked_achievements'])
+    today = str(clock.today())
+    rolled_over = state.roll_over(today)
+    coins, sessions_rows, entries, newly, backfill = state.coins, [], [], [], False
+    for end, sid, duration in fresh:
+        when = datetime.fromtimestamp(end)
+        day = str(when.date())
+        in_order = state.last_study_date is None or day >= state.last_study_date
+        backfill = backfill or not in_order
+        before = ach_engine.snapshot(state)
+        today_counts = state.today_sessions, state.today_minutes
+        reward, _ = state.credit_study(duration, profile['owned_items'], day if in_order else None, when.hour)
+        if day != today:
+            state.today_sessions, state.today_minutes = today_counts
+        crossed = ach_engine.unlock_crossed(before, state, unlocked)
+        newly += crossed
+        entries.append((reward, 'study', None, f"widget:{sid}"))
+        entries += [(ach['reward'], 'achievement', ach['key'], f"achievement:{ach['key']}") for ach in crossed]
+        sessions_rows.append({'day': day, 'time': when.strftime("%H:%M"), 'duration': duration, 'type': 'study',
+                              'at': end, 'ref': 'widget'})
+
+    counters = {
+        'total_coins_earned': state.total_coins_earned - profile['total_coins_earned'],
+        'total_sessions': len(fresh),
+        'total_minutes': sum(duration for _, _, duration in fresh),
+    }
+    fields = {
+        'current_streak': state.current_streak,
+        'longest_streak': state.longest_streak,
+        'last_study_date': state.last_study_date,
+    }
+    if rolled_over:
+        fields.update(today_sessions=state.today_sessions, today_minutes=state.today_minutes, last_date=today)
+    else:
+        counters.update(today_sessions=state.today_sessions - profile['today_sessions'],
+                        today_minutes=state.today_minutes - profile['today_minutes'])
+    if not store.record_sessions(user_id, counters, fields, sessions_rows, entries, [ach['key'] for ach in newly]):
+        # 같은 세션을 다른 요청이 먼저 기록함 (트랜잭션째 되돌아가므로 전부 중복으로 본다)
+        result['duplicates'] = len(sessions) - result['rejected']
+        return result
+    earned = state.coins - coins
+    if backfill:
+        store.recompute_analytics(user_id)
+        late = unlock_satisfied(store, ach_engine, user_id)
+        earned += sum(ach['reward'] for ach in late)
+        newly += late
+    result.update(applied=len(fresh), coins=earned, achievements=[ach['key'] for ach in newly])
+    return result
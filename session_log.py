@@ -0,0 +1,84 @@
+import sys
+from array import array
+
+# =====================================================
+# 세션 로그 (최근 기록만 메모리에 유지)
+# =====================================================
+# 세션 기록 전체는 저장소(sessions 테이블)에 있으므로 메모리에는
+# 최근 capacity 개만 고정 크기 링 버퍼로 둔다. 항목마다 dict 를 만드는 대신
+# 시각/길이/종류를 각각 array 열로 저장한다.
+
+SESSION_TYPES = ('study', 'short_break', 'long_break')
+_TYPE_CODES = {name: code for code, name in enumerate(SESSION_TYPES)}
+
+DEFAULT_CAPACITY = 50
+
+
+class SessionLog:
+    """최근 세션 기록 링 버퍼. 오래된 항목은 저장소에서 페이지 단위로 읽는다."""
+
+    __slots__ = ('capacity', 'total', '_start', '_size', '_minute_of_day', '_duration', '_type')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, total=0):
+        self.capacity = capacity
+        self.total = total          # 저장소에 있는 것까지 포함한 전체 세션 수
+        self._start = 0
+        self._size = 0
+        self._minute_of_day = array('H', bytes(2 * capacity))
+        self._duration = array('H', bytes(2 * capacity))
+        self._type = array('B', bytes(capacity))
+
+    @classmethod
+    def from_entries(cls, entries, total=None, capacity=DEFAULT_CAPACITY):
+        """오래된 순 entries 의 마지막 capacity 개로 채운 로그"""
+        log = cls(capacity)
+        for entry in entries[-capacity:]:
+            log.append(entry)
+        log.total = len(entries) if total is None else total
+        return log
+
+    def append(self, entry):
+        """{'time': 'HH:MM', 'duration': N, 'type': 'study'} 추가. 꽉 차면 가장 오래된 항목을 덮어씀"""
+        hours, minutes = entry['time'].split(':')
+        if self._size < self.capacity:
+            i = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._minute_of_day[i] = int(hours) * 60 + int(minutes)
+        self._duration[i] = entry['duration']
+        self._type[i] = _TYPE_CODES[entry.get('type', 'study')]
+        self.total += 1
+
+    def __len__(self):
+        return self.total
+
+    def __sizeof__(self):
+        """열 배열까지 포함한 크기 (sys.getsizeof, 세션 메모리 계정용)"""
+        return object.__sizeof__(self) + sum(
+            sys.getsizeof(a) for a in (self._minute_of_day, self._duration, self._type))
+
+    def __bool__(self):
+        return self.total > 0
+
+    def _entry(self, i):
+        hours, minutes = divmod(self._minute_of_day[i], 60)
+        return {
+            'time': f"{hours:02d}:{minutes:02d}",
+            'duration': self._duration[i],
+            'type': SESSION_TYPES[self._type[i]],
+        }
+
+    def recent(self, limit, offset=0):
+        """최신 순으로 offset 부터 limit 개. 메모리에 있는 범위만 반환"""
+        end = min(self._size, offset + limit)
+        return [self._entry((self._start + self._size - 1 - k) % self.capacity) for k in range(offset, end)]
+
+    def covers(self, limit, offset=0):
+        """최신 기준 [offset, offset + limit) 구간이 메모리에 다 있는지"""
+        return min(offset + limit, self.total) <= self._size
+
+    def __iter__(self):
+        for k in range(self._size):
+            yield self._entry((self._start + k) % self.capacity)
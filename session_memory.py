@@ -0,0 +1,227 @@
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from profiler import profiler
+from state_store import SQLiteBackend, StateStore, snapshot
+
+# =====================================================
+# 세션 메모리 계정 / 유휴 세션 내려쓰기
+# =====================================================
+# st.session_state 는 탭을 열어만 두어도 프로세스 메모리에 남는다. 재실행이 끝날 때마다
+# 세션 상태를 키별 바이트로 재어 등록해 두고, 관리 스레드가 SWEEP_INTERVAL 마다 정책을 적용한다.
+#
+#     STUDY_IDLE_SPILL_SECONDS   이보다 오래 재실행이 없던 세션은 디스크 스냅샷으로 내리고 메모리에서 비움
+#     STUDY_MEMORY_BUDGET_MB     전체 합계가 넘으면 가장 오래 쉰 세션부터 내림 (LRU)
+#     STUDY_SESSION_BUDGET_KB    세션 하나가 넘으면 account() 결과로 알리고 앱이 다시 읽을 수 있는 기록을 비움
+#     STUDY_SPILL_PATH           스냅샷 파일 (기본: 임시 디렉터리의 study-spill.db)
+#
+# 타이머/스터디룸 프래그먼트가 돌고 있는 세션(pinned)은 재실행이 없어도 쉬는 게 아니므로 내리지 않는다.
+# 스냅샷은 상태 저장소와 같은 바이너리 레코드(state_store.FIELDS)라 세션 하나에 수백 바이트다.
+# 내린 세션은 다음 재실행(콜백, 프래그먼트 포함)이 restore() 로 되살린다.
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 30.0
+DEFAULT_IDLE_SECONDS = 15 * 60
+DEFAULT_GLOBAL_BUDGET = 512 * 1024 * 1024
+DEFAULT_SESSION_BUDGET = 1024 * 1024
+
+_ATOMIC = (str, bytes, int, float, bool, type(None))
+
+
+def sizeof(value):
+    """value 의 대략적인 바이트 수. 기본 컨테이너는 안쪽까지 더하고 그 밖의 객체는 자기 크기만
+    (DailyHistory/SessionLog 는 __sizeof__ 로 배열을 포함하고, 구독처럼 공유 객체를 가리키는 값은
+    가리키는 대상을 세지 않는다)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, _ATOMIC):
+        return size
+    if isinstance(value, dict):
+        return size + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(sizeof(item) for item in value)
+    return size
+
+
+def measure(values):
+    """{키: 바이트}"""
+    return {key: sizeof(key) + sizeof(value) for key, value in values.items()}
+
+
+class SessionEntry:
+    __slots__ = ('state', 'user_id', 'last_seen', 'sizes', 'total', 'pinned')
+
+    def __init__(self, state, user_id, last_seen):
+        self.state = state          # 세션 상태 객체 (내릴 때 키를 지우는 데만 씀)
+        self.user_id = user_id
+        self.last_seen = last_seen
+        self.sizes = {}
+        self.total = 0
+        self.pinned = False
+
+
+class SessionMemory:
+    """세션별 메모리 계정과 유휴/예산 초과 세션 내려쓰기 (프로세스당 하나)"""
+
+    def __init__(self, spill_store, keys, global_budget=DEFAULT_GLOBAL_BUDGET,
+                 session_budget=DEFAULT_SESSION_BUDGET, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 is_alive=None, clock=time.time):
+        self.spill_store = spill_store
+        # 내릴 때 지우는 키. 위젯 값은 남겨야 다음 재실행에서 on_change 콜백이 헛돌지 않는다.
+        self.keys = tuple(keys)
+        self.global_budget = global_budget
+        self.session_budget = session_budget
+        self.idle_seconds = idle_seconds
+        self.is_alive = is_alive or (lambda session_id: True)   # 닫힌 세션은 목록에서 뺀다
+        self.clock = clock
+        self._sessions = {}         # session_id → SessionEntry (메모리에 있는 세션)
+        self._spilled = {}          # session_id → user_id (디스크로 내린 세션)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.spills = 0
+        self.restores = 0
+
+    # --- 재실행에서 호출 ---
+
+    def touch(self, session_id):
+        """재실행(콜백/프래그먼트 포함) 시작. 진행 중인 내려쓰기가 있으면 끝날 때까지 기다린다."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.last_seen = self.clock()
+
+    def restore(self, session_id):
+        """내려 둔 세션의 상태 {필드: 값}. 내려간 적이 없으면 None"""
+        with self._lock:
+            if self._spilled.pop(session_id, None) is None:
+                return None
+        values = self.spill_store.load(session_id)
+        self.spill_store.delete(session_id)
+        self.restores += 1
+        profiler.count('session_restores')
+        return values
+
+    def account(self, session_id, state, values, user_id, pinned=False):
+        """재실행이 끝날 때 세션 상태(values)의 크기를 다시 잰다. 세션 바이트 수 반환"""
+        sizes = measure(values)
+        total = sum(sizes.values())
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = SessionEntry(state, user_id, self.clock())
+            entry.state = state
+            entry.user_id = user_id
+            entry.last_seen = self.clock()
+            entry.sizes = sizes
+            entry.total = total
+            entry.pinned = pinned
+        return total
+
+    # --- 보고 ---
+
+    def report(self):
+        """{'sessions', 'spilled', 'bytes', 'budget', 'per_session': [(session_id, user_id, 바이트, 쉰 초)]}"""
+        now = self.clock()
+        with self._lock:
+            rows = sorted(((sid, e.user_id, e.total, now - e.last_seen) for sid, e in self._sessions.items()),
+                          key=lambda row: -row[2])
+            return {
+                'sessions': len(rows),
+                'spilled': len(self._spilled),
+                'bytes': sum(row[2] for row in rows),
+                'budget': self.global_budget,
+                'per_session': rows,
+            }
+
+    def sizes(self, session_id):
+        """세션의 {키: 바이트} (큰 순)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            sizes = dict(entry.sizes) if entry is not None else {}
+        return dict(sorted(sizes.items(), key=lambda kv: -kv[1]))
+
+    # --- 정책 ---
+
+    def sweep(self):
+        """닫힌 세션을 빼고, 유휴 세션과 전체 예산을 넘게 하는 세션을 내림. 내린 세션 수 반환"""
+        now = self.clock()
+        with self._lock:
+            for session_id in [sid for sid in self._sessions if not self.is_alive(sid)]:
+                del self._sessions[session_id]
+            for session_id in [sid for sid in self._spilled if not self.is_alive(sid)]:
+                del self._spilled[session_id]
+                self.spill_store.delete(session_id)
+
+            candidates = sorted((e.last_seen, sid) for sid, e in self._sessions.items() if not e.pinned)
+            total = sum(e.total for e in self._sessions.values())
+            victims = []
+            for last_seen, session_id in candidates:
+                if now - last_seen >= self.idle_seconds or total > self.global_budget:
+                    victims.append(session_id)
+                    total -= self._sessions[session_id].total
+            # 잠금을 쥔 채로 내려야 그 사이 시작한 재실행(touch)이 반쯤 지워진 상태를 보지 않는다
+            for session_id in victims:
+                self._spill_locked(session_id)
+            profiler.gauge('session_memory_bytes', sum(e.total for e in self._sessions.values()))
+            profiler.gauge('sessions_resident', len(self._sessions))
+            profiler.gauge('sessions_spilled', len(self._spilled))
+        return len(victims)
+
+    def _spill_locked(self, session_id):
+        entry = self._sessions.pop(session_id)
+        state = entry.state
+        try:
+            self.spill_store.save(session_id, snapshot(state))
+        except Exception:
+            logger.exception("session spill failed: %s", session_id)
+            self._sessions[session_id] = entry      # 메모리에 그대로 둔다
+            return
+        self._spilled[session_id] = entry.user_id
+        for key in self.keys:
+            if key in state:
+                del state[key]
+        self.spills += 1
+        profiler.count('session_spills')
+
+    # --- 스레드 ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='session-memory', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(SWEEP_INTERVAL):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("session memory sweep failed")
+
+
+def _env_number(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def open_session_memory(keys, is_alive=None, path=None):
+    """환경 변수 설정의 SessionMemory"""
+    path = path or os.environ.get('STUDY_SPILL_PATH') or os.path.join(tempfile.gettempdir(), 'study-spill.db')
+    return SessionMemory(
+        StateStore(SQLiteBackend(path), prefix='spill:'), keys,
+        global_budget=int(_env_number('STUDY_MEMORY_BUDGET_MB', DEFAULT_GLOBAL_BUDGET / 2 ** 20) * 2 ** 20),
+        session_budget=int(_env_number('STUDY_SESSION_BUDGET_KB', DEFAULT_SESSION_BUDGET / 2 ** 10) * 2 ** 10),
+        idle_seconds=_env_number('STUDY_IDLE_SPILL_SECONDS', DEFAULT_IDLE_SECONDS),
+        is_alive=is_alive,
+    )
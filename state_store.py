@@ -0,0 +1,449 @@
+import os
+import select
+import socket
+import sqlite3
+import struct
+import threading
+from urllib.parse import urlparse
+
+# =====================================================
+# 세션 상태 외부 저장소
+# =====================================================
+# st.session_state 는 프로세스 메모리에만 있어서 같은 사용자의 재실행을 항상 같은
+# 프로세스가 받아야 했다(sticky session). 사용자 상태를 작은 바이너리 레코드로
+# 외부 키-값 저장소에 두면 어느 복제본이든 한 번의 왕복으로 상태를 복원할 수 있다.
+#
+# - 레코드 = 버전 1바이트 + (필드 번호, 태그, 값) 목록. 필드 이름 대신 FIELDS 의 번호를 쓴다.
+# - 처음엔 전체 레코드를 쓰고, 이후엔 바뀐 필드만 담은 diff 레코드를 뒤에 덧붙인다.
+#   읽을 때는 순서대로 덮어쓰면 되고, diff 가 COMPACT_AFTER 개를 넘으면 전체 레코드로 다시 쓴다.
+# - 백엔드는 fetch / append / replace / delete 네 가지만 구현하면 된다
+#   (메모리, SQLite, Redis 프로토콜).
+
+FORMAT_VERSION = 1
+
+# 레코드에 번호로 저장되는 필드. 번호가 곧 포맷이므로 순서를 바꾸지 말고 뒤에만 추가한다.
+# 일별 기록/세션 로그는 영구 저장소에 있고 통계 탭에서 따로 불러오므로 제외한다.
+FIELDS = (
+    'coins', 'is_running', 'is_study', 'is_long_break', 'owned_items', 'active_theme',
+    'study_duration', 'break_duration', 'long_break_duration', 'sessions_before_long_break',
+    'current_cycle_count', 'completed_cycles',
+    'total_sessions', 'total_minutes', 'total_coins_earned', 'today_sessions', 'today_minutes', 'last_date',
+    'unlocked_achievements', 'cycle_mode', 'timer_deadline', 'notices',
+    'remaining_study_seconds', 'remaining_break_seconds', 'remaining_long_break_seconds',
+    'current_streak', 'longest_streak', 'last_study_date', 'hour_sessions', 'best_hour',
+    'profile_version',
+)
+_FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+COMPACT_AFTER = 16
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _SET, _LIST, _TUPLE = range(9)
+_DOUBLE = struct.Struct('<d')
+
+
+# =====================================================
+# 바이너리 인코딩
+# =====================================================
+
+def _write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _write_value(out, value):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)   # zigzag
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out.append(_STR)
+        _write_varint(out, len(data))
+        out += data
+    elif isinstance(value, (set, frozenset, list, tuple)):
+        out.append(_SET if isinstance(value, (set, frozenset)) else _LIST if isinstance(value, list) else _TUPLE)
+        _write_varint(out, len(value))
+        for item in (sorted(value) if isinstance(value, (set, frozenset)) else value):
+            _write_value(out, item)
+    else:
+        raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+def _read_value(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        n, pos = _read_varint(buf, pos)
+        return (n >> 1) ^ -(n & 1), pos
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(buf, pos)[0], pos + _DOUBLE.size
+    if tag == _STR:
+        n, pos = _read_varint(buf, pos)
+        return bytes(buf[pos:pos + n]).decode('utf-8'), pos + n
+    if tag in (_SET, _LIST, _TUPLE):
+        n, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(n):
+            item, pos = _read_value(buf, pos)
+            items.append(item)
+        return (set(items) if tag == _SET else items if tag == _LIST else tuple(items)), pos
+    raise ValueError(f"unknown tag {tag}")
+
+
+def encode(values):
+    """{필드: 값} → 레코드 bytes (FIELDS 에 없는 키는 무시)"""
+    items = [(_FIELD_INDEX[k], v) for k, v in values.items() if k in _FIELD_INDEX]
+    out = bytearray((FORMAT_VERSION,))
+    _write_varint(out, len(items))
+    for index, value in items:
+        _write_varint(out, index)
+        _write_value(out, value)
+    return bytes(out)
+
+
+def decode(blob, into=None):
+    """레코드 → {필드: 값}. into 가 있으면 그 dict 에 덮어쓴다 (diff 적용)"""
+    values = {} if into is None else into
+    if not blob or blob[0] != FORMAT_VERSION:
+        raise ValueError(f"unsupported state format {blob[:1]!r}")
+    count, pos = _read_varint(blob, 1)
+    for _ in range(count):
+        index, pos = _read_varint(blob, pos)
+        value, pos = _read_value(blob, pos)
+        if index < len(FIELDS):       # 더 새로운 버전이 추가한 필드는 건너뜀
+            values[FIELDS[index]] = value
+    return values
+
+
+def snapshot(mapping):
+    """mapping 에서 FIELDS 값만 복사 (집합/리스트는 제자리에서 바뀌므로 얕은 복사)"""
+    values = {}
+    for name in FIELDS:
+        if name in mapping:
+            value = mapping[name]
+            values[name] = value.copy() if isinstance(value, (set, list)) else value
+    return values
+
+
+def diff(values, previous):
+    """previous 이후 바뀐 필드만"""
+    return {k: v for k, v in values.items() if k not in previous or previous[k] != v}
+
+
+# =====================================================
+# 상태 저장소
+# =====================================================
+
+class StateStore:
+    """사용자별 상태 레코드를 백엔드에 읽고 쓰는 층"""
+
+    def __init__(self, backend, prefix='state:', compact_after=COMPACT_AFTER):
+        self.backend = backend
+        self.prefix = prefix
+        self.compact_after = compact_after
+
+    def load(self, user_id):
+        """전체 레코드 + diff 들을 순서대로 적용한 상태. 없거나 읽을 수 없으면 None"""
+        blobs = self.backend.fetch(self.prefix + user_id)
+        if not blobs:
+            return None
+        values = {}
+        try:
+            for blob in blobs:
+                decode(blob, values)
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return None    # 모르는 포맷이면 영구 저장소에서 다시 불러오게 한다
+        return values
+
+    def save(self, user_id, values, previous=None):
+        """previous(마지막으로 저장한 값)와 비교해 바뀐 필드만 덧붙인다. 쓴 바이트 수 반환"""
+        key = self.prefix + user_id
+        if previous is None:
+            blob = encode(values)
+            self.backend.replace(key, blob)
+            return len(blob)
+        changed = diff(values, previous)
+        if not changed:
+            return 0
+        blob = encode(changed)
+        if self.backend.append(key, blob) > self.compact_after:
+            blob = encode(values)
+            self.backend.replace(key, blob)
+        return len(blob)
+
+    def delete(self, user_id):
+        self.backend.delete(self.prefix + user_id)
+
+
+class StateBackend:
+    """키마다 레코드 목록(전체 레코드 + diff)을 보관하는 백엔드 인터페이스"""
+
+    def fetch(self, key):
+        """키의 레코드 목록 (없으면 빈 리스트). 한 번의 왕복이어야 한다."""
+        raise NotImplementedError
+
+    def append(self, key, blob):
+        """레코드를 뒤에 추가하고 현재 레코드 개수 반환"""
+        raise NotImplementedError
+
+    def replace(self, key, blob):
+        """레코드 목록을 blob 하나로 교체"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """프로세스 안 dict. 복제본이 하나일 때나 테스트에서 다른 백엔드 대신 쓴다."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, key):
+        with self._lock:
+            return list(self._data.get(key, ()))
+
+    def append(self, key, blob):
+        with self._lock:
+            blobs = self._data.setdefault(key, [])
+            blobs.append(blob)
+            return len(blobs)
+
+    def replace(self, key, blob):
+        with self._lock:
+            self._data[key] = [blob]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend(StateBackend):
+    """공유 파일 하나에 두는 백엔드. 같은 서버의 여러 프로세스가 함께 쓸 수 있다."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "key TEXT NOT NULL, seq INTEGER NOT NULL, blob BLOB NOT NULL, PRIMARY KEY (key, seq)"
+            ") WITHOUT ROWID")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def fetch(self, key):
+        rows = self._conn().execute("SELECT blob FROM session_state WHERE key = ? ORDER BY seq", (key,))
+        return [row[0] for row in rows]
+
+    def append(self, key, blob):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq, count = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0), COUNT(*) FROM session_state WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT INTO session_state (key, seq, blob) VALUES (?, ?, ?)", (key, seq + 1, blob))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count + 1
+
+    def replace(self, key, blob):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM session_state WHERE key = ?", (key,))
+            conn.execute("INSERT INTO session_state (key, seq, blob) VALUES (?, 1, ?)", (key, blob))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM session_state WHERE key = ?", (key,))
+
+
+class RespError(Exception):
+    """Redis 프로토콜 서버가 돌려준 오류 응답"""
+
+
+class RedisBackend(StateBackend):
+    """Redis 프로토콜(RESP) 백엔드. 키마다 리스트 하나 (LRANGE / RPUSH).
+
+    redis 패키지 없이 소켓으로 직접 말하므로 같은 프로토콜을 쓰는 서버면 무엇이든 된다
+    (테스트는 tests/resp_server.py 의 작은 서버를 쓴다).
+    명령은 파이프라인으로 묶어 보내므로 어떤 연산이든 왕복 한 번이다.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=5.0, ttl=None):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.ttl = ttl          # 초. 있으면 쓸 때마다 만료 시간 갱신
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._send(setup)
+
+    def _socket(self):
+        """이 스레드의 연결. 서버가 닫은 연결(유휴 시간 초과, 재시작)이면 보내기 전에 새로 연결"""
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                # 응답을 다 읽은 연결이 읽을 수 있는 상태라면 서버가 닫은 것 (EOF)
+                readable = select.select([sock], [], [], 0)[0]
+                closed = bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+            except OSError:
+                closed = True
+            if closed:
+                self._close()
+                sock = None
+        if sock is None:
+            self._connect()
+            sock = self._local.sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _send(self, commands, idempotent=True):
+        """명령 목록을 한 번에 보내고 응답 목록을 받음
+
+        보내는 도중이나 응답을 기다리다 연결이 끊기면 서버가 명령을 실행했는지 알 수 없으므로
+        idempotent 인 명령만 한 번 다시 보낸다 (RPUSH 를 다시 보내면 diff 가 두 번 붙는다).
+        """
+        payload = bytearray()
+        for command in commands:
+            payload += b'*%d\r\n' % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode('utf-8')
+                payload += b'$%d\r\n%s\r\n' % (len(arg), arg)
+        for attempt in (0, 1):
+            sent = False
+            try:
+                sock = self._socket()
+                sent = True
+                sock.sendall(payload)
+                replies = [self._read_reply() for _ in commands]
+                break
+            except OSError:
+                self._close()
+                if attempt or (sent and not idempotent):
+                    raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._local.reader.read(n + 2)
+            return data[:-2]
+        if kind == b'*':
+            n = int(rest)
+            return None if n < 0 else [self._read_reply() for _ in range(n)]
+        raise RespError(f"unexpected reply {line!r}")
+
+    def _expire(self, key):
+        return [('EXPIRE', key, self.ttl)] if self.ttl else []
+
+    def fetch(self, key):
+        return self._send([('LRANGE', key, 0, -1)])[0] or []
+
+    def append(self, key, blob):
+        return self._send([('RPUSH', key, blob)] + self._expire(key), idempotent=False)[0]
+
+    def replace(self, key, blob):
+        # MULTI/EXEC 로 묶어서 다른 복제본이 중간 상태(빈 목록)를 읽지 않게 한다
+        self._send([('MULTI',), ('DEL', key), ('RPUSH', key, blob)] + self._expire(key) + [('EXEC',)])
+
+    def delete(self, key):
+        self._send([('DEL', key)])
+
+
+def open_state_store(url=None):
+    """환경 변수 STUDY_STATE_URL 또는 기본값(memory://)의 상태 저장소
+
+    memory://                   프로세스 안 (복제본 하나)
+    sqlite:///path/state.db     같은 서버의 여러 프로세스
+    redis://[:password@]host:port/db?ttl=초
+    """
+    url = url or os.environ.get('STUDY_STATE_URL') or 'memory://'
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return StateStore(MemoryBackend())
+    if parsed.scheme == 'sqlite':
+        return StateStore(SQLiteBackend(parsed.path or 'state.db'))
+    if parsed.scheme == 'redis':
+        params = dict(p.split('=', 1) for p in parsed.query.split('&') if '=' in p)
+        return StateStore(RedisBackend(
+            parsed.hostname or 'localhost', parsed.port or 6379,
+            db=int(parsed.path.lstrip('/') or 0), password=parsed.password,
+            ttl=int(params['ttl']) if 'ttl' in params else None,
+        ))
+    raise ValueError(f"unknown state store url: {url}")
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# 통계 계산 (pandas)
+# =====================================================
+# daily_history(history.DailyHistory)의 배열을 그대로 날짜 인덱스 DataFrame 으로 감싼 뒤
+# 일/주/월 집계, 이동 평균을 한 번에 계산한다.
+# 연속 공부일/시간대 분포는 여기서 다시 세지 않고 analytics.py 가 완료 때마다 갱신한다.
+# Streamlit 과 무관한 순수 함수이고, 캐시는 app.py 에서 건다.
+
+COLUMNS = ['sessions', 'minutes']
+
+
+def history_frame(daily_history, today=None):
+    """빈 날을 0 으로 채운 일별 DataFrame (DatetimeIndex, 열: sessions, minutes)"""
+    if not daily_history:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='day'), dtype='int64')
+    index = pd.date_range(daily_history.first_day, periods=len(daily_history), freq='D', name='day')
+    df = pd.DataFrame({
+        'sessions': np.asarray(daily_history.sessions, dtype='int64'),
+        'minutes': np.asarray(daily_history.minutes, dtype='int64'),
+    }, index=index)
+    if today and pd.Timestamp(today) > index[-1]:
+        df = df.reindex(pd.date_range(index[0], today, freq='D', name='day'), fill_value=0)
+    return df
+
+
+def summarize(daily_history, today):
+    """통계 탭에 필요한 집계 결과 묶음"""
+    df = history_frame(daily_history, today)
+    weekly = df.resample('W-MON', label='left', closed='left').sum()
+    monthly = df.resample('MS').sum()
+    return {
+        'recent_days': df[df['sessions'] > 0].iloc[::-1].head(7),
+        'weekly': weekly,
+        'monthly': monthly,
+        'rolling_7': df['minutes'].rolling(7, min_periods=1).mean(),
+        'avg_7': float(df['minutes'].tail(7).mean()) if not df.empty else 0.0,
+        'active_days': int((df['sessions'] > 0).sum()),
+    }
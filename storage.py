@@ -0,0 +1,897 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import events
+import ledger
+from analytics import HOURS, best_hour, empty_hours, streaks_from_days
+from clock import system_clock
+
+# =====================================================
+# 영구 저장소
+# =====================================================
+# 세션 상태(st.session_state)는 새로고침/재시작 시 사라지므로
+# 코인, 통계, 기록, 보유 아이템을 저장소에 기록한다.
+# Storage 가 인터페이스이고 SQLiteStorage 가 기본 구현이다.
+
+# users 테이블에 한 행으로 저장되는 요약 필드 (키: 세션 상태 키, 값: 기본값)
+PROFILE_FIELDS = {
+    'coins': 0,
+    'is_study': True,
+    'is_long_break': False,
+    'active_theme': None,
+    'study_duration': 25,
+    'break_duration': 5,
+    'long_break_duration': 15,
+    'sessions_before_long_break': 4,
+    'current_cycle_count': 0,
+    'completed_cycles': 0,
+    'total_sessions': 0,
+    'total_minutes': 0,
+    'total_coins_earned': 0,
+    'today_sessions': 0,
+    'today_minutes': 0,
+    'last_date': None,
+    'cycle_mode': True,
+    'is_running': False,
+    'timer_deadline': None,
+    # 멈춘 타이머의 남은 시간 (None 이면 세션 길이 전체)
+    'remaining_study_seconds': None,
+    'remaining_break_seconds': None,
+    'remaining_long_break_seconds': None,
+    # 연속 공부일 (analytics.py)
+    'current_streak': 0,
+    'longest_streak': 0,
+    'last_study_date': None,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    coins INTEGER NOT NULL DEFAULT 0,
+    is_study INTEGER NOT NULL DEFAULT 1,
+    is_long_break INTEGER NOT NULL DEFAULT 0,
+    active_theme TEXT,
+    study_duration INTEGER NOT NULL DEFAULT 25,
+    break_duration INTEGER NOT NULL DEFAULT 5,
+    long_break_duration INTEGER NOT NULL DEFAULT 15,
+    sessions_before_long_break INTEGER NOT NULL DEFAULT 4,
+    current_cycle_count INTEGER NOT NULL DEFAULT 0,
+    completed_cycles INTEGER NOT NULL DEFAULT 0,
+    total_sessions INTEGER NOT NULL DEFAULT 0,
+    total_minutes INTEGER NOT NULL DEFAULT 0,
+    total_coins_earned INTEGER NOT NULL DEFAULT 0,
+    today_sessions INTEGER NOT NULL DEFAULT 0,
+    today_minutes INTEGER NOT NULL DEFAULT 0,
+    last_date TEXT,
+    cycle_mode INTEGER NOT NULL DEFAULT 1,
+    is_running INTEGER NOT NULL DEFAULT 0,
+    timer_deadline REAL,
+    remaining_study_seconds INTEGER,
+    remaining_break_seconds INTEGER,
+    remaining_long_break_seconds INTEGER,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    last_study_date TEXT,
+    updated_at REAL NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_users_running ON users (timer_deadline) WHERE timer_deadline IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_users_updated ON users (updated_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    time TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_day ON sessions (user_id, day);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_rollups_day ON daily_rollups (day);
+CREATE TABLE IF NOT EXISTS hour_stats (
+    user_id TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS inventory (
+    user_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    PRIMARY KEY (user_id, item_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS achievements (
+    user_id TEXT NOT NULL,
+    ach_key TEXT NOT NULL,
+    unlocked_at REAL NOT NULL,
+    PRIMARY KEY (user_id, ach_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    study_duration INTEGER NOT NULL,
+    break_duration INTEGER NOT NULL,
+    long_break_duration INTEGER NOT NULL,
+    sessions_before_long_break INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    credited_phase INTEGER NOT NULL DEFAULT -1
+);
+CREATE TABLE IF NOT EXISTS room_members (
+    room_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    joined_at REAL NOT NULL,
+    PRIMARY KEY (room_id, user_id)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_room_members_user ON room_members (user_id);
+"""
+
+# 방 설정 열 (rooms 테이블)
+ROOM_FIELDS = ('name', 'study_duration', 'break_duration', 'long_break_duration',
+               'sessions_before_long_break', 'started_at')
+
+
+class Storage:
+    """저장소 인터페이스. 다른 백엔드는 이 메서드들을 구현하면 된다."""
+
+    def load_profile(self, user_id):
+        """요약 필드 + 보유 아이템 + 달성 업적. 없는 사용자면 None"""
+        raise NotImplementedError
+
+    def save_profile(self, user_id, **fields):
+        """바뀐 요약 필드만 저장"""
+        raise NotImplementedError
+
+    def profile_version(self, user_id):
+        """프로필 버전 (users.version). 쓰기 경로마다 1씩 늘어나므로 같은 초에 여러 번 바뀌어도 구분된다.
+        세션 상태의 버전과 다르면 load_profile 로 다시 읽어야 한다. 없는 사용자면 None"""
+        raise NotImplementedError
+
+    def record_completion(self, user_id, counters, fields, session, entries, achievements, expected_deadline=None):
+        """세션 완료 결과를 한 트랜잭션으로 기록. expected_deadline 이 이미 처리됐으면 False"""
+        raise NotImplementedError
+
+    def record_sessions(self, user_id, counters, fields, sessions, entries, achievements):
+        """밖에서 끝난 세션 여러 개를 한 트랜잭션으로 기록. 업적 외 항목의 멱등 키가 이미 있으면
+        아무것도 쓰지 않고 False. 이미 받은 업적 보상 항목만 빼고 나머지는 기록한다."""
+        raise NotImplementedError
+
+    def applied_keys(self, user_id, idem_keys):
+        """원장에 이미 반영된 멱등 키 집합"""
+        raise NotImplementedError
+
+    def load_study_intervals(self, user_id, since):
+        """since(epoch 초) 이후에 끝난 공부 세션(가져온 것 포함)의 [(시작, 끝, 종류, ref)] (끝 시각 순, 종류는 'study' | 'import')"""
+        raise NotImplementedError
+
+    def reset_timer(self, user_id, **fields):
+        """타이머 초기화: 필드 저장 + reset 이벤트"""
+        raise NotImplementedError
+
+    def purchase(self, user_id, item_key, price, fields=None, idem_key=None):
+        """잔액 확인 후 차감 + 아이템 지급. 성공(이미 반영된 경우 포함) 여부 반환"""
+        raise NotImplementedError
+
+    def balance(self, user_id):
+        """현재 코인 잔액"""
+        raise NotImplementedError
+
+    def load_daily_history(self, user_id, before=None, limit=None, since=None):
+        """최근 날짜부터 limit 일치 (since 이상 before 미만만)"""
+        raise NotImplementedError
+
+    def load_session_log(self, user_id, limit=None, offset=0):
+        raise NotImplementedError
+
+    def count_sessions(self, user_id):
+        raise NotImplementedError
+
+    def load_running_timers(self):
+        """실행 중인 모든 타이머의 (user_id, 마감 시각)"""
+        raise NotImplementedError
+
+    def load_profiles(self, user_ids):
+        """여러 사용자의 프로필을 한 번에. {user_id: 프로필} (없는 사용자는 빠짐)"""
+        raise NotImplementedError
+
+    def create_room(self, room_id, **fields):
+        """ROOM_FIELDS 로 방 생성"""
+        raise NotImplementedError
+
+    def load_rooms(self):
+        """모든 방의 {room_id, ROOM_FIELDS..., credited_phase, members, joined}
+        (joined 는 {user_id: 입장 시각})"""
+        raise NotImplementedError
+
+    def join_room(self, room_id, user_id):
+        """방 입장. 다른 방에 있었으면 그 방에서는 나온다. 입장 시각 반환"""
+        raise NotImplementedError
+
+    def mark_room_phase(self, room_id, phase_index):
+        """방의 phase_index 구간까지 보상 처리가 끝났다고 기록 (재시작 후 놓친 구간을 찾는 기준)"""
+        raise NotImplementedError
+
+    def leave_room(self, user_id):
+        """방에서 나옴. 마지막 멤버였으면 방도 지운다."""
+        raise NotImplementedError
+
+    def record_room_completion(self, day, session, credits):
+        """방 공부 세션 완료를 멤버 전원에 대해 한 트랜잭션으로 기록. 반영된 user_id 목록 반환"""
+        raise NotImplementedError
+
+    def load_leaderboard(self, today, week_start, since=None):
+        """랭킹 점수 {'daily', 'weekly', 'total_minutes', 'cycles'} (각각 {user_id: 점수}) 와 'until'
+
+        since 를 주면 updated_at 이 since 보다 늦은 사용자만 (점수가 0 이어도 넣는다).
+        'until' 은 읽은 사용자 중 가장 늦은 updated_at (다음 since 의 기준)
+        """
+        raise NotImplementedError
+
+    def iter_sessions(self, user_id, chunk_size):
+        """세션 기록을 오래된 순으로 chunk_size 개씩 [(day, time, duration, type)] 목록으로"""
+        raise NotImplementedError
+
+    def iter_daily_history(self, user_id, chunk_size):
+        """일별 기록을 날짜 순으로 chunk_size 개씩 [(day, sessions, minutes)] 목록으로"""
+        raise NotImplementedError
+
+    def import_sessions(self, user_id, rows):
+        """[(day, time, duration, type)] 중 이미 있는 세션을 빼고 추가. (추가한 수, {날짜: 추가된 공부 분})"""
+        raise NotImplementedError
+
+    def recompute_totals(self, user_id):
+        """일별 기록으로 total_*/today_* 요약 필드를 다시 계산"""
+        raise NotImplementedError
+
+    def recompute_analytics(self, user_id):
+        """일별 기록/세션 기록으로 연속 공부일과 시간대 분포를 다시 계산"""
+        raise NotImplementedError
+
+    def projection_users(self):
+        """재생 대상 user_id 목록 (정렬)"""
+        raise NotImplementedError
+
+    def load_events(self, user_ids, after=None):
+        """이벤트 [(user_id, seq, kind, at, day, hour, minutes, ref)] 를 user_id, 시각 순으로 (after: {user_id: seq} 이후만)"""
+        raise NotImplementedError
+
+    def load_projection_snapshots(self, user_ids, rules):
+        """규칙이 같은 가장 최근 재생 스냅샷 {user_id: (seq, last_at, 상태 JSON)}"""
+        raise NotImplementedError
+
+    def apply_projections(self, projections, daily, rewards, snapshots, rebuilt=()):
+        """재생 결과를 요약 필드/일별 기록/시간대 분포/업적에 반영. (반영한 user_id 목록, 새 업적 수)"""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    """WAL 모드 SQLite 저장소. 스레드마다 연결을 하나씩 쓴다."""
+
+    def __init__(self, path, clock=system_clock):
+        self.path = path
+        self.clock = clock          # 기록 시각, 오늘 날짜 (clock.py)
+        self._local = threading.local()
+        added = self._migrate()
+        fresh_events = not events.exists(self._conn())
+        self._conn().executescript(SCHEMA + ledger.SCHEMA + events.SCHEMA)
+        with self._write() as conn:
+            ledger.migrate(conn)
+            if fresh_events:
+                events.backfill(conn)
+        if 'last_study_date' in added:
+            # 연속 공부일/시간대 분포가 생기기 전의 사용자는 기록으로 한 번 채운다
+            for (user_id,) in self._conn().execute("SELECT user_id FROM users").fetchall():
+                self.recompute_analytics(user_id)
+
+    def _migrate(self):
+        """예전 스키마의 users/rooms 테이블에 새로 생긴 열 추가. 추가한 users 열 이름 목록 반환"""
+        conn = self._conn()
+        room_columns = {row[1] for row in conn.execute("PRAGMA table_info(rooms)")}
+        if room_columns and 'credited_phase' not in room_columns:
+            conn.execute("ALTER TABLE rooms ADD COLUMN credited_phase INTEGER NOT NULL DEFAULT -1")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if not columns:
+            return []
+        added = [key for key in PROFILE_FIELDS if key not in columns]
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        for key, default in PROFILE_FIELDS.items():
+            if key not in columns:
+                if isinstance(default, (bool, int)):
+                    conn.execute(f"ALTER TABLE users ADD COLUMN {key} INTEGER NOT NULL DEFAULT {int(default)}")
+                else:
+                    conn.execute(f"ALTER TABLE users ADD COLUMN {key}")
+        return added
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        """쓰기 트랜잭션. 처음부터 쓰기 잠금을 잡아 중간에 잠금 승격 충돌이 나지 않게 한다."""
+        return _Transaction(self._conn(), "BEGIN IMMEDIATE")
+
+    def _read(self):
+        """읽기 트랜잭션. WAL 모드라 쓰기 중에도 막히지 않는다."""
+        return _Transaction(self._conn(), "BEGIN")
+
+    def load_profile(self, user_id):
+        return self.load_profiles([user_id]).get(user_id)
+
+    def profile_version(self, user_id):
+        row = self._conn().execute("SELECT version FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def load_profiles(self, user_ids):
+        """사용자 수와 상관없이 쿼리 세 번 (요약, 아이템, 업적)"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        marks = ", ".join("?" for _ in user_ids)
+        with self._read() as conn:
+            cols = ", ".join(PROFILE_FIELDS)
+            profiles = {}
+            for user_id, *row in conn.execute(
+                    f"SELECT user_id, {cols} FROM users WHERE user_id IN ({marks})", user_ids):
+                profile = {}
+                for (key, default), value in zip(PROFILE_FIELDS.items(), row):
+                    profile[key] = bool(value) if isinstance(default, bool) else value
+                profile['owned_items'] = set()
+                profile['unlocked_achievements'] = set()
+                profiles[user_id] = profile
+            for user_id, key in conn.execute(
+                    f"SELECT user_id, item_key FROM inventory WHERE user_id IN ({marks})", user_ids):
+                profiles[user_id]['owned_items'].add(key)
+            for user_id, key in conn.execute(
+                    f"SELECT user_id, ach_key FROM achievements WHERE user_id IN ({marks})", user_ids):
+                profiles[user_id]['unlocked_achievements'].add(key)
+            for profile in profiles.values():
+                profile['hour_sessions'] = empty_hours()
+            for user_id, hour, sessions in conn.execute(
+                    f"SELECT user_id, hour, sessions FROM hour_stats WHERE user_id IN ({marks})", user_ids):
+                profiles[user_id]['hour_sessions'][hour] = sessions
+            for profile in profiles.values():
+                profile['best_hour'] = best_hour(profile['hour_sessions'])
+            return profiles
+
+    def create_profile(self, user_id, **fields):
+        with self._write() as conn:
+            now = self.clock.time()
+            conn.execute("INSERT OR IGNORE INTO users (user_id, updated_at) VALUES (?, ?)", (user_id, now))
+            _update_fields(conn, user_id, fields, now)
+
+    def save_profile(self, user_id, **fields):
+        if not fields:
+            return
+        with self._write() as conn:
+            _update_fields(conn, user_id, fields, self.clock.time())
+
+    def record_completion(self, user_id, counters, fields, session, entries, achievements, expected_deadline=None):
+        """counters 는 증가량, fields 는 덮어쓸 값. session 은 {'day','time','duration','type'}
+        entries 는 코인 원장 항목 [(amount, reason, ref, idem_key)] (잔액은 원장이 갱신)
+
+        expected_deadline 을 주면 그 마감 시각의 타이머가 아직 실행 중일 때만 기록한다.
+        앱과 스케줄러가 같은 세션을 동시에 완료하려 해도 한쪽만 성공한다.
+        """
+        now = self.clock.time()
+        try:
+            return self._record_completion(user_id, counters, fields, session, entries, achievements,
+                                           expected_deadline, now)
+        except _AlreadyApplied:
+            return False
+
+    def _record_completion(self, user_id, counters, fields, session, entries, achievements, expected_deadline, now):
+        with self._write() as conn:
+            if expected_deadline is not None:
+                cur = conn.execute(
+                    "UPDATE users SET is_running = 0, timer_deadline = NULL "
+                    "WHERE user_id = ? AND is_running = 1 AND timer_deadline = ?",
+                    (user_id, expected_deadline))
+                if cur.rowcount == 0:
+                    return False
+            counters = _post_entries(conn, user_id, counters, entries, now)
+            if counters is None:
+                raise _AlreadyApplied()
+            if counters:
+                sets = ", ".join(f"{k} = {k} + ?" for k in counters)
+                conn.execute(f"UPDATE users SET {sets}, updated_at = ?, version = version + 1 WHERE user_id = ?",
+                             (*counters.values(), now, user_id))
+            _update_fields(conn, user_id, fields, now)
+            if session is not None:
+                _insert_session(conn, user_id, session)
+                if session['type'] == 'study':
+                    events.append(conn, user_id, [events.session_event(session)])
+            conn.executemany(
+                "INSERT OR IGNORE INTO achievements (user_id, ach_key, unlocked_at) VALUES (?, ?, ?)",
+                [(user_id, key, now) for key in achievements])
+            return True
+
+    def record_sessions(self, user_id, counters, fields, sessions, entries, achievements):
+        """완료된 세션 여러 개를 한 트랜잭션으로 (위젯 동기화). 인자는 record_completion 과 같고
+        sessions 만 목록이다. 업적 외 항목의 멱등 키가 하나라도 이미 있으면 아무것도 쓰지 않고 False
+        (applied_keys 로 미리 걸러 내므로 같은 세션을 동시에 보낸 경우에만 생긴다).
+        그렇지 않으면 이미 받은 업적 보상 항목만 빼고(누적 코인 증가량도 그만큼 줄여) 나머지를 기록한다."""
+        now = self.clock.time()
+        try:
+            with self._write() as conn:
+                counters = _post_entries(conn, user_id, counters, entries, now)
+                if counters is None:
+                    return False
+                if counters:
+                    sets = ", ".join(f"{k} = {k} + ?" for k in counters)
+                    conn.execute(f"UPDATE users SET {sets}, updated_at = ?, version = version + 1 WHERE user_id = ?",
+                                 (*counters.values(), now, user_id))
+                _update_fields(conn, user_id, fields, now)
+                for session in sessions:
+                    _insert_session(conn, user_id, session)
+                events.append(conn, user_id, [events.session_event(s) for s in sessions if s['type'] == 'study'])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO achievements (user_id, ach_key, unlocked_at) VALUES (?, ?, ?)",
+                    [(user_id, key, now) for key in achievements])
+                return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def applied_keys(self, user_id, idem_keys):
+        """원장에 이미 반영된 멱등 키 집합"""
+        with self._read() as conn:
+            return ledger.applied_keys(conn, user_id, idem_keys)
+
+    def load_study_intervals(self, user_id, since):
+        """events (user_id, at) 인덱스 범위만 읽는다"""
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT at - minutes * 60, at, kind, ref FROM events WHERE user_id = ? AND at > ? AND kind IN (?, ?) "
+                "ORDER BY at", (user_id, int(since), events.KIND_CODES['study'], events.KIND_CODES['import'])).fetchall()
+        return [(start, end, events.KINDS[kind], ref) for start, end, kind, ref in rows]
+
+    def reset_timer(self, user_id, **fields):
+        with self._write() as conn:
+            now = self.clock.time()
+            _update_fields(conn, user_id, fields, now)
+            events.append(conn, user_id, [events.event('reset', now)])
+
+    def purchase(self, user_id, item_key, price, fields=None, idem_key=None):
+        """아이템은 한 번만 살 수 있으므로 기본 멱등 키는 purchase:<item_key>.
+        더블 클릭이나 다른 복제본에서 같은 구매가 다시 와도 한 번만 차감된다."""
+        idem_key = idem_key or f"purchase:{item_key}"
+        now = self.clock.time()
+        try:
+            with self._write() as conn:
+                if not ledger.post(conn, user_id, [(-price, 'purchase', item_key, idem_key)], now):
+                    return True
+                conn.execute("INSERT OR IGNORE INTO inventory (user_id, item_key, acquired_at) VALUES (?, ?, ?)",
+                             (user_id, item_key, now))
+                events.append(conn, user_id, [events.event('purchase', now, ref=item_key)])
+                _update_fields(conn, user_id, fields or {}, now)
+                return True
+        except ledger.InsufficientCoins:
+            return False
+
+    def balance(self, user_id):
+        row = self._conn().execute("SELECT coins FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def ledger_history(self, user_id, limit=50):
+        with self._read() as conn:
+            return ledger.history(conn, user_id, limit)
+
+    def verify_balance(self, user_id):
+        """원장으로 재계산한 잔액이 users.coins 와 같은지"""
+        with self._read() as conn:
+            return ledger.replay_balance(conn, user_id) == conn.execute(
+                "SELECT coins FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def load_daily_history(self, user_id, before=None, limit=None, since=None):
+        """(user_id, day) 기본 키 범위만 읽으므로 전체 기록 양과 상관없이 구간 크기에 비례한다"""
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT day, sessions, minutes FROM daily_rollups WHERE user_id = ? AND day >= ? AND day < ? "
+                "ORDER BY day DESC LIMIT ?",
+                (user_id, since or '', before or '9999-12-31', -1 if limit is None else limit))
+            return {day: {'sessions': s, 'minutes': m} for day, s, m in rows}
+
+    def load_session_log(self, user_id, limit=None, offset=0):
+        """오래된 순으로 반환. limit 가 있으면 최신 기준 offset 부터 limit 개"""
+        with self._read() as conn:
+            if limit is None:
+                rows = conn.execute(
+                    "SELECT time, duration, type FROM sessions WHERE user_id = ? ORDER BY id", (user_id,))
+                return [{'time': t, 'duration': d, 'type': ty} for t, d, ty in rows]
+            rows = conn.execute(
+                "SELECT time, duration, type FROM sessions WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (user_id, limit, offset)).fetchall()
+            return [{'time': t, 'duration': d, 'type': ty} for t, d, ty in reversed(rows)]
+
+    def count_sessions(self, user_id):
+        with self._read() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def load_running_timers(self):
+        with self._read() as conn:
+            return conn.execute(
+                "SELECT user_id, timer_deadline FROM users WHERE timer_deadline IS NOT NULL AND is_running = 1"
+            ).fetchall()
+
+    def create_room(self, room_id, **fields):
+        with self._write() as conn:
+            conn.execute(
+                f"INSERT INTO rooms (room_id, {', '.join(ROOM_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (room_id, *(fields[k] for k in ROOM_FIELDS)))
+
+    def load_rooms(self):
+        with self._read() as conn:
+            rooms = {}
+            for room_id, credited, *row in conn.execute(
+                    f"SELECT room_id, credited_phase, {', '.join(ROOM_FIELDS)} FROM rooms"):
+                rooms[room_id] = {'room_id': room_id, **dict(zip(ROOM_FIELDS, row)), 'credited_phase': credited,
+                                  'members': set(), 'joined': {}}
+            for room_id, user_id, joined_at in conn.execute("SELECT room_id, user_id, joined_at FROM room_members"):
+                if room_id in rooms:
+                    rooms[room_id]['members'].add(user_id)
+                    rooms[room_id]['joined'][user_id] = joined_at
+            return list(rooms.values())
+
+    def join_room(self, room_id, user_id):
+        joined_at = self.clock.time()
+        with self._write() as conn:
+            previous = conn.execute("SELECT room_id FROM room_members WHERE user_id = ?", (user_id,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO room_members (room_id, user_id, joined_at) VALUES (?, ?, ?)",
+                         (room_id, user_id, joined_at))
+            if previous and previous[0] != room_id:
+                _drop_if_empty(conn, previous[0])
+        return joined_at
+
+    def mark_room_phase(self, room_id, phase_index):
+        with self._write() as conn:
+            conn.execute("UPDATE rooms SET credited_phase = MAX(credited_phase, ?) WHERE room_id = ?",
+                         (phase_index, room_id))
+
+    def leave_room(self, user_id):
+        with self._write() as conn:
+            previous = conn.execute("SELECT room_id FROM room_members WHERE user_id = ?", (user_id,)).fetchone()
+            if previous is None:
+                return
+            conn.execute("DELETE FROM room_members WHERE user_id = ?", (user_id,))
+            _drop_if_empty(conn, previous[0])
+
+    def record_room_completion(self, day, session, credits):
+        """credits 는 [(user_id, 원장 항목)] (첫 항목이 공부 보상, 나머지는 업적 보상).
+        멤버 수와 상관없이 executemany 몇 번으로 끝난다. 원장의 멱등 키로 이미 반영된
+        멤버는 건너뛰므로 여러 복제본이 같은 방 세션을 완료해도 한 번만 지급된다.
+        오늘 통계는 저장된 last_date 와 비교해 SQL 안에서 리셋한다.
+        """
+        now = self.clock.time()
+        yesterday = str(date.fromisoformat(day) - timedelta(days=1))
+        with self._write() as conn:
+            applied = ledger.post_many(conn, credits, now)
+            duration = session['duration']
+            # 연속 공부일은 analytics.advance_streak 와 같은 규칙 (SET 의 오른쪽은 모두 갱신 전 값)
+            streak = ("CASE WHEN last_study_date = :day THEN current_streak "
+                      "WHEN last_study_date = :yesterday THEN current_streak + 1 ELSE 1 END")
+            conn.executemany(
+                "UPDATE users SET total_sessions = total_sessions + 1, total_minutes = total_minutes + :duration, "
+                "total_coins_earned = total_coins_earned + :earned, "
+                "today_sessions = CASE WHEN last_date = :day THEN today_sessions + 1 ELSE 1 END, "
+                "today_minutes = CASE WHEN last_date = :day THEN today_minutes + :duration ELSE :duration END, "
+                f"current_streak = {streak}, longest_streak = MAX(longest_streak, {streak}), "
+                "last_study_date = :day, last_date = :day, updated_at = :now, version = version + 1 WHERE user_id = :user_id",
+                [{'duration': duration, 'earned': sum(e[0] for e in entries), 'day': day, 'yesterday': yesterday,
+                  'now': now, 'user_id': user_id} for user_id, entries in applied])
+            conn.executemany(
+                "INSERT INTO sessions (user_id, day, time, duration, type) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, day, session['time'], duration, session['type']) for user_id, _ in applied])
+            conn.executemany(
+                "INSERT INTO daily_rollups (user_id, day, sessions, minutes) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (user_id, day) DO UPDATE SET "
+                "sessions = sessions + 1, minutes = minutes + excluded.minutes",
+                [(user_id, day, duration) for user_id, _ in applied])
+            conn.executemany(_HOUR_UPSERT, [(user_id, int(session['time'][:2]), duration) for user_id, _ in applied])
+            base = {'day': day, **session}
+            events.append_many(conn, [(user_id, [events.session_event({**base, 'ref': entries[0][2]})])
+                                      for user_id, entries in applied])
+            conn.executemany(
+                "INSERT OR IGNORE INTO achievements (user_id, ach_key, unlocked_at) VALUES (?, ?, ?)",
+                [(user_id, ref, now) for user_id, entries in applied
+                 for _, reason, ref, _ in entries if reason == 'achievement'])
+            return [user_id for user_id, _ in applied]
+
+    def load_leaderboard(self, today, week_start, since=None):
+        """시작할 때 한 번은 전체를, 이후에는 updated_at 색인으로 바뀐 사용자만 읽는다.
+        오늘/이번 주는 day 색인 범위만 읽는다."""
+        with self._read() as conn:
+            if since is None:
+                users = conn.execute(
+                    "SELECT user_id, total_minutes, completed_cycles FROM users "
+                    "WHERE total_minutes > 0 OR completed_cycles > 0").fetchall()
+                weekly = conn.execute(
+                    "SELECT user_id, SUM(minutes) FROM daily_rollups WHERE day >= ? AND day <= ? GROUP BY user_id",
+                    (week_start, today)).fetchall()
+                daily = conn.execute(
+                    "SELECT user_id, minutes FROM daily_rollups WHERE day = ?", (today,)).fetchall()
+                until = conn.execute("SELECT COALESCE(MAX(updated_at), 0) FROM users").fetchone()[0]
+            else:
+                rows = conn.execute(
+                    "SELECT user_id, total_minutes, completed_cycles, updated_at FROM users WHERE updated_at > ?",
+                    (since,)).fetchall()
+                users = [row[:3] for row in rows]
+                until = max((row[3] for row in rows), default=since)
+                weekly = conn.execute(
+                    "SELECT d.user_id, SUM(d.minutes) FROM users u CROSS JOIN daily_rollups d ON d.user_id = u.user_id "
+                    "WHERE u.updated_at > ? AND d.day >= ? AND d.day <= ? GROUP BY d.user_id",
+                    (since, week_start, today)).fetchall()
+                daily = conn.execute(
+                    "SELECT d.user_id, d.minutes FROM users u CROSS JOIN daily_rollups d ON d.user_id = u.user_id "
+                    "WHERE u.updated_at > ? AND d.day = ?", (since, today)).fetchall()
+        return {
+            'daily': dict(daily),
+            'weekly': dict(weekly),
+            'total_minutes': {user_id: minutes for user_id, minutes, _ in users},
+            'cycles': {user_id: cycles for user_id, _, cycles in users},
+            'until': until,
+        }
+
+    def iter_sessions(self, user_id, chunk_size):
+        """id 기준 키셋 페이지네이션이라 기록 양과 상관없이 메모리는 chunk_size 개 분량이다"""
+        last_id = 0
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(
+                    "SELECT id, day, time, duration, type FROM sessions WHERE user_id = ? AND id > ? "
+                    "ORDER BY id LIMIT ?", (user_id, last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def iter_daily_history(self, user_id, chunk_size):
+        last_day = ''
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(
+                    "SELECT day, sessions, minutes FROM daily_rollups WHERE user_id = ? AND day > ? "
+                    "ORDER BY day LIMIT ?", (user_id, last_day, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_day = rows[-1][0]
+            yield rows
+
+    def import_sessions(self, user_id, rows):
+        """임시 테이블에 넣고 (user_id, day) 색인으로 이미 있는 세션을 지운 뒤 나머지만 옮긴다.
+        같은 날짜/시각/길이/종류면 같은 세션으로 본다. 한 묶음이 한 트랜잭션이다."""
+        with self._write() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_rows "
+                         "(day TEXT NOT NULL, time TEXT NOT NULL, duration INTEGER NOT NULL, type TEXT NOT NULL)")
+            conn.execute("DELETE FROM import_rows")
+            conn.executemany("INSERT INTO import_rows (day, time, duration, type) VALUES (?, ?, ?, ?)", rows)
+            conn.execute(
+                "DELETE FROM import_rows WHERE EXISTS (SELECT 1 FROM sessions s WHERE s.user_id = ? "
+                "AND s.day = import_rows.day AND s.time = import_rows.time "
+                "AND s.duration = import_rows.duration AND s.type = import_rows.type)", (user_id,))
+            inserted = conn.execute("SELECT COUNT(*) FROM import_rows").fetchone()[0]
+            conn.execute("INSERT INTO sessions (user_id, day, time, duration, type) "
+                         "SELECT ?, day, time, duration, type FROM import_rows ORDER BY day, time", (user_id,))
+            added = dict(conn.execute(
+                "SELECT day, SUM(duration) FROM import_rows WHERE type = 'study' GROUP BY day").fetchall())
+            events.append(conn, user_id, [
+                events.session_event({'day': day, 'time': hm, 'duration': duration}, 'import')
+                for day, hm, duration in conn.execute(
+                    "SELECT day, time, duration FROM import_rows WHERE type = 'study' ORDER BY day, time")])
+            conn.execute(
+                "INSERT INTO daily_rollups (user_id, day, sessions, minutes) "
+                "SELECT ?, day, COUNT(*), SUM(duration) FROM import_rows WHERE type = 'study' GROUP BY day "
+                "ON CONFLICT (user_id, day) DO UPDATE SET "
+                "sessions = sessions + excluded.sessions, minutes = minutes + excluded.minutes", (user_id,))
+            conn.execute("DELETE FROM import_rows")
+            return inserted, added
+
+    def recompute_totals(self, user_id):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE users SET "
+                "total_sessions = (SELECT COALESCE(SUM(sessions), 0) FROM daily_rollups WHERE user_id = ?), "
+                "total_minutes = (SELECT COALESCE(SUM(minutes), 0) FROM daily_rollups WHERE user_id = ?), "
+                "today_sessions = COALESCE((SELECT sessions FROM daily_rollups "
+                "WHERE user_id = ? AND day = users.last_date), 0), "
+                "today_minutes = COALESCE((SELECT minutes FROM daily_rollups "
+                "WHERE user_id = ? AND day = users.last_date), 0), "
+                "updated_at = ?, version = version + 1 WHERE user_id = ?",
+                (user_id, user_id, user_id, user_id, self.clock.time(), user_id))
+
+    def recompute_analytics(self, user_id):
+        """날짜 순으로 한 번 훑어 연속 공부일을 세고, 시간대 분포는 세션 기록에서 SQL 로 다시 모은다"""
+        with self._write() as conn:
+            days = (day for (day,) in conn.execute(
+                "SELECT day FROM daily_rollups WHERE user_id = ? AND sessions > 0 ORDER BY day", (user_id,)))
+            current, longest, last = streaks_from_days(days)
+            if last is not None and last < str(self.clock.today() - timedelta(days=1)):
+                current = 0
+            _update_fields(conn, user_id, {'current_streak': current, 'longest_streak': longest,
+                                           'last_study_date': last}, self.clock.time())
+            conn.execute("DELETE FROM hour_stats WHERE user_id = ?", (user_id,))
+            conn.execute(
+                "INSERT INTO hour_stats (user_id, hour, sessions, minutes) "
+                "SELECT user_id, CAST(substr(time, 1, 2) AS INTEGER) AS hour, COUNT(*), SUM(duration) "
+                "FROM sessions WHERE user_id = ? AND type = 'study' AND hour BETWEEN 0 AND ? GROUP BY hour",
+                (user_id, HOURS - 1))
+
+    def projection_users(self):
+        with self._read() as conn:
+            return [user_id for (user_id,) in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+
+    def load_events(self, user_ids, after=None):
+        """사용자마다 (user_id, seq) 기본 키 범위만 읽는다. user_id 순서는 파이썬 문자열 정렬과 같다."""
+        if not user_ids:
+            return []
+        after = after or {}
+        pairs = ", ".join("(?, ?)" for _ in user_ids)
+        with self._read() as conn:
+            return conn.execute(
+                "SELECT e.user_id, e.seq, e.kind, e.at, e.day, e.hour, e.minutes, e.ref "
+                f"FROM (VALUES {pairs}) AS v JOIN events e ON e.user_id = v.column1 AND e.seq > v.column2 "
+                "ORDER BY e.user_id, e.at, e.seq",
+                [value for user_id in user_ids for value in (user_id, after.get(user_id, 0))]).fetchall()
+
+    def load_projection_snapshots(self, user_ids, rules):
+        if not user_ids:
+            return {}
+        marks = ", ".join("?" for _ in user_ids)
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT user_id, seq, last_at, state FROM projection_snapshots "
+                f"WHERE rules = ? AND user_id IN ({marks}) ORDER BY user_id, seq", (rules, *user_ids))
+            return {user_id: (seq, last_at, state) for user_id, seq, last_at, state in rows}
+
+    def apply_projections(self, projections, daily, rewards, snapshots, rebuilt=()):
+        """projections 는 {user_id: 상태 dict}(projection.py), daily 는 [(user_id, day, sessions, minutes)],
+        rewards 는 {업적 키: 보상}, snapshots 는 {user_id: (rules, 상태 JSON)}.
+        재생한 뒤 이벤트가 더 생긴 사용자는 건너뛴다 (다음 재생에서 맞춘다). 처음부터 재생한 사용자(rebuilt)는
+        일별 기록을 지우고 다시 쓰고, 아니면 재생한 날짜만 덮어쓴다. 예전 규칙으로 달성한 업적은 그대로 둔다.
+        새로 달성한 업적은 실시간 완료와 같은 멱등 키로 보상을 지급한다.
+        """
+        if not projections:
+            return [], 0
+        now = self.clock.time()
+        users = list(projections)
+        marks = ", ".join("?" for _ in users)
+        days = {}
+        for row in daily:
+            days.setdefault(row[0], []).append(row)
+        applied = []
+        unlocked = 0
+        with self._write() as conn:
+            latest = dict(conn.execute(
+                f"SELECT user_id, MAX(seq) FROM events WHERE user_id IN ({marks}) GROUP BY user_id", users))
+            for user_id, p in projections.items():
+                if latest.get(user_id, 0) != p['seq']:
+                    continue
+                conn.execute(
+                    "UPDATE users SET total_sessions = :total_sessions, total_minutes = :total_minutes, "
+                    "total_coins_earned = :total_coins_earned, completed_cycles = :completed_cycles, "
+                    "current_streak = :current_streak, longest_streak = :longest_streak, "
+                    "last_study_date = :last_study_date, "
+                    "today_sessions = CASE WHEN last_date IS NULL OR last_date <= :today_day "
+                    "THEN :today_sessions ELSE today_sessions END, "
+                    "today_minutes = CASE WHEN last_date IS NULL OR last_date <= :today_day "
+                    "THEN :today_minutes ELSE today_minutes END, "
+                    "last_date = CASE WHEN last_date IS NULL OR last_date < :today_day "
+                    "THEN :today_day ELSE last_date END, "
+                    "updated_at = :now, version = version + 1 WHERE user_id = :user_id",
+                    {**{key: p[key] for key in (
+                        'total_sessions', 'total_minutes', 'total_coins_earned', 'completed_cycles', 'current_streak',
+                        'longest_streak', 'last_study_date', 'today_day', 'today_sessions', 'today_minutes')},
+                     'now': now, 'user_id': user_id})
+                if user_id in rebuilt:
+                    conn.execute("DELETE FROM daily_rollups WHERE user_id = ?", (user_id,))
+                conn.executemany("INSERT OR REPLACE INTO daily_rollups (user_id, day, sessions, minutes) "
+                                 "VALUES (?, ?, ?, ?)", days.get(user_id, []))
+                conn.execute("DELETE FROM hour_stats WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO hour_stats (user_id, hour, sessions, minutes) VALUES (?, ?, ?, ?)",
+                    [(user_id, hour, n, m) for hour, (n, m) in enumerate(zip(p['hour_sessions'], p['hour_minutes']))
+                     if n])
+                for key, at in p['unlocked'].items():
+                    cur = conn.execute("INSERT OR IGNORE INTO achievements (user_id, ach_key, unlocked_at) "
+                                       "VALUES (?, ?, ?)", (user_id, key, at))
+                    if cur.rowcount and key in rewards:
+                        ledger.post(conn, user_id, [(rewards[key], 'achievement', key, f"achievement:{key}")], now)
+                        unlocked += 1
+                if user_id in snapshots:
+                    rules, state = snapshots[user_id]
+                    conn.execute("DELETE FROM projection_snapshots WHERE user_id = ?", (user_id,))
+                    conn.execute("INSERT INTO projection_snapshots (user_id, seq, rules, last_at, state) "
+                                 "VALUES (?, ?, ?, ?, ?)", (user_id, p['seq'], rules, p['last_at'], state))
+                applied.append(user_id)
+        return applied, unlocked
+
+
+_HOUR_UPSERT = ("INSERT INTO hour_stats (user_id, hour, sessions, minutes) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (user_id, hour) DO UPDATE SET "
+                "sessions = sessions + 1, minutes = minutes + excluded.minutes")
+
+
+def _post_entries(conn, user_id, counters, entries, now):
+    """원장에 아직 없는 항목만 반영 (ledger.fresh_entries). 이미 받은 업적 보상을 뺀 만큼
+    counters 의 누적 코인도 줄여서 반환한다. 묶음이 이미 반영됐으면 None"""
+    if not entries:
+        return counters
+    fresh = ledger.fresh_entries(conn, user_id, entries)
+    if not fresh:
+        return None
+    dropped = sum(entry[0] for entry in entries) - sum(entry[0] for entry in fresh)
+    if dropped and 'total_coins_earned' in counters:
+        counters = {**counters, 'total_coins_earned': counters['total_coins_earned'] - dropped}
+    ledger.post(conn, user_id, fresh, now)
+    return counters
+
+
+def _insert_session(conn, user_id, session):
+    """세션 기록 한 줄 + 공부면 일별/시간대 합계"""
+    conn.execute(
+        "INSERT INTO sessions (user_id, day, time, duration, type) VALUES (?, ?, ?, ?, ?)",
+        (user_id, session['day'], session['time'], session['duration'], session['type']))
+    if session['type'] == 'study':
+        conn.execute(
+            "INSERT INTO daily_rollups (user_id, day, sessions, minutes) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET "
+            "sessions = sessions + 1, minutes = minutes + excluded.minutes",
+            (user_id, session['day'], session['duration']))
+        conn.execute(_HOUR_UPSERT, (user_id, int(session['time'][:2]), session['duration']))
+
+
+def _drop_if_empty(conn, room_id):
+    conn.execute("DELETE FROM rooms WHERE room_id = ? AND NOT EXISTS "
+                 "(SELECT 1 FROM room_members WHERE room_id = ?)", (room_id, room_id))
+
+
+class _AlreadyApplied(Exception):
+    """원장에 이미 반영된 묶음. 트랜잭션을 롤백하기 위해 쓴다."""
+
+
+class _Transaction:
+    """with 블록 하나를 BEGIN ~ COMMIT 트랜잭션으로 묶는다"""
+
+    def __init__(self, conn, begin):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self):
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def _update_fields(conn, user_id, fields, now):
+    fields = {k: v for k, v in fields.items() if k in PROFILE_FIELDS}
+    if not fields:
+        return
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    conn.execute(f"UPDATE users SET {sets}, updated_at = ?, version = version + 1 WHERE user_id = ?",
+                 (*fields.values(), now, user_id))
+
+
+def open_storage(path=None, clock=system_clock):
+    """환경 변수 STUDY_DB_PATH 또는 기본 경로의 SQLite 저장소"""
+    path = path or os.environ.get('STUDY_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'study.db')
+    return SQLiteStorage(path, clock)
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import open_storage  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    """빈 임시 SQLite 저장소"""
+    return open_storage(str(tmp_path / 'study.db'))
@@ -0,0 +1,123 @@
+import socket
+import socketserver
+import threading
+
+# =====================================================
+# 테스트용 Redis 프로토콜(RESP) 서버
+# =====================================================
+# state_store.RedisBackend 가 쓰는 명령(AUTH, SELECT, PING, LRANGE, RPUSH, DEL, EXPIRE, MULTI/EXEC)만
+# 메모리 dict 로 구현한다. drop_after_next 로 다음 명령을 실행한 뒤 응답 없이 연결을 끊을 수 있다.
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.password = password
+        self.lists = {}             # (db, key) → [bytes]
+        self.expires = {}           # (db, key) → 초
+        self.commands = []          # 받은 명령 이름 (순서대로)
+        self.connections = 0
+        self.drop_after_next = None  # 이 이름의 명령을 실행한 뒤 응답 없이 연결을 끊음
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def close_clients(self):
+        """서버 쪽에서 열린 연결을 모두 닫음 (유휴 시간 초과 흉내)"""
+        for handler in list(_Handler.open):
+            if handler.server is self:
+                handler.request.shutdown(socket.SHUT_RDWR)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    open = set()
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        _Handler.open.add(self)
+        self.db = 0
+        self.authed = server.password is None
+        self.queued = None
+        try:
+            while True:
+                command = self._read_command()
+                if command is None:
+                    return
+                name = command[0].decode().upper()
+                server.commands.append(name)
+                with server.lock:
+                    reply = self._execute(name, command[1:])
+                if server.drop_after_next == name:
+                    server.drop_after_next = None
+                    return
+                self.wfile.write(reply)
+        except (OSError, ValueError):
+            return
+        finally:
+            _Handler.open.discard(self)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            raise ValueError(line)
+        args = []
+        for _ in range(int(line[1:])):
+            n = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(n + 2)[:-2])
+        return args
+
+    def _execute(self, name, args):
+        if name == 'AUTH':
+            self.authed = args[0].decode() == self.server.password
+            return b'+OK\r\n' if self.authed else b'-WRONGPASS invalid password\r\n'
+        if not self.authed:
+            return b'-NOAUTH Authentication required.\r\n'
+        if name == 'MULTI':
+            self.queued = []
+            return b'+OK\r\n'
+        if name == 'EXEC':
+            queued, self.queued = self.queued or [], None
+            return b'*%d\r\n' % len(queued) + b''.join(self._run(n, a) for n, a in queued)
+        if self.queued is not None:
+            self.queued.append((name, args))
+            return b'+QUEUED\r\n'
+        return self._run(name, args)
+
+    def _run(self, name, args):
+        lists = self.server.lists
+        if name == 'PING':
+            return b'+PONG\r\n'
+        if name == 'SELECT':
+            self.db = int(args[0])
+            return b'+OK\r\n'
+        key = (self.db, args[0])
+        if name == 'RPUSH':
+            lists.setdefault(key, []).extend(args[1:])
+            return b':%d\r\n' % len(lists[key])
+        if name == 'LRANGE':
+            items = lists.get(key, [])
+            return b'*%d\r\n' % len(items) + b''.join(b'$%d\r\n%s\r\n' % (len(i), i) for i in items)
+        if name == 'DEL':
+            self.server.expires.pop(key, None)
+            return b':%d\r\n' % (lists.pop(key, None) is not None)
+        if name == 'EXPIRE':
+            self.server.expires[key] = int(args[1])
+            return b':%d\r\n' % (key in lists)
+        return b'-ERR unknown command\r\n'
@@ -0,0 +1,79 @@
+import random
+from datetime import date, timedelta
+
+from achievements import AchievementEngine, load_definitions
+from engine import PomodoroState
+
+
+def linear_unlock(definitions, state, unlocked):
+    """예전 check_achievements 처럼 모든 업적을 매번 훑는 기준 구현 (업적 보상으로 넘은 기준까지 반복)"""
+    newly = []
+    while True:
+        stats = state.metrics()
+        keys = [key for key, ach in definitions.items() if key not in unlocked and (
+            eval(ach['condition'], {'__builtins__': {}}, stats) if 'condition' in ach
+            else stats[ach['metric']] >= ach['threshold'])]
+        if not keys:
+            return newly
+        for key in keys:
+            unlocked.add(key)
+            state.coins += definitions[key]['reward']
+            state.total_coins_earned += definitions[key]['reward']
+            newly.append(key)
+
+
+def test_crossed_finds_thresholds_between_old_and_new():
+    engine = AchievementEngine({
+        'a': {'metric': 'total_minutes', 'threshold': 60, 'reward': 0},
+        'b': {'metric': 'total_minutes', 'threshold': 300, 'reward': 0},
+        'c': {'condition': "total_minutes >= 300", 'reward': 0},
+        'd': {'metric': 'total_sessions', 'threshold': 1, 'reward': 0},
+    })
+    assert engine.crossed('total_minutes', 0, 59) == []
+    assert engine.crossed('total_minutes', 59, 60) == ['a']
+    assert sorted(engine.crossed('total_minutes', 60, 300)) == ['b', 'c']
+    assert engine.crossed('total_minutes', 300, 1000) == []
+    assert engine.crossed('total_minutes', 100, 50) == []
+    assert engine.crossed('best_hour', 0, 10) == []
+    assert sorted(engine.satisfied({'total_minutes': 300})) == ['a', 'b', 'c']
+
+
+def test_reward_cascade_unlocks_coin_achievements_at_once():
+    engine = AchievementEngine({
+        'first': {'metric': 'total_sessions', 'threshold': 1, 'reward': 100},
+        'rich': {'metric': 'total_coins_earned', 'threshold': 100, 'reward': 1},
+    })
+    state = PomodoroState()
+    before = engine.snapshot(state)
+    state.total_sessions = 1
+    unlocked = set()
+    assert [ach['key'] for ach in engine.unlock_crossed(before, state, unlocked)] == ['first', 'rich']
+    assert state.total_coins_earned == state.coins == 101
+
+
+def test_bisect_index_matches_linear_scan():
+    """실제 카탈로그 업적으로 무작위 세션을 진행하며 매 완료마다 선형 탐색 결과와 비교"""
+    definitions = load_definitions()
+    engine = AchievementEngine(definitions)
+    rng = random.Random(7)
+    indexed = PomodoroState(last_date='2026-01-01', sessions_before_long_break=3)
+    linear = PomodoroState.from_mapping(indexed.to_dict())
+    unlocked_indexed, unlocked_linear = set(), set()
+    day = date(2026, 1, 1)
+    owned = set()
+    for _ in range(300):
+        day += timedelta(days=rng.choice((0, 0, 0, 1, 1, 2)))
+        hour = rng.randrange(24)
+        if rng.random() < 0.05:
+            owned = {'double_coin'}
+        duration = rng.choice((1, 5, 25, 50, 90))
+        for state in (indexed, linear):
+            state.roll_over(str(day))
+            state.study_duration = duration
+        before = engine.snapshot(indexed)
+        indexed.complete_study(owned, str(day), hour)
+        linear.complete_study(owned, str(day), hour)
+        newly = {ach['key'] for ach in engine.unlock_crossed(before, indexed, unlocked_indexed)}
+        assert newly == set(linear_unlock(definitions, linear, unlocked_linear))
+        assert indexed.to_dict() == linear.to_dict()
+    assert unlocked_indexed == set(definitions)
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from api import Api, _bearer, user_token
+from catalog import CatalogSource
+from clock import VirtualClock
+
+SECRET = 'test-secret'
+NOW = datetime(2026, 10, 18, 20, 0).timestamp()
+
+
+@pytest.fixture
+def api(store):
+    for user_id in ('u', 'v'):
+        store.create_profile(user_id, coins=20_000, last_date='2026-10-18', remaining_study_seconds=1500,
+                             remaining_break_seconds=300, remaining_long_break_seconds=900)
+    api = Api(store, CatalogSource(), VirtualClock(NOW), SECRET)
+    yield api
+    api.close()
+
+
+def call(api, method, target, body=None, token=None):
+    return asyncio.run(api.dispatch(method, target, body, token))
+
+
+def test_user_routes_require_the_users_token(api, store):
+    assert call(api, 'GET', '/v1/users/u')[0] == 401
+    assert call(api, 'GET', '/v1/users/u', token='nope')[0] == 401
+    # 다른 사용자의 토큰으로는 그 사용자의 코인을 쓸 수 없다
+    status, _ = call(api, 'POST', '/v1/users/u/purchases', {'item': 'golden_font'}, user_token(SECRET, 'v'))
+    assert status == 401
+    assert store.balance('u') == 20_000
+    status, body = call(api, 'POST', '/v1/users/u/purchases', {'item': 'golden_font'}, user_token(SECRET, 'u'))
+    assert status == 200 and body['coins'] == 16_000
+
+
+def test_unknown_users_are_not_revealed_without_a_token(api):
+    assert call(api, 'GET', '/v1/users/nobody')[0] == 401
+    assert call(api, 'GET', '/v1/users/nobody', token=user_token(SECRET, 'nobody'))[0] == 404
+
+
+def test_public_routes_and_batch(api):
+    assert call(api, 'GET', '/healthz')[0] == 200
+    assert call(api, 'GET', '/v1/catalog')[0] == 200
+    body = {'requests': [{'path': '/v1/users/u'}, {'path': '/v1/users/v'}]}
+    status, payload = call(api, 'POST', '/v1/batch', body, user_token(SECRET, 'u'))
+    assert status == 200
+    assert [r['status'] for r in payload['responses']] == [200, 401]
+
+
+def test_secret_is_required(store):
+    with pytest.raises(ValueError):
+        Api(store, CatalogSource(), VirtualClock(NOW), None)
+
+
+def test_bearer_header():
+    assert _bearer({'authorization': 'Bearer abc'}) == 'abc'
+    assert _bearer({'authorization': 'Basic abc'}) is None
+    assert _bearer({}) is None
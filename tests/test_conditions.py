@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from conditions import ConditionError, compile_condition, compile_vector, names, threshold
+from engine import PomodoroState
+
+
+@pytest.mark.parametrize('expr', [
+    "__import__('os').system('true')",          # 호출
+    "total_sessions.__class__",                 # 속성
+    "[total_sessions]",                         # 리스트
+    "total_sessions if total_minutes else 0",   # 조건식
+    "(lambda: 1)()",                            # 람다
+    "total_sessions[0]",                        # 인덱싱
+    "total_sessions >= None",                   # None 상수
+    "total_sessions ** 1000",                   # 거듭제곱
+    "total_sessions in (1, 2)",                 # in / 튜플
+    "total_sessions >= 1; 1",                   # 문법 오류
+])
+def test_rejects_non_whitelisted_nodes(expr):
+    with pytest.raises(ConditionError):
+        compile_condition(expr)
+
+
+def test_rejects_unknown_names():
+    with pytest.raises(ConditionError, match="unknown name 'open'"):
+        compile_condition("open >= 1")
+
+
+def test_condition_error_is_a_value_error():
+    """카탈로그 로더는 ValueError 로 잘못된 조건을 알린다"""
+    assert issubclass(ConditionError, ValueError)
+
+
+def test_compiled_condition_reads_state_attributes():
+    predicate = compile_condition("total_sessions >= 5 and avg_session_minutes >= 45")
+    assert predicate(PomodoroState(total_sessions=5, total_minutes=250))
+    assert not predicate(PomodoroState(total_sessions=5, total_minutes=200))
+    assert not predicate(PomodoroState(total_sessions=4, total_minutes=400))
+    assert names("total_sessions >= 10 and 0 <= best_hour < 9") == {'total_sessions', 'best_hour'}
+
+
+def test_threshold_only_for_metric_at_least_constant():
+    assert threshold("total_minutes >= 600") == ('total_minutes', 600)
+    assert threshold("total_minutes > 600") is None
+    assert threshold("600 <= total_minutes") is None
+    assert threshold("total_minutes >= 600 and today_sessions >= 1") is None
+
+
+def test_vector_condition_matches_scalar():
+    expr = "not today_sessions or (total_sessions >= 10 and 0 <= best_hour < 9)"
+    rows = [(0, 0, -1), (3, 12, 8), (3, 12, 9), (1, 9, 3), (2, 20, -1)]
+    columns = {name: np.array(values) for name, values in
+               zip(('today_sessions', 'total_sessions', 'best_hour'), zip(*rows))}
+    scalar = compile_condition(expr)
+    expected = [bool(scalar(PomodoroState(today_sessions=t, total_sessions=n, best_hour=h))) for t, n, h in rows]
+    assert compile_vector(expr)(columns).tolist() == expected == [True, True, False, False, False]
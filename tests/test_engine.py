@@ -0,0 +1,67 @@
+from engine import REWARD_PER_MINUTE, PomodoroState, study_reward
+
+
+def run_session(state, now, owned=()):
+    """시작 → 마감까지 기다렸다 완료. (완료 결과, 마감 시각) 반환"""
+    state.start(now)
+    deadline = state.timer_deadline
+    assert not state.is_due(deadline - 1) and state.is_due(deadline)
+    return state.complete(owned), deadline
+
+
+def test_cycle_alternates_and_ends_with_long_break():
+    state = PomodoroState(last_date='2026-10-18', sessions_before_long_break=3)
+    now = 0.0
+    kinds = []
+    for _ in range(3):
+        assert state.next_session_type() == ('long_break' if state.current_cycle_count == 2 else 'short_break')
+        result, now = run_session(state, now)
+        assert not state.is_study
+        kinds.append((result.cycle_completed, state.is_long_break))
+        was_long, now = run_session(state, now)
+        assert state.is_study and was_long == kinds[-1][1]
+    assert kinds == [(False, False), (False, False), (True, True)]
+    assert (state.current_cycle_count, state.completed_cycles) == (0, 1)
+    # 공부 25분 x 3 + 짧은 휴식 5분 x 2 + 긴 휴식 15분
+    assert now == (3 * 25 + 2 * 5 + 15) * 60
+
+
+def test_study_reward_and_totals():
+    state = PomodoroState(last_date='2026-10-18', study_duration=30)
+    result, _ = run_session(state, 0.0)
+    assert (result.duration, result.reward, result.is_double) == (30, 30 * REWARD_PER_MINUTE, False)
+    assert state.coins == state.total_coins_earned == 30 * REWARD_PER_MINUTE
+    assert (state.total_sessions, state.total_minutes, state.today_sessions, state.today_minutes) == (1, 30, 1, 30)
+
+
+def test_double_coin_doubles_the_reward():
+    assert study_reward(25, {'double_coin'}) == (2 * 25 * REWARD_PER_MINUTE, True)
+    state = PomodoroState(last_date='2026-10-18')
+    result, _ = run_session(state, 0.0, {'double_coin'})
+    assert result.is_double and result.reward == 2 * 25 * REWARD_PER_MINUTE
+    assert state.coins == result.reward
+
+
+def test_cycle_mode_off_never_takes_a_long_break():
+    state = PomodoroState(last_date='2026-10-18', cycle_mode=False, sessions_before_long_break=1)
+    assert state.next_session_type() == 'short_break'
+
+
+def test_stop_keeps_remaining_time():
+    state = PomodoroState()
+    state.start(100.0)
+    state.stop(100.0 + 60.4)
+    assert not state.is_running and state.timer_deadline is None
+    assert state.remaining(0) == state.remaining_study_seconds == 25 * 60 - 60
+    state.start(200.0)
+    assert state.timer_deadline == 200.0 + 24 * 60
+
+
+def test_roll_over_resets_today_and_broken_streak():
+    state = PomodoroState(last_date='2026-10-16', last_study_date='2026-10-16', current_streak=3,
+                          today_sessions=2, today_minutes=50)
+    assert state.roll_over('2026-10-18')
+    assert (state.today_sessions, state.today_minutes, state.current_streak) == (0, 0, 0)
+    assert not state.roll_over('2026-10-18')
+    state.credit_study(25, day='2026-10-18', hour=9)
+    assert (state.current_streak, state.last_study_date, state.best_hour) == (1, '2026-10-18', 9)
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from clock import VirtualClock
+from leaderboard import SYNC_OVERLAP, Leaderboard
+from storage import open_storage
+
+DAY = '2026-10-18'
+
+
+def study(store, user_id, minutes):
+    store.record_completion(user_id, {'total_minutes': minutes, 'completed_cycles': 1}, {},
+                            {'day': DAY, 'time': '10:00', 'duration': minutes, 'type': 'study', 'at': 0},
+                            [], [])
+
+
+def test_sync_picks_up_writes_from_elsewhere(store, tmp_path):
+    """다른 복제본(같은 DB 를 여는 다른 저장소)의 완료도 sync 에서 반영된다. 조회는 저장소를 읽지 않는다."""
+    store.create_profile('u')
+    study(store, 'u', 25)
+    board = Leaderboard.from_store(store, DAY)
+    assert board.top('today', today=DAY) == [(1, 'u', 25)]
+
+    other = open_storage(str(tmp_path / 'study.db'))
+    other.create_profile('v')
+    study(other, 'v', 50)
+    assert board.rank('today', 'v', today=DAY) == (None, 0, 1)
+    assert board.sync(DAY) >= 1
+    assert board.top('today', today=DAY) == [(1, 'v', 50), (2, 'u', 25)]
+    assert board.rank('all', 'u', today=DAY) == (2, 25, 2)
+    assert board.rank('cycles', 'v', today=DAY) == (1, 1, 2)
+
+
+def test_sync_reads_only_changed_users(tmp_path):
+    clock = VirtualClock(datetime(2026, 10, 18, 9, 0).timestamp())
+    store = open_storage(str(tmp_path / 'study.db'), clock=clock)
+    for user_id in ('u', 'v'):
+        store.create_profile(user_id)
+        study(store, user_id, 25)
+    board = Leaderboard.from_store(store, DAY)
+    assert board.sync(DAY) == 2         # 시작 때 읽은 마지막 변경에서 SYNC_OVERLAP 안쪽은 다시 읽는다
+    clock.advance(SYNC_OVERLAP + 1)
+    study(store, 'v', 25)
+    board.sync(DAY)
+    clock.advance(SYNC_OVERLAP + 1)
+    study(store, 'v', 25)
+    assert board.sync(DAY) == 1
+    assert board.top('today', today=DAY) == [(1, 'v', 75), (2, 'u', 25)]
+
+
+def test_sync_sets_scores_from_storage(store):
+    """record() 와 sync 가 엇갈려도 sync 는 저장소 값으로 덮어쓰므로 두 번 세거나 잃어버리지 않는다"""
+    store.create_profile('u')
+    board = Leaderboard.from_store(store, DAY)
+    board.record('u', DAY, 25, 1)       # 저장소에 쓰기 전에 먼저 반영된 것처럼
+    board.sync(DAY)
+    assert board.rank('all', 'u', today=DAY) == (None, 0, 0)
+    study(store, 'u', 25)
+    board.record('u', DAY, 25, 1)
+    board.sync(DAY)
+    board.sync(DAY)
+    assert board.rank('week', 'u', today=DAY) == (1, 25, 1)
+    assert board.rank('cycles', 'u', today=DAY) == (1, 1, 1)
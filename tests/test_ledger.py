@@ -0,0 +1,53 @@
+from clock import VirtualClock
+from storage import open_storage
+
+STUDY = (100, 'study', None, 'study:1')
+FIRST = (50, 'achievement', 'first_study', 'achievement:first_study')
+
+
+def test_duplicate_achievement_entry_is_dropped(store):
+    """다른 경로에서 이미 받은 업적 보상이 섞여 와도 완료 전체가 실패하지 않는다"""
+    store.create_profile('u')
+    assert store.record_completion('u', {'total_coins_earned': 150}, {}, None, [STUDY, FIRST], ['first_study'])
+    assert store.record_completion('u', {'total_coins_earned': 150}, {}, None,
+                                   [(100, 'study', None, 'study:2'), FIRST], ['first_study'])
+    profile = store.load_profile('u')
+    assert profile['coins'] == profile['total_coins_earned'] == 250
+    assert store.verify_balance('u')
+
+
+def test_same_batch_is_applied_once(store):
+    store.create_profile('u')
+    assert store.record_completion('u', {'total_coins_earned': 150}, {}, None, [STUDY, FIRST], ['first_study'])
+    assert not store.record_completion('u', {'total_coins_earned': 150}, {}, None, [STUDY, FIRST], ['first_study'])
+    assert store.load_profile('u')['coins'] == 150
+
+
+def test_room_completion_skips_only_duplicate_rows(store):
+    for user_id in ('u', 'v'):
+        store.create_profile(user_id)
+    store.record_completion('u', {}, {}, None, [FIRST], ['first_study'])
+    session = {'time': '10:00', 'duration': 25, 'type': 'study', 'at': 0}
+    credits = [(user_id, [(10, 'study', 'r', 'room:r:1'), FIRST]) for user_id in ('u', 'v')]
+    assert store.record_room_completion('2026-10-18', session, credits) == ['u', 'v']
+    assert store.load_profile('u')['coins'] == 60
+    assert store.load_profile('v')['coins'] == 60
+    assert store.load_profile('u')['total_coins_earned'] == 10
+    assert store.record_room_completion('2026-10-18', session, credits) == []
+
+
+def test_profile_version_changes_on_every_write_in_the_same_second(tmp_path):
+    """같은 초의 구매 두 번, 구매 + 세션 보상도 버전이 달라 다른 세션이 다시 읽는다"""
+    store = open_storage(str(tmp_path / 'study.db'), clock=VirtualClock(1_800_000_000))
+    store.create_profile('u', coins=10_000)
+    versions = [store.profile_version('u')]
+    assert store.purchase('u', 'retro_alarm', 3000)
+    versions.append(store.profile_version('u'))
+    assert store.purchase('u', 'golden_font', 4000)
+    versions.append(store.profile_version('u'))
+    assert store.record_completion('u', {'total_coins_earned': 100}, {}, None, [STUDY], [])
+    versions.append(store.profile_version('u'))
+    store.record_room_completion('2026-10-18', {'time': '10:00', 'duration': 25, 'type': 'study', 'at': 0},
+                                 [('u', [(10, 'study', 'r', 'room:r:1')])])
+    versions.append(store.profile_version('u'))
+    assert versions == sorted(set(versions))
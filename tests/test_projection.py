@@ -0,0 +1,123 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import projection
+import service
+from achievements import AchievementEngine
+from analytics import best_hour
+from catalog import load_catalog
+from clock import VirtualClock
+from engine import PomodoroState, study_reward
+from storage import open_storage
+
+# 첫 세션 보상(1000) + first(10) 으로 rich 가, rich 보상으로 다시 richer 가 열린다 (연쇄 달성)
+DEFINITIONS = {
+    'first': {'name': "첫 공부", 'metric': 'total_sessions', 'threshold': 1, 'reward': 10},
+    'rich': {'name': "부자", 'metric': 'total_coins_earned', 'threshold': study_reward(25)[0] + 10, 'reward': 5},
+    'richer': {'name': "더 부자", 'metric': 'total_coins_earned', 'threshold': study_reward(25)[0] + 15,
+               'reward': 1},
+    'streak3': {'name': "3일 연속", 'metric': 'current_streak', 'threshold': 3, 'reward': 20},
+    'early': {'name': "아침형", 'condition': "total_sessions >= 2 and 0 <= best_hour < 9", 'reward': 7},
+    'night': {'name': "저녁형", 'condition': "total_sessions >= 8 and best_hour >= 20", 'reward': 9},
+}
+
+# (날짜, 시각) 공부 세션. 10-04 를 건너뛰어 연속 공부일이 끊기고, 최다 시간대가 8시 → 21시로 바뀐다
+SESSIONS = [('2026-10-01', '08:00'), ('2026-10-01', '08:30'), ('2026-10-02', '21:00'),
+            ('2026-10-03', '21:00'), ('2026-10-03', '21:30')] + [
+    (f"2026-10-{day:02d}", time) for day in range(5, 12) for time in ('21:00', '22:00')]
+
+
+@pytest.fixture
+def projector():
+    return projection.Projector(DEFINITIONS, projection.reward_items(load_catalog()))
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    """기록 시각(이벤트, 구매)도 세션과 같은 가상 시계를 따르는 저장소"""
+    return open_storage(str(tmp_path / 'study.db'), clock=clock)
+
+
+def play(store, clock, sessions, state=None):
+    """앱과 같은 경로(service.complete_session)로 공부 → 휴식을 완료하고, 살 수 있게 되면 double_coin 구매"""
+    engine = AchievementEngine(DEFINITIONS)
+    profile = store.load_profile('u')
+    state = state or PomodoroState.from_mapping(profile)
+    owned, unlocked = profile['owned_items'], profile['unlocked_achievements']
+    for day, time in sessions:
+        clock.set(datetime.fromisoformat(f"{day} {time}").timestamp())
+        assert service.complete_session(store, engine, 'u', state, owned, unlocked, clock=clock)
+        service.complete_session(store, engine, 'u', state, owned, unlocked, clock=clock)
+        if 'double_coin' not in owned and store.balance('u') >= 15000:
+            assert store.purchase('u', 'double_coin', 15000)
+            owned.add('double_coin')
+    return state
+
+
+def assert_matches(profile, state):
+    for name in ('total_sessions', 'total_minutes', 'total_coins_earned', 'completed_cycles',
+                 'current_streak', 'longest_streak', 'last_study_date'):
+        assert state[name] == profile[name], name
+    assert state['hour_sessions'] == profile['hour_sessions']
+    assert best_hour(state['hour_sessions']) == profile['best_hour']
+    assert set(state['unlocked']) == set(profile['unlocked_achievements'])
+
+
+@pytest.fixture
+def played(store, clock):
+    store.create_profile('u', last_date='2026-10-01')
+    play(store, clock, SESSIONS)
+    return store
+
+
+def test_run_matches_incremental_rules(played, projector):
+    profile = played.load_profile('u')
+    assert {'first', 'rich', 'richer', 'streak3', 'early', 'night'} <= profile['unlocked_achievements']
+    assert 'double_coin' in profile['owned_items']
+    result, daily = projector.run(['u'], played.load_events(['u']))
+    assert_matches(profile, result['u'])
+    assert result['u']['owned'] == ['double_coin']
+    assert [(day, sessions) for _, day, sessions, _ in daily] == [
+        ('2026-10-01', 2), ('2026-10-02', 1), ('2026-10-03', 2)] + [
+        (f"2026-10-{day:02d}", 2) for day in range(5, 12)]
+
+
+def test_cascading_unlocks_happen_on_the_same_session(played, projector):
+    rows = played.load_events(['u'])
+    result, _ = projector.run(['u'], rows)
+    unlocked = result['u']['unlocked']
+    first_at = rows[0][3]
+    assert unlocked['first'] == unlocked['rich'] == unlocked['richer'] == first_at
+    assert unlocked['early'] == rows[1][3]
+
+
+def test_resume_from_snapshot_equals_full_run(played, projector):
+    rows = played.load_events(['u'])
+    full, full_daily = projector.run(['u'], rows)
+    # 같은 날 중간(10-03 첫 세션 뒤), 연속 공부일이 끊기기 직전, double_coin 구매 직후 등 여러 지점에서 끊어 본다
+    for cut in range(1, len(rows)):
+        head, _ = projector.run(['u'], rows[:cut])
+        snapshot = json.loads(json.dumps(head['u']))
+        tail, tail_daily = projector.run(['u'], rows[cut:], {'u': snapshot})
+        assert tail['u'] == full['u'], cut
+        assert tail_daily == [row for row in full_daily if row[1] >= tail_daily[0][1]], cut
+
+
+def test_rebuild_resumes_from_snapshot(played, clock, projector, monkeypatch):
+    monkeypatch.setattr(projection, 'SNAPSHOT_EVERY', 1)
+    assert projection.rebuild(played, projector, full=True, apply=False)['changed'] == 0
+    assert projection.rebuild(played, projector, full=True)['from_start'] == 1
+    profile = played.load_profile('u')
+    play(played, clock, [('2026-10-12', '21:00'), ('2026-10-13', '07:00')], PomodoroState.from_mapping(profile))
+    summary = projection.rebuild(played, projector)
+    assert (summary['from_start'], summary['events']) == (0, 2)
+    result, _ = projector.run(['u'], played.load_events(['u']))
+    assert_matches(played.load_profile('u'), result['u'])
+    assert projection.rebuild(played, projector, full=True, apply=False)['changed'] == 0
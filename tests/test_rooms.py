@@ -0,0 +1,64 @@
+import pytest
+
+from catalog import load_catalog
+from clock import VirtualClock
+from rooms import RoomHub
+from storage import open_storage
+
+START = 1_800_000_000
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(START)
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    """입장 시각도 허브와 같은 가상 시계를 따르는 저장소"""
+    store = open_storage(str(tmp_path / 'study.db'), clock=clock)
+    for user_id in ('owner', 'early', 'late'):
+        store.create_profile(user_id, last_date='2026-01-01')
+    return store
+
+
+def make_hub(store, clock, credited=None):
+    engine = load_catalog().engine
+    on_complete = None if credited is None else (lambda user_ids, day, minutes: credited.append(sorted(user_ids)))
+    return RoomHub(store, lambda: engine, clock=clock.time, on_complete=on_complete)
+
+
+def test_missed_study_phases_are_credited_after_restart(store, clock):
+    hub = make_hub(store, clock)
+    room_id = hub.create_room("room", study_duration=1, break_duration=1, owner='owner')
+    hub.tick()
+    # 허브가 멈춘 사이 공부 구간 0, 2 가 끝났다 (1, 3 은 휴식)
+    clock.advance(4 * 60 + 30)
+    credited = []
+    restarted = make_hub(store, clock, credited)
+    assert restarted.tick() == 2
+    assert credited == [['owner'], ['owner']]
+    assert store.load_profile('owner')['total_sessions'] == 2
+    assert [row['credited_phase'] for row in store.load_rooms() if row['room_id'] == room_id] == [2]
+    # 다시 시작해도 같은 구간을 또 보상하지 않는다
+    assert make_hub(store, clock).tick() == 0
+    assert store.load_profile('owner')['total_sessions'] == 2
+
+
+def test_member_joining_after_phase_start_is_not_credited(store, clock):
+    hub = make_hub(store, clock)
+    room_id = hub.create_room("room", study_duration=25, owner='owner')
+    hub.join(room_id, 'early')
+    hub.tick()
+    clock.advance(25 * 60 - 1)
+    hub.join(room_id, 'late')
+    hub.tick()
+    clock.advance(2)
+    assert hub.tick() == 1
+    assert store.load_profile('owner')['total_minutes'] == 25
+    assert store.load_profile('early')['total_minutes'] == 25
+    assert store.load_profile('late')['total_minutes'] == 0
+    # 다음 공부 구간부터는 받는다
+    clock.advance(5 * 60 + 25 * 60)
+    assert hub.tick() == 1
+    assert store.load_profile('late')['total_minutes'] == 25
@@ -0,0 +1,75 @@
+from scheduler import DeadlineScheduler, TimerWheel
+
+
+def keys(due):
+    return [key for key, _, _ in due]
+
+
+def test_fires_only_after_deadline():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule('a', 2.5, None)
+    wheel.schedule('b', 3.0, None)
+    assert len(wheel) == 2
+    assert keys(wheel.advance(2.4)) == []
+    assert keys(wheel.advance(2.9)) == []
+    assert keys(wheel.advance(3.0)) == ['a', 'b']
+    assert len(wheel) == 0
+    assert keys(wheel.advance(10.0)) == []
+
+
+def test_cancel_and_reschedule():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule('a', 2.0, None)
+    assert wheel.cancel('a')
+    assert not wheel.cancel('a')
+    assert keys(wheel.advance(5.0)) == []
+    # 같은 키로 다시 등록하면 이전 마감은 대체된다
+    wheel.schedule('b', 6.0, None)
+    wheel.schedule('b', 9.0, None)
+    assert len(wheel) == 1
+    assert keys(wheel.advance(8.0)) == []
+    assert [(key, deadline) for key, deadline, _ in wheel.advance(9.0)] == [('b', 9.0)]
+
+
+def test_deadline_beyond_one_rotation_waits_for_its_turn():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule('far', 20.0, None)     # 같은 슬롯을 두 바퀴 지나친 뒤
+    for now in range(1, 20):
+        assert keys(wheel.advance(float(now))) == [], now
+    assert keys(wheel.advance(20.0)) == ['far']
+
+
+def test_late_advance_fires_everything_that_drifted_past():
+    """처리가 밀려 휠 여러 바퀴를 한 번에 건너뛰어도 지난 마감은 모두, 한 번씩 실행"""
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    for i in range(1, 30):
+        wheel.schedule(i, float(i), None)
+    wheel.schedule('later', 100.0, None)
+    assert sorted(keys(wheel.advance(50.0))) == list(range(1, 30))
+    assert keys(wheel.advance(99.0)) == []
+    assert keys(wheel.advance(100.0)) == ['later']
+
+
+def test_past_deadline_fires_on_next_tick():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    wheel.advance(10.0)
+    wheel.schedule('past', 3.0, None)
+    assert keys(wheel.advance(11.0)) == ['past']
+
+
+def test_scheduler_runs_due_callbacks_and_survives_failures():
+    now = [1000.0]
+    scheduler = DeadlineScheduler(tick=1.0, slots=16, clock=lambda: now[0])
+    fired = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.schedule('ok', 1001.0, lambda: fired.append('ok'))
+    scheduler.schedule('bad', 1001.0, fail)
+    scheduler.schedule('cancelled', 1001.0, lambda: fired.append('cancelled'))
+    assert scheduler.cancel('cancelled')
+    assert scheduler.run_due() == 0
+    now[0] = 1001.0
+    assert scheduler.run_due() == 2
+    assert fired == ['ok'] and scheduler.pending() == 0
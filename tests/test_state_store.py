@@ -0,0 +1,144 @@
+import pytest
+
+import state_store
+from state_store import FIELDS, MemoryBackend, RedisBackend, RespError, StateStore, decode, diff, encode
+
+from resp_server import RespServer
+
+# FIELDS 의 모든 필드에 대한 대표 값 (앱의 세션 상태와 같은 타입)
+SAMPLE = {
+    'coins': 12_345,
+    'is_running': True,
+    'is_study': False,
+    'is_long_break': False,
+    'owned_items': {'dark_mode', 'double_coin', '황금 글꼴'},
+    'active_theme': 'dark_mode',
+    'study_duration': 25,
+    'break_duration': 5,
+    'long_break_duration': 15,
+    'sessions_before_long_break': 4,
+    'current_cycle_count': 3,
+    'completed_cycles': 120,
+    'total_sessions': 2_000_000,
+    'total_minutes': 50_000_000,
+    'total_coins_earned': 2 ** 40,
+    'today_sessions': 0,
+    'today_minutes': -1,
+    'last_date': '2026-10-18',
+    'unlocked_achievements': {'first_study', 'one_hour'},
+    'cycle_mode': True,
+    'timer_deadline': 1792349371.7222133,
+    'notices': [('success', '완료!'), ('balloons', None)],
+    'remaining_study_seconds': 1500,
+    'remaining_break_seconds': None,
+    'remaining_long_break_seconds': 900,
+    'current_streak': 7,
+    'longest_streak': 30,
+    'last_study_date': None,
+    'hour_sessions': [0] * 23 + [5],
+    'best_hour': 23,
+    'profile_version': 1792349000.5,
+}
+
+
+def test_sample_covers_every_field():
+    assert set(SAMPLE) == set(FIELDS)
+
+
+def test_encode_decode_round_trip():
+    assert decode(encode(SAMPLE)) == SAMPLE
+
+
+def test_encode_decode_empty_and_edge_values():
+    values = {'owned_items': set(), 'notices': [], 'coins': -(2 ** 63), 'active_theme': '', 'best_hour': 0}
+    assert decode(encode(values)) == values
+
+
+def test_unknown_keys_are_ignored_and_unknown_version_rejected():
+    assert decode(encode({'coins': 1, 'not_a_field': 2})) == {'coins': 1}
+    with pytest.raises(ValueError):
+        decode(b'\x02\x00')
+
+
+def test_diff_and_apply_over_every_field():
+    previous = dict(SAMPLE)
+    changed = {
+        'coins': 0, 'owned_items': SAMPLE['owned_items'] | {'retro_alarm'},
+        'unlocked_achievements': set(), 'notices': [], 'hour_sessions': [1] * 24, 'timer_deadline': None,
+    }
+    values = {**SAMPLE, **changed}
+    assert diff(values, previous) == changed
+    assert decode(encode(diff(values, previous)), dict(previous)) == values
+    assert diff(values, values) == {}
+
+
+@pytest.fixture
+def redis():
+    with RespServer() as server:
+        yield server
+
+
+def backends(server):
+    return [MemoryBackend(), RedisBackend('127.0.0.1', server.port, ttl=60)]
+
+
+def test_store_round_trip_with_diffs_and_compaction(redis):
+    for backend in backends(redis):
+        store = StateStore(backend, compact_after=3)
+        assert store.load('u') is None
+        store.save('u', SAMPLE)
+        assert store.load('u') == SAMPLE
+        previous = SAMPLE
+        for coins in range(5):
+            values = {**previous, 'coins': coins, 'owned_items': previous['owned_items'] | {f'item{coins}'}}
+            store.save('u', values, previous)
+            assert store.load('u') == values
+            previous = values
+        assert len(backend.fetch('state:u')) <= 3
+        assert store.save('u', previous, previous) == 0
+        store.delete('u')
+        assert store.load('u') is None
+
+
+def test_redis_sets_ttl_and_selects_db():
+    with RespServer(password='secret') as server:
+        store = state_store.open_state_store(f'redis://:secret@127.0.0.1:{server.port}/2?ttl=30')
+        store.save('u', {'coins': 1})
+        assert server.lists == {(2, b'state:u'): [encode({'coins': 1})]}
+        assert server.expires == {(2, b'state:u'): 30}
+
+
+def test_redis_error_reply_is_raised():
+    with RespServer(password='secret') as server:
+        with pytest.raises(RespError):
+            RedisBackend('127.0.0.1', server.port).fetch('k')
+
+
+def test_redis_reconnects_after_server_closed_idle_connection(redis):
+    backend = RedisBackend('127.0.0.1', redis.port)
+    assert backend.append('k', b'a') == 1
+    redis.close_clients()
+    assert backend.append('k', b'b') == 2
+    assert redis.lists[(0, b'k')] == [b'a', b'b']
+    assert redis.connections == 2
+
+
+def test_redis_append_is_not_retried_after_write(redis):
+    """RPUSH 를 보낸 뒤 연결이 끊기면 다시 보내지 않는다 (diff 가 두 번 붙지 않게)"""
+    backend = RedisBackend('127.0.0.1', redis.port)
+    backend.fetch('k')
+    redis.drop_after_next = 'RPUSH'
+    with pytest.raises(OSError):
+        backend.append('k', b'diff')
+    assert redis.lists[(0, b'k')] == [b'diff']
+    assert backend.append('k', b'next') == 2
+
+
+def test_redis_idempotent_commands_are_retried(redis):
+    backend = RedisBackend('127.0.0.1', redis.port)
+    backend.replace('k', b'full')
+    redis.drop_after_next = 'LRANGE'
+    assert backend.fetch('k') == [b'full']
+    redis.drop_after_next = 'EXEC'
+    backend.replace('k', b'again')
+    assert redis.lists[(0, b'k')] == [b'again']
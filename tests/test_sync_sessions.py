@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+import service
+from achievements import AchievementEngine
+from clock import VirtualClock
+from storage import open_storage
+
+NOW = datetime(2026, 10, 18, 20, 0).timestamp()
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(NOW)
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = open_storage(str(tmp_path / 'study.db'), clock=clock)
+    store.create_profile('u', last_date='2026-10-18')
+    return store
+
+
+def sync(store, clock, *sessions):
+    return service.sync_sessions(store, AchievementEngine({}), 'u', [
+        {'id': sid, 'end': end, 'duration': duration} for sid, end, duration in sessions], clock=clock)
+
+
+def test_back_to_back_sessions_are_accepted(store, clock):
+    result = sync(store, clock, ('a', NOW - 3000, 25), ('b', NOW - 1500, 25), ('c', NOW, 25))
+    assert (result['applied'], result['rejected']) == (3, 0)
+
+
+def test_overlapping_sessions_are_rejected(store, clock):
+    result = sync(store, clock, ('a', NOW - 600, 25), ('b', NOW, 25))
+    assert (result['applied'], result['rejected']) == (1, 1)
+    # 이미 기록된 세션과 겹치는 것도 (다른 id 로 다시 보내도) 거절
+    result = sync(store, clock, ('c', NOW - 900, 10))
+    assert (result['applied'], result['rejected']) == (0, 1)
+    assert store.load_profile('u')['total_sessions'] == 1
+
+
+def test_running_study_timer_blocks_overlapping_sessions(store, clock):
+    store.save_profile('u', is_running=True, is_study=True, study_duration=25, timer_deadline=NOW + 600)
+    assert sync(store, clock, ('a', NOW, 25))['rejected'] == 1
+    assert sync(store, clock, ('b', NOW - 900 - 60, 10))['applied'] == 1
+
+
+def test_minutes_per_day_capped_at_elapsed_time(store, clock):
+    # 2시까지 120분이 지났으므로 24시간짜리 세션이나 합계가 넘는 세션은 받지 않는다
+    clock.set(datetime(2026, 10, 18, 2, 0).timestamp())
+    now = clock.time()
+    assert sync(store, clock, ('a', now, 1440))['rejected'] == 1
+    result = sync(store, clock, *[(f"s{i}", now - i * 50 * 60, 50) for i in range(3)])
+    assert (result['applied'], result['rejected']) == (2, 1)
+
+
+def test_widget_minutes_per_day_capped(store, clock):
+    """위젯 세션은 하루 CLIENT_DAILY_MINUTES 까지만 (나눠 보내도 합쳐서 센다)"""
+    hour = service.CLIENT_DAILY_MINUTES // 4
+    result = sync(store, clock, *[(f"s{i}", NOW - i * hour * 60, hour) for i in range(3)])
+    assert (result['applied'], result['rejected']) == (3, 0)
+    result = sync(store, clock, *[(f"t{i}", NOW - (i + 3) * hour * 60, hour) for i in range(2)])
+    assert (result['applied'], result['rejected']) == (1, 1)
+    # 다른 날은 따로 센다
+    assert sync(store, clock, ('y', NOW - 86400, hour))['applied'] == 1
+
+
+def test_stale_and_duplicate_sessions(store, clock):
+    assert sync(store, clock, ('old', NOW - service.SYNC_WINDOW - 60, 25))['rejected'] == 1
+    assert sync(store, clock, ('a', NOW, 25))['applied'] == 1
+    result = sync(store, clock, ('a', NOW, 25))
+    assert (result['applied'], result['duplicates'], result['rejected']) == (0, 1, 0)
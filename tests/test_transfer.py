@@ -0,0 +1,74 @@
+import io
+
+import pandas as pd
+
+import service
+from achievements import AchievementEngine
+from session_log import SessionLog
+from transfer import clean_sessions, export_history, import_history
+
+SESSIONS = [
+    {'day': '2026-10-01', 'time': '09:00', 'duration': 25, 'type': 'study'},
+    {'day': '2026-10-01', 'time': '09:25', 'duration': 5, 'type': 'short_break'},
+    {'day': '2026-10-02', 'time': '21:10', 'duration': 50, 'type': 'study'},
+    {'day': '2026-10-02', 'time': '22:00', 'duration': 15, 'type': 'long_break'},
+]
+
+
+def test_export_import_round_trip(store):
+    store.create_profile('a')
+    store.create_profile('b')
+    for session in SESSIONS:
+        assert store.record_completion('a', {}, {}, session, [], [])
+    exported = export_history(store, 'a', 'sessions', 'csv')
+
+    result = import_history(store, AchievementEngine({}), 'b', io.BytesIO(exported.read()), 'a.csv',
+                            today='2026-10-18')
+    assert result['imported'] == len(SESSIONS) and result['invalid'] == 0
+    entries = store.load_session_log('b')
+    assert list(SessionLog.from_entries(entries)) == store.load_session_log('a')
+    assert store.load_profile('b')['total_minutes'] == 75
+
+
+def test_other_app_break_names_map_to_session_log_types():
+    df = pd.DataFrame({'day': ['2026-10-01'] * 3, 'time': ['09:00', '09:25', '10:00'],
+                       'duration': ['25', '5', '15'], 'type': ['Focus', 'break', 'LONG']})
+    cleaned, invalid = clean_sessions(df, today='2026-10-18')
+    assert invalid == 0
+    assert list(cleaned['type']) == ['study', 'short_break', 'long_break']
+    SessionLog.from_entries(cleaned.to_dict('records'))
+
+
+def csv_file(rows):
+    return io.BytesIO(pd.DataFrame(rows, columns=['day', 'time', 'duration', 'type']).to_csv(index=False).encode())
+
+
+NOW = pd.Timestamp('2026-10-18 20:00').timestamp()
+TEN_HOURS = {'ten_hours': {'name': "10시간", 'metric': 'total_minutes', 'threshold': 600, 'reward': 5000}}
+
+
+def test_made_up_history_is_capped_per_day(store):
+    """하루에 몰아 넣은 기록은 상한까지만 받아서 업적 보상을 만들어 낼 수 없다"""
+    store.create_profile('u')
+    rows = [('2026-10-10', f"{hour:02d}:00", 60, 'study') for hour in range(1, 24)]
+    result = import_history(store, AchievementEngine(TEN_HOURS), 'u', csv_file(rows), 'fake.csv',
+                            today='2026-10-18', now=NOW)
+    assert result['imported'] == service.CLIENT_DAILY_MINUTES // 60
+    assert result['rejected'] == len(rows) - result['imported']
+    assert result['achievements'] == []
+    assert store.load_profile('u')['total_minutes'] == service.CLIENT_DAILY_MINUTES
+
+
+def test_imported_rows_must_not_overlap_recorded_sessions(store):
+    store.create_profile('u')
+    assert store.record_completion('u', {}, {}, SESSIONS[0], [], [])      # 10-01 08:35 ~ 09:00
+    rows = [('2026-10-01', '09:10', 25, 'study'),       # 08:45 부터 → 겹침
+            ('2026-10-01', '09:30', 25, 'study'),       # 09:05 부터 → 받음
+            ('2026-10-01', '09:40', 25, 'study'),       # 방금 받은 것과 겹침
+            ('2026-10-01', '09:40', 5, 'short_break'),  # 휴식은 보지 않음
+            ('2026-10-18', '23:00', 25, 'study')]       # 아직 오지 않은 시각
+    result = import_history(store, AchievementEngine({}), 'u', csv_file(rows), 'other.csv',
+                            today='2026-10-18', now=NOW)
+    assert (result['imported'], result['rejected'], result['duplicates']) == (2, 3, 0)
+    assert [(e['time'], e['type']) for e in store.load_session_log('u')] == [
+        ('09:00', 'study'), ('09:30', 'study'), ('09:40', 'short_break')]
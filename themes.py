@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+
+# =====================================================
+# 테마 스타일시트
+# =====================================================
+# data/themes/<key>.css 파일 하나가 테마 하나다. 맨 앞 주석에 상점 정보를 적는다.
+#
+#     /*
+#     name: ☁️ 스카이 테마
+#     price: 10000
+#     effect: 시원한 파란색 계열 테마를 적용합니다.
+#     */
+#     .main { ... }
+#
+# 시작할 때 한 번 압축(minify)해서 static/themes/<key>.<내용 해시>.css 로 써 두고,
+# 화면에는 <link> 태그 하나만 내보낸다. 내용이 바뀌면 파일 이름이 바뀌므로
+# 브라우저는 같은 스타일시트를 캐시에서 재사용하고 재실행마다 CSS 를 다시 받지 않는다.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+THEMES_DIR = os.path.join(BASE_DIR, 'data', 'themes')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')   # Streamlit 이 app/static/ 으로 서비스하는 폴더
+OUTPUT_DIR = 'themes'                            # STATIC_DIR 아래 컴파일 결과 폴더
+
+_HEADER = re.compile(r'\A\s*/\*(.*?)\*/', re.S)
+
+
+def parse_theme(text):
+    """테마 파일 → (상점 정보 dict, CSS 본문)"""
+    match = _HEADER.match(text)
+    if not match:
+        raise ValueError("theme file needs a leading /* name: ... price: ... */ header")
+    meta = {}
+    for line in match.group(1).splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            meta[key.strip()] = value.strip()
+    meta['price'] = int(meta['price'])
+    meta.setdefault('effect', '')
+    return meta, text[match.end():]
+
+
+def minify(css):
+    """주석/공백 제거. 테마 CSS 정도의 단순한 규칙만 가정한다."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def compile_themes(themes_dir=THEMES_DIR, static_dir=STATIC_DIR):
+    """테마 폴더 전체를 컴파일. {key: {name, price, effect, css, href}} (가격 순)
+
+    css 는 압축된 본문, href 는 정적 파일 경로 (app/static/...).
+    예전 해시의 파일은 지운다.
+    """
+    out_dir = os.path.join(static_dir, OUTPUT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    themes = {}
+    for filename in sorted(os.listdir(themes_dir)):
+        key, ext = os.path.splitext(filename)
+        if ext != '.css':
+            continue
+        with open(os.path.join(themes_dir, filename), encoding='utf-8') as f:
+            meta, body = parse_theme(f.read())
+        css = minify(body)
+        digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]
+        compiled = f"{key}.{digest}.css"
+        path = os.path.join(out_dir, compiled)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(css)
+        for old in os.listdir(out_dir):
+            if old.startswith(key + '.') and old != compiled:
+                os.remove(os.path.join(out_dir, old))
+        themes[key] = {**meta, 'css': css, 'href': f"app/static/{OUTPUT_DIR}/{compiled}"}
+    return dict(sorted(themes.items(), key=lambda kv: (kv[1]['price'], kv[0])))
+
+
+def theme_tag(theme, static_serving=True):
+    """화면에 넣을 태그. 정적 파일 서비스가 꺼져 있으면 압축된 CSS 를 직접 넣는다."""
+    if static_serving:
+        return f'<link rel="stylesheet" href="{theme["href"]}">'
+    return f"<style>{theme['css']}</style>"
@@ -0,0 +1,184 @@
+import importlib.util
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+import service
+from clock import system_clock
+from session_log import SESSION_TYPES
+
+# =====================================================
+# 기록 내보내기 / 가져오기 (CSV, Parquet)
+# =====================================================
+# 저장소에서 CHUNK_SIZE 행씩 읽어 DataFrame 묶음으로 흘려 보내므로 몇 년치 기록도
+# 메모리에는 한 묶음만 올라온다. Parquet 은 묶음 하나가 row group 하나다.
+#
+#     sessions  세션 기록  day, time, duration, type
+#     daily     일별 기록  day, sessions, minutes   (내보내기 전용)
+#
+# 가져오기는 세션 기록 파일만 받는다. 묶음마다 열 이름을 맞추고 벡터 연산으로 검사한 뒤
+# 묶음 안 중복은 pandas 로, 저장소에 이미 있는 세션은 저장소에서 걸러 낸다.
+# 공부 세션은 위젯 동기화와 같은 규칙으로 걸러 낸다 (service.plausible_imports: 기록된 세션과 겹치거나
+# 하루 위젯/가져오기 상한, 그날 지나간 시간을 넘으면 거절). 업적 보상을 만들어 낸 파일로 받지 못하게 한다.
+# 모든 묶음을 넣은 다음 요약 필드/분석 지표를 기록으로 다시 계산하고 업적을 한 번에 평가한다.
+# 가져온 세션은 코인을 지급하지 않는다 (새로 달성한 업적 보상만 원장에 기록된다).
+
+CHUNK_SIZE = 10_000
+PARQUET = importlib.util.find_spec('pyarrow') is not None   # streamlit 이 같이 설치하지만 없을 수도 있음
+
+DATASETS = {
+    'sessions': ('day', 'time', 'duration', 'type'),
+    'daily': ('day', 'sessions', 'minutes'),
+}
+FORMATS = ('csv', 'parquet') if PARQUET else ('csv',)
+MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# 다른 뽀모도로 앱의 열 이름 → 우리 열 이름 (소문자로 바꾼 뒤 비교)
+COLUMN_ALIASES = {
+    'date': 'day',
+    'start': 'time',
+    'start_time': 'time',
+    'started_at': 'time',
+    'minutes': 'duration',
+    'length': 'duration',
+    'kind': 'type',
+    'session_type': 'type',
+}
+# 다른 앱의 세션 종류 이름 → 우리 이름 (session_log.SESSION_TYPES)
+TYPE_ALIASES = {
+    'break': 'short_break',
+    'short': 'short_break',
+    'long': 'long_break',
+    'focus': 'study',
+    'pomodoro': 'study',
+}
+MAX_DURATION = 24 * 60
+
+
+class ImportFormatError(ValueError):
+    """가져올 파일에 필요한 열이 없음"""
+
+
+# --- 내보내기 ---
+
+def iter_chunks(store, user_id, dataset, chunk_size=CHUNK_SIZE):
+    """저장소 기록을 DataFrame 묶음으로"""
+    source = store.iter_sessions if dataset == 'sessions' else store.iter_daily_history
+    for rows in source(user_id, chunk_size):
+        yield pd.DataFrame.from_records(rows, columns=DATASETS[dataset])
+
+
+def write_csv(chunks, out, columns):
+    """첫 묶음에만 머리글. 스프레드시트에서 한글이 깨지지 않도록 BOM 을 붙인다."""
+    out.write('﻿'.encode('utf-8'))
+    wrote_header = False
+    for df in chunks:
+        out.write(df.to_csv(index=False, header=not wrote_header, lineterminator='\n').encode('utf-8'))
+        wrote_header = True
+    if not wrote_header:
+        out.write((",".join(columns) + "\n").encode('utf-8'))
+
+
+def write_parquet(chunks, out, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for df in chunks:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema)
+        writer.write_table(table)
+    if writer is None:
+        pq.write_table(pa.table({name: pa.array([], pa.string()) for name in columns}), out)
+    else:
+        writer.close()
+
+
+def export_history(store, user_id, dataset='sessions', fmt='csv', chunk_size=CHUNK_SIZE):
+    """내보낸 파일 (처음으로 되감은 임시 파일). 작으면 메모리, 크면 디스크에 쓴다."""
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write = write_parquet if fmt == 'parquet' else write_csv
+    write(iter_chunks(store, user_id, dataset, chunk_size), out, DATASETS[dataset])
+    out.seek(0)
+    return out
+
+
+# --- 가져오기 ---
+
+def read_chunks(file, name, chunk_size=CHUNK_SIZE):
+    """업로드 파일을 DataFrame 묶음으로 (이름의 확장자로 형식 판단)"""
+    if name.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file, chunksize=chunk_size, dtype=str, encoding='utf-8-sig',
+                               skipinitialspace=True)
+
+
+def clean_sessions(df, today=None):
+    """열 이름을 맞추고 잘못된 행을 버린 세션 DataFrame 과 버린 행 수
+
+    day 는 ISO 날짜(YYYY-MM-DD)이고 오늘 이후가 아니어야 하며, time 은 H:MM(:SS), duration 은
+    1 ~ MAX_DURATION 분, type 은 SESSION_TYPES 나 TYPE_ALIASES (없으면 study).
+    """
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    missing = [name for name in ('day', 'time', 'duration') if name not in df.columns]
+    if missing:
+        raise ImportFormatError(f"missing column(s): {', '.join(missing)}")
+    today = pd.Timestamp(today or date.today())
+
+    day = pd.to_datetime(df['day'], errors='coerce', format='ISO8601').dt.normalize()
+    clock = df['time'].astype('string').str.extract(r'^\s*(\d{1,2}):(\d{2})')
+    hour = pd.to_numeric(clock[0], errors='coerce')
+    minute = pd.to_numeric(clock[1], errors='coerce')
+    duration = pd.to_numeric(df['duration'], errors='coerce').round()
+    kind = (df['type'].astype('string').str.strip().str.lower().fillna('study').replace(TYPE_ALIASES)
+            if 'type' in df.columns else pd.Series('study', index=df.index, dtype='string'))
+
+    valid = (day.notna() & (day <= today)
+             & hour.between(0, 23) & minute.between(0, 59)
+             & duration.between(1, MAX_DURATION)
+             & kind.isin(SESSION_TYPES))
+    cleaned = pd.DataFrame({
+        'day': day[valid].dt.strftime('%Y-%m-%d'),
+        'time': hour[valid].astype(int).astype(str).str.zfill(2) + ':' + clock[1][valid],
+        'duration': duration[valid].astype(int),
+        'type': kind[valid].astype(str),
+    })
+    return cleaned, int((~valid).sum())
+
+
+def import_history(store, ach_engine, user_id, file, name, chunk_size=CHUNK_SIZE, today=None, now=None):
+    """세션 기록 파일 가져오기. now 는 지금 시각(epoch 초). 결과 요약 dict
+
+    {'read', 'invalid', 'duplicates', 'rejected', 'imported', 'added': {날짜: 공부 분}, 'achievements': [...]}
+    """
+    now = system_clock.time() if now is None else now
+    result = {'read': 0, 'invalid': 0, 'duplicates': 0, 'rejected': 0, 'imported': 0, 'added': {},
+              'achievements': []}
+    for chunk in read_chunks(file, name, chunk_size):
+        result['read'] += len(chunk)
+        cleaned, invalid = clean_sessions(chunk, today)
+        result['invalid'] += invalid
+        unique = cleaned.drop_duplicates()
+        rows, rejected = service.plausible_imports(
+            store, user_id, list(unique.itertuples(index=False, name=None)), now)
+        result['rejected'] += rejected
+        if not rows:
+            result['duplicates'] += len(cleaned) - rejected
+            continue
+        inserted, added = store.import_sessions(user_id, rows)
+        result['duplicates'] += len(cleaned) - rejected - inserted
+        result['imported'] += inserted
+        for day, minutes in added.items():
+            result['added'][day] = result['added'].get(day, 0) + minutes
+
+    if result['imported']:
+        store.recompute_totals(user_id)
+        store.recompute_analytics(user_id)
+        result['achievements'] = service.unlock_satisfied(store, ach_engine, user_id)
+    return result